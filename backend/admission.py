@@ -0,0 +1,220 @@
+"""Admission control: a global in-flight budget with priority lanes, and per-client rate limits"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+# Lanes in priority order: queued interactive work is always admitted before bulk work
+LANES = ("interactive", "bulk")
+
+
+class Overloaded(Exception):
+    """Work was not admitted; ``retry_after`` is a hint in whole seconds"""
+
+    def __init__(self, message: str, reason: str, retry_after: int):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounds the images, and the memory their frames take, being processed at once.
+
+    Work that fits the budget starts immediately. Otherwise it waits in a
+    queue, interactive before bulk and FIFO within a lane, for up to
+    ``timeout`` seconds. It is rejected outright when ``max_queued_images``
+    are already waiting. Bulk work may only fill ``bulk_share`` of the
+    image budget, so single-image requests keep some headroom. Work larger
+    than the whole budget is admitted once nothing else is running.
+
+    Waiters with ``timeout=None`` (work already accepted, such as jobs or
+    a running stream) wait as long as it takes and are never rejected,
+    though they count towards the queue. Not thread-safe: call from the
+    event loop.
+    """
+
+    def __init__(self, max_images: int, max_bytes: int, max_queued_images: int, bulk_share: float = 0.75,
+                 on_reject: Optional[Callable[[str, str], None]] = None):
+        self.max_images = max(1, max_images)
+        self.max_bytes = max(1, max_bytes)
+        self.max_queued_images = max(0, max_queued_images)
+        self.bulk_images = max(1, int(self.max_images * bulk_share))
+        self.on_reject = on_reject
+
+        self.images = 0
+        self.bytes = 0
+        self.lane_images = {lane: 0 for lane in LANES}
+        self.queued_images = 0
+        self._waiters: List[Tuple[int, int, int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        # Moving average of how long admitted work holds its budget, for Retry-After
+        self._hold_seconds = 1.0
+
+        self.admitted = {lane: 0 for lane in LANES}
+        self.waited = {lane: 0 for lane in LANES}
+        self.rejected: Dict[str, int] = {"queue_full": 0, "timeout": 0}
+
+    def _fits(self, images: int, nbytes: int, lane: str) -> bool:
+        if self.images == 0:
+            return True
+        if self.images + images > self.max_images or self.bytes + nbytes > self.max_bytes:
+            return False
+        return lane != "bulk" or self.lane_images["bulk"] + images <= self.bulk_images
+
+    def _take(self, images: int, nbytes: int, lane: str) -> None:
+        self.images += images
+        self.bytes += nbytes
+        self.lane_images[lane] += images
+        self.admitted[lane] += 1
+
+    def _dispatch(self) -> None:
+        """Admit queued work in priority order until the head no longer fits"""
+        while self._waiters:
+            _, _, images, nbytes, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            lane = LANES[self._waiters[0][0]]
+            if not self._fits(images, nbytes, lane):
+                return
+            heapq.heappop(self._waiters)
+            self._take(images, nbytes, lane)
+            future.set_result(None)
+
+    def retry_after(self) -> int:
+        backlog = 1 + self.queued_images / self.max_images
+        return max(1, math.ceil(self._hold_seconds * backlog))
+
+    def _reject(self, reason: str, lane: str, message: str) -> Overloaded:
+        self.rejected[reason] += 1
+        if self.on_reject is not None:
+            self.on_reject(reason, lane)
+        return Overloaded(message, reason, self.retry_after())
+
+    def check(self, images: int = 1, lane: str = "bulk") -> None:
+        """Raise Overloaded if work of this size would be turned away right now"""
+        if self._waiters and self.queued_images + images > self.max_queued_images:
+            raise self._reject("queue_full", lane, "Server is at capacity; the admission queue is full")
+
+    async def acquire(self, images: int, nbytes: int, lane: str = "bulk", timeout: Optional[float] = None) -> None:
+        """Wait for budget for ``images`` images whose frames take ``nbytes`` bytes"""
+        rank = LANES.index(lane)
+        ahead = any(waiter[0] <= rank and not waiter[4].done() for waiter in self._waiters)
+        if not ahead and self._fits(images, nbytes, lane):
+            self._take(images, nbytes, lane)
+            return
+
+        if timeout is not None and self.queued_images + images > self.max_queued_images:
+            raise self._reject("queue_full", lane, "Server is at capacity; the admission queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (rank, next(self._order), images, nbytes, future))
+        self.waited[lane] += 1
+        self.queued_images += images
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                return  # admitted as the timeout fired
+            future.cancel()
+            self._dispatch()
+            raise self._reject("timeout", lane, f"Server is at capacity; not admitted within {timeout:g}s")
+        except asyncio.CancelledError:
+            # Admitted just as the caller went away: hand the budget back
+            if future.done() and not future.cancelled():
+                self.release(images, nbytes, lane)
+            else:
+                future.cancel()
+                self._dispatch()
+            raise
+        finally:
+            self.queued_images -= images
+
+    def release(self, images: int, nbytes: int, lane: str = "bulk", held: Optional[float] = None) -> None:
+        self.images -= images
+        self.bytes -= nbytes
+        self.lane_images[lane] -= images
+        if held is not None:
+            self._hold_seconds += 0.1 * (held - self._hold_seconds)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, images: int, nbytes: int, lane: str = "bulk",
+                    timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold budget for the duration of the ``async with`` block"""
+        await self.acquire(images, nbytes, lane, timeout)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(images, nbytes, lane, time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {
+            "max_images": self.max_images,
+            "max_bytes": self.max_bytes,
+            "max_queued_images": self.max_queued_images,
+            "bulk_images": self.bulk_images,
+            "images_in_flight": self.images,
+            "bytes_in_flight": self.bytes,
+            "lane_images_in_flight": dict(self.lane_images),
+            "queued_images": self.queued_images,
+            "admitted": dict(self.admitted),
+            "waited": dict(self.waited),
+            "rejected": dict(self.rejected),
+            "mean_hold_seconds": round(self._hold_seconds, 3),
+        }
+
+
+class RateLimiter:
+    """Per-client token buckets refilled at ``rate`` tokens per second up to ``burst``.
+
+    A request costs one token per image; a cost above ``burst`` is clamped
+    so large batches can still go through from a full bucket. A ``rate``
+    of 0 disables limiting. The least recently seen clients are forgotten
+    beyond ``max_clients``.
+    """
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+
+    def consume(self, client: str, cost: float = 1) -> float:
+        """Take ``cost`` tokens; returns 0 if allowed, else the seconds until they would be available"""
+        if self.rate <= 0:
+            self.allowed += 1
+            return 0.0
+        now = time.monotonic()
+        cost = min(cost, self.burst)
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+            self.allowed += 1
+        else:
+            wait = (cost - tokens) / self.rate
+            self.limited += 1
+
+        self._buckets[client] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "clients": len(self._buckets),
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
@@ -0,0 +1,171 @@
+"""Dynamic micro-batching of concurrent inference requests"""
+import asyncio
+import logging
+from collections import Counter
+from concurrent.futures import Executor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from preprocess import INPUT_SIZE, InputBufferPool
+
+
+class DynamicBatcher:
+    """Coalesce concurrent single-image requests into batched model calls.
+
+    Callers ``submit`` a 1xCxHxW blob and await the per-image output. A
+    background task collects queued blobs until either ``max_batch_size``
+    is reached or ``max_wait_ms`` has elapsed since the first one arrived,
+    stacks them into one tensor and hands it to ``runner`` on ``executor``.
+    Batches are stacked into input tensors preallocated per concurrent
+    batch, so steady-state batching allocates no input memory; blobs must
+    be ``size`` x ``size``.
+    """
+
+    def __init__(self, runner: Callable[[np.ndarray], np.ndarray], executor: Executor,
+                 max_batch_size: int = 8, max_wait_ms: float = 5.0, max_concurrent_batches: int = 2,
+                 size: int = INPUT_SIZE):
+        self.runner = runner
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self.buffers = InputBufferPool(self.max_concurrent_batches, self.max_batch_size, size)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+        self._outstanding = 0
+        self._idle: Optional[asyncio.Event] = None
+
+        self.batches_run = 0
+        self.items_processed = 0
+        self.max_queue_depth = 0
+        self.batch_size_histogram: Counter = Counter()
+        self.queue_depth_histogram: Counter = Counter()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        """Start the collector task on the running event loop"""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task = asyncio.create_task(self._collect())
+
+    async def stop(self, drain: bool = False) -> None:
+        """Stop collecting and fail any request still waiting in the queue.
+
+        With ``drain``, first wait until every submitted request has been
+        answered; callers must stop submitting before draining.
+        """
+        if self._task is None:
+            return
+        if drain:
+            await self._idle.wait()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, blob: np.ndarray) -> np.ndarray:
+        """Queue a 1xCxHxW blob and wait for its model output"""
+        if self._task is None:
+            raise RuntimeError("Batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._outstanding += 1
+        self._idle.clear()
+        try:
+            await self._queue.put((blob, future))
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+            return await future
+        finally:
+            self._outstanding -= 1
+            if not self._outstanding:
+                self._idle.set()
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.max_wait
+
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                self.queue_depth_histogram[self._queue.qsize()] += 1
+                await self._slots.acquire()
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("Batcher stopped"))
+                raise
+
+            task = asyncio.create_task(self._run_batch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    def _stack_and_run(self, blobs: List[np.ndarray]) -> np.ndarray:
+        with self.buffers.acquire(len(blobs)) as tensor:
+            np.concatenate(blobs, axis=0, out=tensor)
+            return self.runner(tensor)
+
+    async def _run_batch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        try:
+            blobs = [blob for blob, _ in batch]
+            outputs = await asyncio.get_running_loop().run_in_executor(self.executor, self._stack_and_run, blobs)
+        except Exception as e:
+            logging.error(f"Batched inference failed for {len(batch)} requests: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for output, (_, future) in zip(outputs, batch):
+                if not future.done():
+                    future.set_result(output)
+        finally:
+            self._slots.release()
+
+        self.batches_run += 1
+        self.items_processed += len(batch)
+        self.batch_size_histogram[len(batch)] += 1
+
+    def stats(self) -> dict:
+        """Snapshot of queue depth and batch-size counters"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "batches_in_flight": len(self._inflight),
+            "batches_run": self.batches_run,
+            "items_processed": self.items_processed,
+            "mean_batch_size": self.items_processed / self.batches_run if self.batches_run else 0.0,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self.batch_size_histogram.items())},
+            "queue_depth_histogram": {str(depth): count for depth, count in sorted(self.queue_depth_histogram.items())},
+            "input_buffers": self.buffers.stats(),
+        }
@@ -0,0 +1,69 @@
+"""Short-lived in-memory store for encoded result images served by URL"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class ImageStore:
+    """Byte-bounded store of encoded images that expire after ``ttl`` seconds.
+
+    Lets responses reference images by URL instead of inlining them as
+    base64. The oldest images are evicted first when ``max_bytes`` is
+    exceeded. Thread-safe.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max(0, max_bytes)
+        self.ttl = ttl
+        self._images: "OrderedDict[str, Tuple[bytes, str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.stored = 0
+        self.served = 0
+        self.evictions = 0
+
+    def _expire(self, now: float) -> None:
+        while self._images:
+            image_id, (data, _, expires) = next(iter(self._images.items()))
+            if expires > now and self.bytes <= self.max_bytes:
+                break
+            del self._images[image_id]
+            self.bytes -= len(data)
+            if expires > now:
+                self.evictions += 1
+
+    def put(self, data: bytes, media_type: str) -> Optional[str]:
+        """Store an encoded image; returns its id, or None if it can never fit"""
+        if len(data) > self.max_bytes:
+            return None
+        image_id = uuid.uuid4().hex
+        now = time.monotonic()
+        with self._lock:
+            self._images[image_id] = (data, media_type, now + self.ttl)
+            self.bytes += len(data)
+            self.stored += 1
+            self._expire(now)
+        return image_id
+
+    def get(self, image_id: str) -> Optional[Tuple[bytes, str]]:
+        """(bytes, media type) of a live image, or None once expired or evicted"""
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._images.get(image_id)
+            if entry is None:
+                return None
+            self.served += 1
+            return entry[0], entry[1]
+
+    def stats(self) -> dict:
+        return {
+            "images": len(self._images),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "stored": self.stored,
+            "served": self.served,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,69 @@
+"""Batched ONNX inference helpers for the knife detection model"""
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from preprocess import INPUT_SIZE, InputBufferPool, letterbox_batch
+
+
+def fixed_batch_size(session) -> Optional[int]:
+    """Return the batch dimension baked into the model input, or None if dynamic"""
+    dim = session.get_inputs()[0].shape[0]
+    return dim if isinstance(dim, int) and dim > 0 else None
+
+
+def run_batch(session, tensor: np.ndarray) -> np.ndarray:
+    """Run an NCHW tensor through the session and return the (N, 4+C, A) output.
+
+    Models exported with a fixed batch size are fed in chunks of that size,
+    zero-padding the last chunk, so callers can always pass any N.
+    """
+    input_name = session.get_inputs()[0].name
+    fixed = fixed_batch_size(session)
+    count = tensor.shape[0]
+
+    if fixed is None or fixed == count:
+        return session.run(None, {input_name: tensor})[0]
+
+    outputs = []
+    for start in range(0, count, fixed):
+        chunk = tensor[start:start + fixed]
+        if chunk.shape[0] < fixed:
+            padding = np.zeros((fixed - chunk.shape[0],) + chunk.shape[1:], chunk.dtype)
+            chunk = np.concatenate([chunk, padding], axis=0)
+        outputs.append(session.run(None, {input_name: chunk})[0][:min(fixed, count - start)])
+    return np.concatenate(outputs, axis=0)
+
+
+def infer_images(runner: Callable[[np.ndarray], np.ndarray], images: List[np.ndarray],
+                 batch_size: int = 16, buffers: Optional[InputBufferPool] = None,
+                 on_preprocess: Optional[Callable[[float], None]] = None,
+                 size: int = INPUT_SIZE) -> List[Tuple[np.ndarray, float]]:
+    """Run images through ``runner`` in micro-batches of ``batch_size``.
+
+    Images are letterboxed one micro-batch at a time so peak memory stays
+    bounded by the batch size rather than the number of images. ``runner``
+    maps an NCHW tensor to the (N, 4+C, A) output, e.g. ``run_batch`` bound
+    to a session or a worker pool's ``run``. Returns one
+    ``(output, scale)`` pair per image, where ``output`` is the (4+C, A)
+    prediction array for that image.
+
+    With ``buffers`` each micro-batch is letterboxed straight into a pooled
+    input tensor instead of a freshly allocated one; their side overrides
+    ``size``, the letterbox resolution. ``on_preprocess`` receives the
+    seconds spent letterboxing each micro-batch.
+    """
+    batch_size = max(1, batch_size)
+    buffers = buffers or InputBufferPool(1, batch_size, size)
+    results = []
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        with buffers.acquire(len(chunk)) as tensor:
+            started = time.perf_counter()
+            scales = letterbox_batch(chunk, tensor, buffers.size)
+            if on_preprocess is not None:
+                on_preprocess(time.perf_counter() - started)
+            outputs = runner(tensor)
+        results.extend(zip(outputs, scales))
+    return results
@@ -0,0 +1,343 @@
+"""Persistent batch jobs: a SQLite job store and an asyncio priority scheduler"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from result_cache import dump_result, load_result
+
+TERMINAL_STATES = ("completed", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    options TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    processed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+"""
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the scheduler's queue is at capacity"""
+
+
+class JobStore:
+    """Job metadata in SQLite, uploads and per-item results as files under ``root``.
+
+    Layout: ``root/jobs.db``, ``root/<job_id>/inputs/<idx>`` (deleted once
+    the job finishes) and ``root/<job_id>/results/<idx>.json``. Methods are
+    blocking and thread-safe; call them from an executor.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / "jobs.db"), check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def input_path(self, job_id: str, index: int) -> Path:
+        return self.root / job_id / "inputs" / f"{index:06d}"
+
+    def result_path(self, job_id: str, index: int) -> Path:
+        return self.root / job_id / "results" / f"{index:06d}.json"
+
+    def create(self, job_id: str, priority: int, options: dict, filenames: List[str],
+               errors: Dict[int, str]) -> None:
+        """Register a queued job; items listed in ``errors`` are failed up front"""
+        (self.root / job_id / "results").mkdir(parents=True, exist_ok=True)
+        items = [
+            (job_id, i, name, "failed" if i in errors else "pending", errors.get(i))
+            for i, name in enumerate(filenames)
+        ]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT INTO jobs (id, status, priority, options, total, processed, failed, created_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+                (job_id, priority, json.dumps(options), len(filenames), len(errors), len(errors), time.time()),
+            )
+            self._db.executemany("INSERT INTO job_items VALUES (?, ?, ?, ?, ?)", items)
+            self._db.execute("COMMIT")
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        return job
+
+    def list(self, limit: int = 50) -> List[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, status, priority, total, processed, failed, created_at, started_at, finished_at, error "
+                "FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def unfinished(self) -> List[dict]:
+        """Queued or interrupted jobs, oldest first, for recovery after a restart"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, priority FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at",
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def pending_items(self, job_id: str) -> List[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT idx, filename FROM job_items WHERE job_id = ? AND status = 'pending' ORDER BY idx", (job_id,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            if status == "running":
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?) WHERE id = ?",
+                    (status, now, job_id),
+                )
+            else:
+                finished = now if status in TERMINAL_STATES else None
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?",
+                    (status, finished, error, job_id),
+                )
+
+    def record_item(self, job_id: str, index: int, result: Optional[dict] = None, error: Optional[str] = None) -> None:
+        """Persist one item's result (or error) and bump the job's progress counters"""
+        if error is None:
+            path = self.result_path(job_id, index)
+            temp = path.with_suffix(".tmp")
+            temp.write_bytes(dump_result(result))
+            os.replace(temp, path)
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "UPDATE job_items SET status = ?, error = ? WHERE job_id = ? AND idx = ?",
+                ("failed" if error is not None else "done", error, job_id, index),
+            )
+            self._db.execute(
+                "UPDATE jobs SET processed = processed + 1, failed = failed + ? WHERE id = ?",
+                (1 if error is not None else 0, job_id),
+            )
+            self._db.execute("COMMIT")
+
+    def read_results(self, job_id: str, offset: int = 0, limit: Optional[int] = None) -> List[dict]:
+        """Finished items in upload order, with their stored results loaded"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT idx, filename, status, error FROM job_items "
+                "WHERE job_id = ? AND status != 'pending' ORDER BY idx LIMIT ? OFFSET ?",
+                (job_id, -1 if limit is None else limit, offset),
+            ).fetchall()
+        items = []
+        for row in rows:
+            item = {"index": row["idx"], "filename": row["filename"]}
+            if row["status"] == "done":
+                item["result"] = load_result(self.result_path(job_id, row["idx"]).read_bytes())
+            else:
+                item["error"] = row["error"]
+            items.append(item)
+        return items
+
+    def discard_inputs(self, job_id: str) -> None:
+        shutil.rmtree(self.root / job_id / "inputs", ignore_errors=True)
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._db.execute("COMMIT")
+        shutil.rmtree(self.root / job_id, ignore_errors=True)
+
+    def purge(self, max_age: float) -> int:
+        """Delete finished jobs older than ``max_age`` seconds; returns how many"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (time.time() - max_age,),
+            ).fetchall()
+        for row in rows:
+            self.delete(row["id"])
+        return len(rows)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+ItemHandler = Callable[[dict, dict], Awaitable[dict]]
+
+
+class JobScheduler:
+    """Runs queued jobs by priority with bounded concurrency.
+
+    Up to ``max_concurrent_jobs`` jobs run at once, each processing at most
+    ``item_concurrency`` items concurrently through ``handler(job, item)``.
+    Higher ``priority`` jobs start first; equal priorities run in submission
+    order. Jobs left queued or running by a previous process are resumed
+    on ``start``, skipping items that already finished.
+    """
+
+    def __init__(self, store: JobStore, handler: ItemHandler, max_concurrent_jobs: int = 1,
+                 item_concurrency: int = 8, max_queued: int = 100):
+        self.store = store
+        self.handler = handler
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+        self.item_concurrency = max(1, item_concurrency)
+        self.max_queued = max_queued
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._order = itertools.count()
+        self._workers: List[asyncio.Task] = []
+        # Ids waiting to start; cancelled entries stay in the heap until a worker pops them
+        self._queued: set = set()
+        self._running: set = set()
+        self._cancelled: set = set()
+        self._updates: Dict[str, asyncio.Event] = {}
+        self.items_processed = 0
+        self.items_failed = 0
+
+    async def _db(self, method, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+    async def start(self) -> None:
+        self._queue = asyncio.PriorityQueue()
+        for job in await self._db(self.store.unfinished):
+            self._queue.put_nowait((-job["priority"], next(self._order), job["id"]))
+            self._queued.add(job["id"])
+        if self._queued:
+            logging.info(f"Resuming {len(self._queued)} unfinished jobs")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrent_jobs)]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, job_id: str, priority: int) -> None:
+        """Queue a job already registered in the store"""
+        self._queue.put_nowait((-priority, next(self._order), job_id))
+        self._queued.add(job_id)
+
+    def check_capacity(self) -> None:
+        if self._queue is None:
+            raise QueueFull("Job scheduler is not running")
+        if len(self._queued) >= self.max_queued:
+            raise QueueFull(f"Job queue is full ({self.max_queued} jobs waiting)")
+
+    async def cancel(self, job_id: str) -> None:
+        """Stop a queued or running job; items already finished keep their results"""
+        self._cancelled.add(job_id)
+        self._queued.discard(job_id)
+        if job_id not in self._running:
+            await self._db(self.store.set_status, job_id, "cancelled")
+        self._notify(job_id)
+
+    async def wait_for_update(self, job_id: str, timeout: float) -> None:
+        """Block until the job makes progress or changes state, or ``timeout`` passes"""
+        event = self._updates.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _notify(self, job_id: str) -> None:
+        event = self._updates.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            if job_id in self._cancelled:
+                self._cancelled.discard(job_id)
+                continue
+            self._running.add(job_id)
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Job {job_id} failed: {e}")
+                await self._db(self.store.set_status, job_id, "failed", str(e))
+            finally:
+                self._running.discard(job_id)
+                self._cancelled.discard(job_id)
+                self._notify(job_id)
+
+    async def _run(self, job_id: str) -> None:
+        job = await self._db(self.store.get, job_id)
+        if job is None or job["status"] in TERMINAL_STATES:
+            return
+        await self._db(self.store.set_status, job_id, "running")
+        self._notify(job_id)
+        started = time.perf_counter()
+        pending = iter(await self._db(self.store.pending_items, job_id))
+
+        async def drain() -> None:
+            for item in pending:
+                if job_id in self._cancelled:
+                    return
+                try:
+                    result = await self.handler(job, item)
+                    await self._db(self.store.record_item, job_id, item["idx"], result)
+                    self.items_processed += 1
+                except Exception as e:
+                    await self._db(self.store.record_item, job_id, item["idx"], None, str(e) or type(e).__name__)
+                    self.items_failed += 1
+                self._notify(job_id)
+
+        await asyncio.gather(*(drain() for _ in range(self.item_concurrency)))
+
+        status = "cancelled" if job_id in self._cancelled else "completed"
+        await self._db(self.store.set_status, job_id, status)
+        await self._db(self.store.discard_inputs, job_id)
+        logging.info(f"Job {job_id} {status} after {time.perf_counter() - started:.1f}s")
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._queued),
+            "running": len(self._running),
+            "max_concurrent_jobs": self.max_concurrent_jobs,
+            "item_concurrency": self.item_concurrency,
+            "max_queued": self.max_queued,
+            "items_processed": self.items_processed,
+            "items_failed": self.items_failed,
+        }
@@ -0,0 +1,187 @@
+"""Registry of named, versioned ONNX models that can be hot-swapped while serving"""
+import ast
+import asyncio
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from batcher import DynamicBatcher
+from inference import run_batch
+from preprocess import INPUT_SIZE
+from workers import InferenceWorkerPool
+
+
+def model_fingerprint(path: Path) -> str:
+    """Version string of a model file: name, size and modification time"""
+    stat = Path(path).stat()
+    return f"{Path(path).name}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def read_class_names(session, fallback: Sequence[str] = ()) -> List[str]:
+    """Class names from the model's ``names`` metadata (as written by Ultralytics exports).
+
+    Falls back to ``fallback`` when it matches the number of class channels
+    in the output, then to ``class_<i>`` names.
+    """
+    metadata = session.get_modelmeta().custom_metadata_map
+    if "names" in metadata:
+        try:
+            names = ast.literal_eval(metadata["names"])
+            if isinstance(names, dict):
+                return [str(names[key]) for key in sorted(names)]
+            return [str(name) for name in names]
+        except (ValueError, SyntaxError, TypeError):
+            logging.warning(f"Ignoring unreadable class names in model metadata: {metadata['names']!r}")
+
+    channels = session.get_outputs()[0].shape[1]
+    count = channels - 4 if isinstance(channels, int) else len(fallback)
+    if len(fallback) == count:
+        return list(fallback)
+    return [f"class_{i}" for i in range(count)]
+
+
+class LoadedModel:
+    """One servable version of a model variant.
+
+    Holds the in-process session and, optionally, a dynamic batcher, a
+    second batcher for low-resolution cascade screening and an inference
+    worker pool. Requests pin the instance they resolved, so a
+    hot-swapped predecessor keeps serving its in-flight work: ``retire``
+    detaches the batcher and pool first, then drains them.
+    """
+
+    def __init__(self, name: str, variant: str, path: Path, session, classes: List[str], version: str):
+        self.name = name
+        self.variant = variant
+        self.path = Path(path)
+        self.session = session
+        self.classes = classes
+        self.class_ids = list(range(len(classes)))
+        self.version = version
+        self.loaded_at = time.time()
+        self.warmup_ms: Optional[float] = None
+        self.batcher: Optional[DynamicBatcher] = None
+        self.screen_batcher: Optional[DynamicBatcher] = None
+        self.worker_pool: Optional[InferenceWorkerPool] = None
+        self._pool_calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}/{self.variant}"
+
+    def accepts_input(self, size: int) -> bool:
+        """Whether the model takes ``size`` x ``size`` inputs (its spatial dims are dynamic or equal)"""
+        height, width = self.session.get_inputs()[0].shape[2:]
+        return all(not isinstance(dim, int) or dim == size for dim in (height, width))
+
+    def run(self, tensor: np.ndarray) -> np.ndarray:
+        """Blocking NCHW inference on the worker pool if attached, else in-process.
+
+        Worker pools are sized for full-resolution inputs, so other input
+        sizes always run in-process.
+        """
+        with self._lock:
+            pool = self.worker_pool
+            if pool is not None and tensor.shape[1:] != pool.input_shape:
+                pool = None
+            if pool is not None:
+                self._pool_calls += 1
+        if pool is None:
+            return run_batch(self.session, tensor)
+        try:
+            return pool.run(tensor)
+        finally:
+            with self._lock:
+                self._pool_calls -= 1
+
+    def warm_up(self, batch_sizes: Sequence[int] = (1,), runs: int = 1, size: int = INPUT_SIZE) -> None:
+        """Run zero tensors through the model so the first request doesn't pay for lazy init"""
+        shape = self.session.get_inputs()[0].shape
+        chw = tuple(dim if isinstance(dim, int) else default
+                    for dim, default in zip(shape[1:], (3, size, size)))
+        started = time.perf_counter()
+        for batch_size in batch_sizes:
+            tensor = np.zeros((batch_size,) + chw, np.float32)
+            for _ in range(runs):
+                self.run(tensor)
+        self.warmup_ms = round((self.warmup_ms or 0) + (time.perf_counter() - started) * 1000, 1)
+
+    async def retire(self, poll_interval: float = 0.01) -> None:
+        """Stop taking batched/pooled work and release it once in-flight calls finish"""
+        batchers = [self.batcher, self.screen_batcher]
+        self.batcher = self.screen_batcher = None
+        for batcher in batchers:
+            if batcher is not None:
+                await batcher.stop(drain=True)
+        with self._lock:
+            pool, self.worker_pool = self.worker_pool, None
+        if pool is not None:
+            while self._pool_calls:
+                await asyncio.sleep(poll_interval)
+            await asyncio.get_running_loop().run_in_executor(None, pool.close)
+        logging.info(f"Retired model {self.key} version {self.version}")
+
+    def info(self) -> dict:
+        return {
+            "name": self.name,
+            "variant": self.variant,
+            "path": self.path.name,
+            "version": self.version,
+            "classes": self.classes,
+            "loaded_at": self.loaded_at,
+            "warmup_ms": self.warmup_ms,
+            "batched": self.batcher is not None,
+            "screening": self.screen_batcher is not None,
+            "worker_pool": self.worker_pool is not None,
+        }
+
+
+class ModelRegistry:
+    """Live models keyed by (name, variant).
+
+    ``install`` swaps a model in with a single dict assignment, so a lookup
+    sees either the old or the new version, never a half-loaded one.
+    """
+
+    def __init__(self, default_name: str, default_variant: str):
+        self.default_name = default_name
+        self.default_variant = default_variant
+        self._models: Dict[Tuple[str, str], LoadedModel] = {}
+        self.swaps = 0
+        # Base file each model name was last loaded from (variants sit next to it)
+        self.sources: Dict[str, Path] = {}
+        # Serializes reloads so two swaps of one model can't interleave
+        self.reload_lock = asyncio.Lock()
+
+    def get(self, name: Optional[str] = None, variant: Optional[str] = None) -> Optional[LoadedModel]:
+        return self._models.get((name or self.default_name, variant or self.default_variant))
+
+    @property
+    def default(self) -> Optional[LoadedModel]:
+        return self.get()
+
+    def install(self, model: LoadedModel) -> Optional[LoadedModel]:
+        """Make ``model`` live; returns the version it replaced, which the caller retires"""
+        key = (model.name, model.variant)
+        previous = self._models.get(key)
+        self._models[key] = model
+        if previous is not None:
+            self.swaps += 1
+        return previous
+
+    def names(self) -> List[str]:
+        return sorted({name for name, _ in self._models})
+
+    def variants(self, name: str) -> List[str]:
+        return sorted(variant for model_name, variant in self._models if model_name == name)
+
+    def __iter__(self) -> Iterator[LoadedModel]:
+        return iter(list(self._models.values()))
+
+    def __len__(self) -> int:
+        return len(self._models)
@@ -0,0 +1,137 @@
+"""Motion gating and a lightweight box tracker for video streams"""
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from nms import box_iou
+from postprocess import Detections
+
+
+class MotionGate:
+    """Decides which frames need inference.
+
+    Each frame is reduced to a small blurred grayscale thumbnail and compared
+    with the thumbnail of the last keyframe. The motion score is the largest
+    mean absolute difference (0-255) over a ``grid`` x ``grid`` split of the
+    frame, so a person moving in one corner is not averaged away by a static
+    background. A frame becomes a keyframe when its score
+    reaches ``threshold`` or when ``max_skip`` frames have been skipped in a
+    row, so slow drifts and long static scenes are still re-checked.
+    """
+
+    def __init__(self, threshold: float = 4.0, max_skip: int = 30, width: int = 64, grid: int = 8):
+        self.threshold = threshold
+        self.max_skip = max(0, max_skip)
+        self.width = width
+        self.grid = grid
+        self._reference: Optional[np.ndarray] = None
+        self._skipped = 0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        height = max(1, round(frame.shape[0] * self.width / frame.shape[1]))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (3, 3), 0)
+
+    def check(self, frame: np.ndarray) -> Tuple[bool, float]:
+        """Return (is_keyframe, motion score) for the next frame in order"""
+        thumbnail = self._thumbnail(frame)
+        if self._reference is None:
+            score = float("inf")
+        else:
+            diff = cv2.absdiff(thumbnail, self._reference)
+            cells = cv2.resize(diff.astype(np.float32), (self.grid, self.grid), interpolation=cv2.INTER_AREA)
+            score = float(cells.max())
+
+        if score >= self.threshold or self._skipped >= self.max_skip:
+            self._reference = thumbnail
+            self._skipped = 0
+            return True, score
+        self._skipped += 1
+        return False, score
+
+
+class _Track:
+    __slots__ = ("track_id", "box", "velocity", "score", "class_id", "frame", "misses")
+
+    def __init__(self, track_id: int, box: np.ndarray, score: float, class_id: int, frame: int):
+        self.track_id = track_id
+        self.box = box.astype(np.float32)
+        self.velocity = np.zeros(4, np.float32)
+        self.score = score
+        self.class_id = class_id
+        self.frame = frame
+        self.misses = 0
+
+    def predict(self, frame: int) -> np.ndarray:
+        return self.box + self.velocity * (frame - self.frame)
+
+
+class BoxTracker:
+    """Constant-velocity IoU tracker that carries boxes across skipped frames.
+
+    ``update`` is called with real detections on keyframes: tracks are
+    matched greedily by IoU (same class only) and their per-frame velocity
+    is re-estimated. ``predict`` extrapolates the live tracks to a skipped
+    frame. Tracks unmatched for more than ``max_misses`` keyframes are dropped.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_misses: int = 1, smoothing: float = 0.5):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.smoothing = smoothing
+        self.tracks: List[_Track] = []
+        self.mock = False
+        self._next_id = 1
+
+    def update(self, detections: Detections, frame: int) -> List[int]:
+        """Match keyframe detections to tracks; returns a track id per detection"""
+        self.mock = detections.mock
+        ids = [0] * len(detections.scores)
+        unmatched = set(range(len(detections.scores)))
+
+        if self.tracks and len(detections.scores):
+            predicted = np.stack([track.predict(frame) for track in self.tracks])
+            iou = box_iou(predicted, detections.boxes)
+            track_classes = np.array([track.class_id for track in self.tracks])
+            iou[track_classes[:, None] != detections.class_ids[None, :]] = 0
+
+            for t, d in sorted(np.argwhere(iou >= self.iou_threshold), key=lambda pair: -iou[pair[0], pair[1]]):
+                track = self.tracks[t]
+                if d not in unmatched or track.frame == frame:
+                    continue
+                box = detections.boxes[d].astype(np.float32)
+                velocity = (box - track.box) / max(1, frame - track.frame)
+                track.velocity = self.smoothing * velocity + (1 - self.smoothing) * track.velocity
+                track.box, track.score, track.frame, track.misses = box, float(detections.scores[d]), frame, 0
+                ids[d] = track.track_id
+                unmatched.discard(d)
+
+        for track in self.tracks:
+            if track.frame != frame:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+
+        for d in sorted(unmatched):
+            track = _Track(self._next_id, detections.boxes[d], float(detections.scores[d]),
+                           int(detections.class_ids[d]), frame)
+            self._next_id += 1
+            self.tracks.append(track)
+            ids[d] = track.track_id
+        return ids
+
+    def predict(self, frame: int) -> Tuple[Detections, List[int]]:
+        """Boxes of the tracks seen on the last keyframe, extrapolated to ``frame``"""
+        live = [track for track in self.tracks if track.misses == 0]
+        if not live:
+            return Detections.empty(mock=self.mock), []
+        return (
+            Detections(
+                np.stack([track.predict(frame) for track in live]),
+                np.array([track.score for track in live], np.float32),
+                np.array([track.class_id for track in live], np.int64),
+                mock=self.mock,
+            ),
+            [track.track_id for track in live],
+        )
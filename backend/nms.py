@@ -0,0 +1,117 @@
+"""Non-maximum suppression on NumPy arrays, with class-aware and batched modes"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from postprocess import xyxy_to_xywh
+
+Candidates = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def nms_numpy(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = 0.45) -> np.ndarray:
+    """Greedy NMS over (N, 4) xyxy boxes.
+
+    Returns indices of the kept boxes in descending score order. A box is
+    suppressed when its IoU with an already kept box exceeds ``iou_threshold``.
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+    order = np.argsort(-scores, kind="stable")
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        inter_w = np.maximum(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0)
+        inter_h = np.maximum(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0)
+        inter = inter_w * inter_h
+        union = areas[i] + areas[rest] - inter
+        iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+        order = rest[iou <= iou_threshold]
+
+    return np.array(keep, np.int64)
+
+
+def nms_opencv(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = 0.45) -> np.ndarray:
+    """NMS through cv2.dnn.NMSBoxes, kept for comparison with the NumPy engine"""
+    if len(boxes) == 0:
+        return np.empty(0, np.int64)
+    keep = cv2.dnn.NMSBoxes(xyxy_to_xywh(boxes), scores.astype(np.float32), 0.0, iou_threshold)
+    return np.asarray(keep, np.int64).reshape(-1)
+
+
+NMS_BACKENDS: Dict[str, Callable[[np.ndarray, np.ndarray, float], np.ndarray]] = {
+    "numpy": nms_numpy,
+    "opencv": nms_opencv,
+}
+
+
+def top_k_indices(scores: np.ndarray, k: Optional[int]) -> np.ndarray:
+    """Indices of the ``k`` highest scores (all indices when k is None)"""
+    if k is None or k >= scores.shape[0]:
+        return np.arange(scores.shape[0])
+    return np.argpartition(-scores, k - 1)[:k]
+
+
+def batched_nms(candidates: List[Candidates], iou_threshold: float = 0.45, class_agnostic: bool = False,
+                pre_nms_top_k: Optional[int] = None, max_detections: Optional[int] = None,
+                backend: str = "numpy") -> List[np.ndarray]:
+    """Run NMS for many images in a single call.
+
+    ``candidates`` holds one ``(boxes, scores, labels)`` tuple per image.
+    Boxes from different images (and, unless ``class_agnostic``, different
+    classes) are shifted into disjoint coordinate ranges so one NMS pass
+    never lets them suppress each other. ``pre_nms_top_k`` caps the
+    candidates per image before NMS and ``max_detections`` caps the kept
+    boxes per image after it.
+
+    Returns one array of kept indices per image, in descending score order.
+    """
+    if backend not in NMS_BACKENDS:
+        raise ValueError(f"Unknown NMS backend '{backend}'. Choose from {sorted(NMS_BACKENDS)}")
+
+    selected = [top_k_indices(scores, pre_nms_top_k) for _, scores, _ in candidates]
+    counts = [len(indices) for indices in selected]
+    if sum(counts) == 0:
+        return [np.empty(0, np.int64) for _ in candidates]
+
+    boxes = np.concatenate([c[0][idx] for c, idx in zip(candidates, selected)]).astype(np.float64)
+    scores = np.concatenate([c[1][idx] for c, idx in zip(candidates, selected)])
+    labels = np.concatenate([c[2][idx] for c, idx in zip(candidates, selected)]).astype(np.int64)
+    image_ids = np.repeat(np.arange(len(candidates)), counts)
+
+    if class_agnostic:
+        groups = image_ids
+    else:
+        groups = image_ids * (labels.max() + 1) + labels
+
+    span = boxes.max() - boxes.min() + 1
+    shifted = boxes - boxes.min() + (groups * span)[:, None]
+    keep = NMS_BACKENDS[backend](shifted, scores, iou_threshold)
+
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    kept_images = image_ids[keep]
+    results = []
+    for image_id, indices in enumerate(selected):
+        kept = keep[kept_images == image_id] - starts[image_id]
+        if max_detections is not None:
+            kept = kept[:max_detections]
+        results.append(indices[kept])
+    return results
+
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU matrix of shape (len(boxes_a), len(boxes_b)) for xyxy boxes"""
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.maximum(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0)
+    inter_h = np.maximum(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0)
+    inter = inter_w * inter_h
+    area_a = np.maximum(a[..., 2] - a[..., 0], 0) * np.maximum(a[..., 3] - a[..., 1], 0)
+    area_b = np.maximum(b[..., 2] - b[..., 0], 0) * np.maximum(b[..., 3] - b[..., 1], 0)
+    union = area_a + area_b - inter
+    return np.divide(inter, union, out=np.zeros_like(inter, dtype=np.float64), where=union > 0)
@@ -0,0 +1,136 @@
+"""Staged per-image processing pipeline with bounded, observable stages"""
+import asyncio
+import functools
+import math
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from admission import Overloaded
+
+T = TypeVar("T")
+
+
+class StageFull(Overloaded):
+    """A stage already had ``queue_limit`` callers waiting for a slot"""
+
+
+class PipelineStage:
+    """One pipeline stage: a worker pool behind a bounded admission gate.
+
+    At most ``capacity`` items are handed to the stage's executor at once;
+    further callers wait on the event loop without consuming a thread, and
+    the number waiting is the stage's backpressure signal. Once
+    ``queue_limit`` callers are waiting, new ones are rejected with
+    StageFull rather than queued; ``None`` leaves the queue unbounded.
+    """
+
+    def __init__(self, name: str, executor: Executor, capacity: int, owns_executor: bool = False,
+                 queue_limit: Optional[int] = None):
+        self.name = name
+        self.executor = executor
+        self.capacity = max(1, capacity)
+        self.owns_executor = owns_executor
+        self.queue_limit = None if queue_limit is None else max(0, queue_limit)
+        self._slots = asyncio.Semaphore(self.capacity)
+
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """Run a blocking function on this stage's executor"""
+        loop = asyncio.get_running_loop()
+        return await self.wrap(lambda: loop.run_in_executor(self.executor, functools.partial(func, *args)))
+
+    async def wrap(self, start: Callable[[], Awaitable[T]]) -> T:
+        """Account an awaitable (e.g. a batcher submission) against this stage"""
+        if self.queue_limit is not None and self.waiting >= self.queue_limit and self._slots.locked():
+            self.rejected += 1
+            raise StageFull(f"Server is at capacity; the {self.name} stage queue is full", "stage_full",
+                            self.retry_after())
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.perf_counter()
+        self.total_wait += started_at - queued_at
+        self.active += 1
+        try:
+            result = await start()
+        except BaseException:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+            return result
+        finally:
+            self.active -= 1
+            self.total_run += time.perf_counter() - started_at
+            self._slots.release()
+
+    def retry_after(self) -> int:
+        """Seconds for the current queue to drain at the stage's average run time"""
+        finished = self.completed + self.failed
+        average = self.total_run / finished if finished else 1.0
+        return max(1, math.ceil(average * (self.waiting / self.capacity + 1)))
+
+    def stats(self) -> dict:
+        finished = self.completed + self.failed
+        return {
+            "capacity": self.capacity,
+            "queue_limit": self.queue_limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_ms": self.total_wait / finished * 1000 if finished else 0.0,
+            "avg_run_ms": self.total_run / finished * 1000 if finished else 0.0,
+        }
+
+
+class DetectionPipeline:
+    """decode -> preprocess -> infer -> postprocess -> encode
+
+    Each CPU stage gets its own thread pool so a burst of expensive encodes
+    cannot starve decoding (OpenCV releases the GIL in imdecode, resize and
+    imencode). The infer stage shares the caller's executor, since model
+    calls are already coalesced by the batcher or worker pool. Every stage
+    rejects callers beyond ``queue_limit`` waiting ones.
+    """
+
+    STAGES = ("decode", "preprocess", "infer", "postprocess", "encode")
+
+    def __init__(self, threads: Dict[str, int], infer_executor: Executor, infer_capacity: int = 64,
+                 queue_limit: Optional[int] = None):
+        self.stages: Dict[str, PipelineStage] = {}
+        for name in self.STAGES:
+            if name == "infer":
+                self.stages[name] = PipelineStage(name, infer_executor, infer_capacity, queue_limit=queue_limit)
+                continue
+            count = max(1, threads.get(name, 2))
+            pool = ThreadPoolExecutor(max_workers=count, thread_name_prefix=f"pipeline-{name}")
+            self.stages[name] = PipelineStage(name, pool, count, owns_executor=True, queue_limit=queue_limit)
+
+    def __getitem__(self, name: str) -> PipelineStage:
+        return self.stages[name]
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: stage.stats() for name, stage in self.stages.items()}
+
+    def shutdown(self, wait: bool = True) -> None:
+        for stage in self.stages.values():
+            if stage.owns_executor:
+                stage.executor.shutdown(wait=wait)
+
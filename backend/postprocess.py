@@ -0,0 +1,67 @@
+"""Vectorized decoding of YOLO detection outputs"""
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class Detections(NamedTuple):
+    """Boxes kept for one image: (N, 4) xyxy boxes, (N,) scores and (N,) class ids"""
+    boxes: np.ndarray
+    scores: np.ndarray
+    class_ids: np.ndarray
+    mock: bool = False
+
+    @classmethod
+    def empty(cls, mock: bool = False) -> "Detections":
+        return cls(np.empty((0, 4), np.float32), np.empty(0, np.float32), np.empty(0, np.int64), mock)
+
+    def scaled(self, scale_x: float, scale_y: float) -> "Detections":
+        """Copy with boxes rescaled, e.g. from a thumbnail to the original image"""
+        boxes = self.boxes * np.array([scale_x, scale_y, scale_x, scale_y], np.float32)
+        return self._replace(boxes=boxes)
+
+
+def decode_predictions(output: np.ndarray, scale: float = 1.0, conf_threshold: float = 0.70,
+                       class_ids: Optional[Sequence[int]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Turn one image's (4+C, A) model output into candidate boxes.
+
+    Each of the A columns holds ``cx, cy, w, h`` followed by C class scores.
+    Columns whose best class score is below ``conf_threshold``, or whose best
+    class is not listed in ``class_ids``, are dropped. Surviving boxes are
+    converted to ``x1, y1, x2, y2`` and multiplied by ``scale`` to map them
+    back to image coordinates.
+
+    Returns ``(boxes, scores, labels)`` arrays of shape (N, 4), (N,) and (N,),
+    where ``labels`` indexes into ``class_ids`` (or the raw class index when
+    ``class_ids`` is None).
+    """
+    class_scores = output[4:]
+    best_class = class_scores.argmax(axis=0)
+    best_score = np.take_along_axis(class_scores, best_class[None, :], axis=0)[0]
+
+    mask = best_score >= conf_threshold
+    if class_ids is not None:
+        lookup = np.full(class_scores.shape[0], -1, np.int64)
+        valid = [class_id for class_id in class_ids if 0 <= class_id < class_scores.shape[0]]
+        lookup[valid] = [list(class_ids).index(class_id) for class_id in valid]
+        labels = lookup[best_class]
+        mask &= labels >= 0
+    else:
+        labels = best_class
+
+    cx, cy, w, h = output[:4, mask]
+    boxes = np.empty((cx.shape[0], 4), np.float32)
+    boxes[:, 0] = cx - 0.5 * w
+    boxes[:, 1] = cy - 0.5 * h
+    boxes[:, 2] = cx + 0.5 * w
+    boxes[:, 3] = cy + 0.5 * h
+    boxes *= scale
+
+    return boxes, best_score[mask].astype(np.float32), labels[mask]
+
+
+def xyxy_to_xywh(boxes: np.ndarray) -> np.ndarray:
+    """Convert (N, 4) corner boxes to top-left/width/height boxes"""
+    converted = boxes.copy()
+    converted[:, 2:] -= boxes[:, :2]
+    return converted
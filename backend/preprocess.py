@@ -0,0 +1,104 @@
+"""Letterbox preprocessing into reusable float32 NCHW input buffers"""
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+import cv2
+import numpy as np
+
+# Square input resolution expected by the YOLO export
+INPUT_SIZE = 640
+
+_INV_255 = np.float32(1 / 255)
+
+
+def letterbox_into(image: np.ndarray, out: np.ndarray, size: int = INPUT_SIZE) -> float:
+    """Letterbox a BGR HxWx3 image into a 3xSxS float32 view and return its scale.
+
+    The image is resized straight to its letterboxed size (longest side =
+    ``size``) and written into the top-left of ``out``; the padding on the
+    right or bottom is zeroed. BGR->RGB, the 1/255 scaling and HWC->CHW
+    happen in a single ufunc pass, so the only temporary is the resized
+    uint8 image. The returned factor maps model coordinates back to image
+    coordinates, matching the old square-canvas + blobFromImage path.
+    """
+    height, width = image.shape[:2]
+    scale = max(height, width) / size
+    new_width = min(size, max(1, round(width / scale)))
+    new_height = min(size, max(1, round(height / scale)))
+
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+    np.multiply(image[:, :, ::-1].transpose(2, 0, 1), _INV_255,
+                out=out[:, :new_height, :new_width], casting="unsafe")
+    out[:, new_height:, :] = 0
+    out[:, :new_height, new_width:] = 0
+    return scale
+
+
+def letterbox(image: np.ndarray, size: int = INPUT_SIZE) -> Tuple[np.ndarray, float]:
+    """Letterbox one image into a fresh 1x3xSxS blob; returns the blob and scale"""
+    blob = np.empty((1, 3, size, size), np.float32)
+    return blob, letterbox_into(image, blob[0], size)
+
+
+def letterbox_batch(images: List[np.ndarray], out: np.ndarray, size: int = INPUT_SIZE) -> List[float]:
+    """Letterbox images into consecutive rows of an Nx3xSxS buffer"""
+    return [letterbox_into(image, out[i], size) for i, image in enumerate(images)]
+
+
+class InputBufferPool:
+    """Preallocated Nx3xSxS float32 input tensors, one per concurrent batch slot.
+
+    Buffers are created on first use up to ``slots`` and then recycled, so
+    steady-state inference allocates no input tensors. When every slot is
+    busy (or a batch exceeds ``batch_size``) a temporary tensor is handed
+    out instead of blocking, and counted in ``stats``.
+    """
+
+    def __init__(self, slots: int, batch_size: int, size: int = INPUT_SIZE):
+        self.slots = max(1, slots)
+        self.batch_size = max(1, batch_size)
+        self.size = size
+        self._free: "queue.LifoQueue[np.ndarray]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.acquired = 0
+        self.overflow = 0
+
+    def _take(self, count: int):
+        with self._lock:
+            self.acquired += 1
+            if count <= self.batch_size:
+                try:
+                    return self._free.get_nowait()
+                except queue.Empty:
+                    if self.created < self.slots:
+                        self.created += 1
+                        return np.zeros((self.batch_size, 3, self.size, self.size), np.float32)
+            self.overflow += 1
+            return None
+
+    @contextmanager
+    def acquire(self, count: int) -> Iterator[np.ndarray]:
+        """Yield a ``count``x3xSxS view that is valid until the block exits"""
+        buffer = self._take(count)
+        if buffer is None:
+            yield np.empty((count, 3, self.size, self.size), np.float32)
+            return
+        try:
+            yield buffer[:count]
+        finally:
+            self._free.put(buffer)
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.slots,
+            "batch_size": self.batch_size,
+            "created": self.created,
+            "acquired": self.acquired,
+            "overflow": self.overflow,
+            "bytes": self.created * self.batch_size * 3 * self.size * self.size * 4,
+        }
@@ -0,0 +1,126 @@
+"""INT8 and FP16 variants of the FP32 detection model"""
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from preprocess import letterbox
+
+# Variant name -> suffix inserted before ".onnx" (best.onnx -> best.int8.onnx)
+MODEL_VARIANTS: Dict[str, str] = {
+    "fp32": "",
+    "int8": ".int8",
+    "fp16": ".fp16",
+}
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def variant_path(model_path, variant: str) -> Path:
+    """File holding ``variant`` of the model at ``model_path``"""
+    if variant not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant '{variant}'. Choose from {sorted(MODEL_VARIANTS)}")
+    model_path = Path(model_path)
+    return model_path.with_name(f"{model_path.stem}{MODEL_VARIANTS[variant]}{model_path.suffix}")
+
+
+def load_images(image_dir, limit: Optional[int] = None) -> List[np.ndarray]:
+    """Read the images in ``image_dir`` in name order, skipping unreadable files"""
+    images = []
+    for path in sorted(Path(image_dir).iterdir()):
+        if path.suffix.lower() not in IMAGE_EXTENSIONS:
+            continue
+        image = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if image is not None:
+            images.append(image)
+        if limit is not None and len(images) >= limit:
+            break
+    return images
+
+
+def _calibration_reader(input_name: str, images: Sequence[np.ndarray]):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class LetterboxCalibrationReader(CalibrationDataReader):
+        """Feeds calibration images through the same letterbox as serving"""
+
+        def __init__(self):
+            self._blobs: Iterator[np.ndarray] = (letterbox(image)[0] for image in images)
+
+        def get_next(self) -> Optional[dict]:
+            blob = next(self._blobs, None)
+            return None if blob is None else {input_name: blob}
+
+    return LetterboxCalibrationReader()
+
+
+def quantize_int8_dynamic(model_path, output_path) -> Path:
+    """Quantize weights to INT8; activations are quantized on the fly at run time"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    # ConvInteger on CPU only accepts uint8 weights
+    quantize_dynamic(str(model_path), str(output_path), weight_type=QuantType.QUInt8)
+    return Path(output_path)
+
+
+def quantize_int8_static(model_path, output_path, images: Sequence[np.ndarray],
+                         method: str = "minmax", per_channel: bool = True,
+                         exclude_nodes: Sequence[str] = (), preprocess: bool = True) -> Path:
+    """Quantize weights and activations to INT8 with ranges calibrated on ``images``.
+
+    The graph is written in QDQ format, which ONNX Runtime fuses into integer
+    kernels on CPU. ``exclude_nodes`` keeps sensitive nodes (typically the
+    final box-decoding ops of the detection head) in FP32.
+    """
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    methods = {
+        "minmax": CalibrationMethod.MinMax,
+        "entropy": CalibrationMethod.Entropy,
+        "percentile": CalibrationMethod.Percentile,
+    }
+    if method not in methods:
+        raise ValueError(f"Unknown calibration method '{method}'. Choose from {sorted(methods)}")
+    if not images:
+        raise ValueError("Static quantization needs at least one calibration image")
+
+    model_path, output_path = Path(model_path), Path(output_path)
+    source = model_path
+    if preprocess:
+        # ONNX shape inference and graph cleanup give the quantizer more nodes it can
+        # handle; symbolic shape inference only matters for transformer graphs
+        source = output_path.with_name(f"{output_path.stem}.preprocessed.onnx")
+        quant_pre_process(str(model_path), str(source), skip_symbolic_shape=True)
+
+    input_name = ort.InferenceSession(str(source), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    try:
+        quantize_static(
+            str(source),
+            str(output_path),
+            _calibration_reader(input_name, images),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=per_channel,
+            calibrate_method=methods[method],
+            nodes_to_exclude=list(exclude_nodes),
+        )
+    finally:
+        if source != model_path:
+            source.unlink(missing_ok=True)
+    logging.info(f"Calibrated {output_path} on {len(images)} images ({method})")
+    return output_path
+
+
+def convert_fp16(model_path, output_path) -> Path:
+    """Store weights and compute in FP16 while keeping FP32 inputs and outputs"""
+    import onnx
+    from onnxruntime.transformers.float16 import convert_float_to_float16
+
+    model = convert_float_to_float16(onnx.load(str(model_path)), keep_io_types=True)
+    onnx.save(model, str(output_path))
+    return Path(output_path)
@@ -0,0 +1,198 @@
+"""Content-addressed cache of detection results with a byte-bounded LRU and disk tier"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+def content_digest(content: bytes) -> bytes:
+    """Fast 128-bit hash of the raw upload bytes"""
+    return hashlib.blake2b(content, digest_size=16).digest()
+
+
+def cache_key(digest: bytes, namespace: str) -> str:
+    """Key for a content digest under a configuration ``namespace`` (model, thresholds, ...)"""
+    return hashlib.blake2b(digest + namespace.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def dump_result(value: dict) -> bytes:
+    """JSON for a result whose encoded images are raw ``bytes``"""
+    def encode(obj):
+        if isinstance(obj, bytes):
+            return {"__bytes__": base64.b64encode(obj).decode("ascii")}
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    return json.dumps(value, default=encode).encode("utf-8")
+
+
+def load_result(payload: bytes) -> dict:
+    """Inverse of ``dump_result``"""
+    def decode(obj: dict):
+        if obj.keys() == {"__bytes__"}:
+            return base64.b64decode(obj["__bytes__"])
+        return obj
+
+    return json.loads(payload, object_hook=decode)
+
+
+class ResultCache:
+    """LRU of results (JSON values plus raw image ``bytes``), bounded by serialized size.
+
+    Entries evicted from memory stay on disk when ``disk_dir`` is set; the
+    disk tier is bounded separately and evicts least recently used files.
+    ``get(key, memory_only=True)`` never touches the filesystem, so it is
+    safe to call on the event loop; full lookups and ``put`` (which
+    serializes the value) should run on an executor. All methods are
+    thread-safe.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: int = 0):
+        self.max_bytes = max(0, max_bytes)
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = max(0, disk_max_bytes)
+        self._entries: "OrderedDict[str, Tuple[dict, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.disk_bytes = 0
+        self._disk_files: "OrderedDict[Path, int]" = OrderedDict()
+
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._scan_disk()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or self.disk_dir is not None
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _scan_disk(self) -> None:
+        files = sorted(self.disk_dir.glob("*/*.json"), key=lambda path: path.stat().st_mtime)
+        for path in files:
+            size = path.stat().st_size
+            self._disk_files[path] = size
+            self.disk_bytes += size
+        logging.info(f"Result cache disk tier: {len(files)} entries, {self.disk_bytes / 1e6:.1f} MB in {self.disk_dir}")
+
+    def get(self, key: str, memory_only: bool = False) -> Optional[dict]:
+        """Cached result for ``key``, or None.
+
+        A memory-only lookup that misses is not counted when a disk tier
+        exists, since the caller is expected to follow up with a full one.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+            if self.disk_dir is None:
+                self.misses += 1
+                return None
+            if memory_only:
+                return None
+
+        found = self._read_disk(key)
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        value, size = found
+        self._remember(key, value, size)
+        return value
+
+    def put(self, key: str, value: dict) -> None:
+        """Store ``value`` in memory and, when configured, on disk"""
+        payload = dump_result(value)
+        self._remember(key, value, len(payload))
+        if self.disk_dir is not None:
+            self._write_disk(key, payload)
+
+    def _remember(self, key: str, value: dict, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def _read_disk(self, key: str) -> Optional[Tuple[dict, int]]:
+        path = self._disk_path(key)
+        try:
+            payload = path.read_bytes()
+            value = load_result(payload)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding unreadable result cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        with self._lock:
+            if path in self._disk_files:
+                self._disk_files.move_to_end(path)
+        return value, len(payload)
+
+    def _write_disk(self, key: str, payload: bytes) -> None:
+        if len(payload) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            temp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            temp.write_bytes(payload)
+            os.replace(temp, path)
+        except OSError as e:
+            logging.warning(f"Failed to write result cache entry {path}: {e}")
+            return
+
+        with self._lock:
+            self.disk_bytes += len(payload) - self._disk_files.pop(path, 0)
+            self._disk_files[path] = len(payload)
+            evict = []
+            while self.disk_bytes > self.disk_max_bytes and self._disk_files:
+                old_path, old_size = self._disk_files.popitem(last=False)
+                self.disk_bytes -= old_size
+                self.disk_evictions += 1
+                evict.append(old_path)
+        for old_path in evict:
+            old_path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "disk": {
+                "dir": str(self.disk_dir),
+                "entries": len(self._disk_files),
+                "bytes": self.disk_bytes,
+                "max_bytes": self.disk_max_bytes,
+                "evictions": self.disk_evictions,
+            } if self.disk_dir is not None else None,
+        }
@@ -1,24 +1,53 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Depends, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import HTTPConnection
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Dict, List, Literal, Optional, Sequence, Union
 import uuid
+import hmac
+import json
+import math
+import random
+import re
+import threading
+import time
 from datetime import datetime
 import cv2
+from PIL import Image as PILImage, UnidentifiedImageError
 import numpy as np
 import base64
 import tempfile
 import aiofiles
 import asyncio
+import functools
 import zipfile
 import io
 from concurrent.futures import ThreadPoolExecutor
-import onnxruntime as ort
+
+from admission import AdmissionController, Overloaded, RateLimiter
+from batcher import DynamicBatcher
+from image_store import ImageStore
+from inference import infer_images
+from jobs import TERMINAL_STATES, JobScheduler, JobStore, QueueFull
+from metrics import MetricsRegistry
+from model_registry import LoadedModel, ModelRegistry, model_fingerprint, read_class_names
+from motion import BoxTracker, MotionGate
+from nms import NMS_BACKENDS, batched_nms
+from pipeline import DetectionPipeline
+from postprocess import Detections, decode_predictions
+from preprocess import INPUT_SIZE, InputBufferPool, letterbox
+from quantization import MODEL_VARIANTS, variant_path
+from result_cache import ResultCache, cache_key, content_digest
+from session_config import benchmark_session, create_session, session_config_from_env
+from tiling import merge_candidates, offset_candidates, slice_image
+from video import AnnotatedVideoWriter, VideoFrameReader
+from workers import InferenceWorkerPool
+from zipstream import ZipStreamWriter
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -33,33 +62,497 @@ app = FastAPI(
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Initialize ONNX model
+# Initialize ONNX model. MODEL_PATH is served as the "default" model unless
+# MODELS lists named models as name=path pairs relative to MODELS_DIR, e.g.
+# MODELS=fast=yolov8n.onnx,accurate=yolov8l.onnx. DEFAULT_MODEL names the
+# model for requests that don't pick one (the first listed by default).
 MODEL_PATH = ROOT_DIR / "best.onnx"
+MODELS_DIR = Path(os.environ.get('MODELS_DIR', ROOT_DIR))
+MODELS = os.environ.get('MODELS', '')
+
+# Class names for models without names metadata, and for mock detection
 CLASSES = ["knife"]
-CLASS_IDS = [0]
-colors = np.random.uniform(0, 255, size=(len(CLASSES), 3))
 
-# Thread pool for CPU-intensive tasks
-executor = ThreadPoolExecutor(max_workers=4)
+def configured_models() -> Dict[str, Path]:
+    """Models to load at startup, by name"""
+    if not MODELS:
+        return {"default": MODEL_PATH}
+    models = {}
+    for entry in MODELS.split(','):
+        name, _, path = entry.strip().partition('=')
+        if not name or not path:
+            raise ValueError(f"Invalid MODELS entry '{entry}'. Expected name=path")
+        models[name.strip()] = MODELS_DIR / path.strip()
+    return models
+
+DEFAULT_MODEL = os.environ.get('DEFAULT_MODEL') or next(iter(configured_models()))
+
+# Zero-tensor runs per batch size before a model takes traffic
+MODEL_WARMUP_RUNS = int(os.environ.get('MODEL_WARMUP_RUNS', '1'))
+
+# Poll model files every MODEL_RELOAD_INTERVAL seconds and hot-swap changed ones; 0 disables
+MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', '0'))
+
+# /api/models/{name}/reload requires this value in the X-Admin-Token header, and is disabled while it is unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+# Model variants (fp32, int8, fp16; see tools/quantize_model.py). MODEL_VARIANT
+# serves requests that don't ask for one; MODEL_VARIANTS lists everything loaded.
+MODEL_VARIANT = os.environ.get('MODEL_VARIANT', 'fp32')
+MODEL_VARIANTS_ENABLED = [v.strip() for v in os.environ.get('MODEL_VARIANTS', MODEL_VARIANT).split(',') if v.strip()]
+for _variant in set(MODEL_VARIANTS_ENABLED) | {MODEL_VARIANT}:
+    if _variant not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant '{_variant}'. Choose from {sorted(MODEL_VARIANTS)}")
+if MODEL_VARIANT not in MODEL_VARIANTS_ENABLED:
+    MODEL_VARIANTS_ENABLED.insert(0, MODEL_VARIANT)
+
+# ONNX Runtime session tuning (ORT_PROFILE and ORT_* overrides)
+SESSION_CONFIG = session_config_from_env()
+ORT_STARTUP_BENCHMARK_RUNS = int(os.environ.get('ORT_STARTUP_BENCHMARK_RUNS', '0'))
+
+# Thread pool for CPU-intensive tasks; large enough for the profile's concurrent model runs
+executor = ThreadPoolExecutor(max_workers=max(4, SESSION_CONFIG.concurrent_runs))
+
+# Images stacked into a single model_session.run call by the batch endpoints
+INFERENCE_BATCH_SIZE = int(os.environ.get('INFERENCE_BATCH_SIZE', '16'))
+
+# Reusable input tensors for batch-endpoint inference, one per concurrent model run
+input_buffers = InputBufferPool(SESSION_CONFIG.concurrent_runs, INFERENCE_BATCH_SIZE)
+
+# Dynamic micro-batching of concurrent single-image requests
+BATCHER_ENABLED = os.environ.get('BATCHER_ENABLED', 'true').lower() == 'true'
+BATCHER_MAX_BATCH_SIZE = int(os.environ.get('BATCHER_MAX_BATCH_SIZE', '8'))
+BATCHER_MAX_WAIT_MS = float(os.environ.get('BATCHER_MAX_WAIT_MS', '5'))
+
+# Images processed concurrently by the streaming batch endpoint
+STREAM_CONCURRENCY = int(os.environ.get('STREAM_CONCURRENCY', '8'))
+
+# Upper bound on images per streamed ZIP download
+ZIP_MAX_FILES = int(os.environ.get('ZIP_MAX_FILES', '500'))
+
+# Width frames are resized to before detection; 0 detects on the native frame
+# (letterboxed straight to the model input). 300 reproduces the old behaviour
+# of detecting on the preview. Overridable per request.
+INFERENCE_WIDTH = int(os.environ.get('INFERENCE_WIDTH', '0'))
+
+# Width of the original/processed thumbnails returned for display
+PREVIEW_WIDTH = int(os.environ.get('PREVIEW_WIDTH', '300'))
+
+# Sliced inference for large frames: overlapping TILE_SIZE tiles plus (optionally)
+# the whole frame, merged with global NMS. Tiles whose pixel std-dev is below
+# TILE_SKIP_STD are skipped as blank; 0 runs every tile.
+TILING_ENABLED = os.environ.get('TILING_ENABLED', 'false').lower() == 'true'
+TILE_SIZE = int(os.environ.get('TILE_SIZE', '640'))
+TILE_OVERLAP = float(os.environ.get('TILE_OVERLAP', '0.2'))
+TILE_SKIP_STD = float(os.environ.get('TILE_SKIP_STD', '4'))
+TILE_FULL_FRAME = os.environ.get('TILE_FULL_FRAME', 'true').lower() == 'true'
+
+# Two-stage cascade: a CASCADE_SIZE screening pass rejects images whose best class
+# score is below CASCADE_THRESHOLD before the full-resolution detector runs.
+# CASCADE_MODEL names a registered (smaller) detector to screen with; empty screens
+# with the requested model itself, which needs an export with dynamic input size.
+CASCADE_ENABLED = os.environ.get('CASCADE_ENABLED', 'false').lower() == 'true'
+CASCADE_SIZE = int(os.environ.get('CASCADE_SIZE', '320'))
+CASCADE_THRESHOLD = float(os.environ.get('CASCADE_THRESHOLD', '0.25'))
+CASCADE_MODEL = os.environ.get('CASCADE_MODEL', '')
+# Fraction of rejected images still run through the full detector to estimate lost recall
+CASCADE_AUDIT_RATE = float(os.environ.get('CASCADE_AUDIT_RATE', '0.05'))
+screen_buffers = InputBufferPool(SESSION_CONFIG.concurrent_runs, INFERENCE_BATCH_SIZE, CASCADE_SIZE)
+
+# Video uploads: size and frame caps, and where annotated output videos are kept
+VIDEO_MAX_BYTES = int(float(os.environ.get('VIDEO_MAX_MB', '500')) * 1024 * 1024)
+VIDEO_MAX_FRAMES = int(os.environ.get('VIDEO_MAX_FRAMES', '10000'))
+VIDEO_OUTPUT_DIR = Path(os.environ.get('VIDEO_OUTPUT_DIR', Path(tempfile.gettempdir()) / 'knife-detection-videos'))
+VIDEO_OUTPUT_TTL = int(os.environ.get('VIDEO_OUTPUT_TTL', '3600'))
+
+# Motion gating for video: frames whose difference from the last keyframe (largest
+# mean abs difference of an 8x8 grid over a 64px grayscale thumbnail, 0-255) stays
+# below MOTION_THRESHOLD reuse the tracked boxes instead of running the model;
+# a keyframe is forced after MOTION_MAX_SKIP skipped frames
+MOTION_GATING_ENABLED = os.environ.get('MOTION_GATING_ENABLED', 'true').lower() == 'true'
+MOTION_THRESHOLD = float(os.environ.get('MOTION_THRESHOLD', '4.0'))
+MOTION_MAX_SKIP = int(os.environ.get('MOTION_MAX_SKIP', '30'))
+
+# Encoding of result images: png, jpeg or webp. OUTPUT_QUALITY applies to
+# JPEG/WebP, PNG_COMPRESSION (0-9) trades PNG size for encode time
+OUTPUT_FORMAT = os.environ.get('OUTPUT_FORMAT', 'png')
+OUTPUT_QUALITY = int(os.environ.get('OUTPUT_QUALITY', '90'))
+PNG_COMPRESSION = int(os.environ.get('PNG_COMPRESSION', '1'))
 
-# Global model session
-model_session = None
+# Result images requested by URL are held in memory for IMAGE_STORE_TTL seconds
+IMAGE_STORE_BYTES = int(float(os.environ.get('IMAGE_STORE_MB', '128')) * 1024 * 1024)
+IMAGE_STORE_TTL = int(os.environ.get('IMAGE_STORE_TTL', '300'))
 
-def initialize_model():
-    """Initialize the ONNX model session"""
-    global model_session
+# File extension and media type per output format
+IMAGE_FORMATS = {
+    "png": (".png", "image/png"),
+    "jpeg": (".jpg", "image/jpeg"),
+    "webp": (".webp", "image/webp"),
+}
+
+# Largest binary frame accepted on the detection WebSocket
+WS_MAX_FRAME_BYTES = int(float(os.environ.get('WS_MAX_FRAME_MB', '10')) * 1024 * 1024)
+
+# Asynchronous batch jobs: uploads, results and the SQLite job index live under
+# JOBS_DIR; finished jobs are deleted after JOBS_TTL seconds
+JOBS_DIR = Path(os.environ.get('JOBS_DIR', Path(tempfile.gettempdir()) / 'knife-detection-jobs'))
+JOBS_MAX_FILES = int(os.environ.get('JOBS_MAX_FILES', '10000'))
+JOBS_MAX_QUEUED = int(os.environ.get('JOBS_MAX_QUEUED', '100'))
+JOBS_TTL = int(os.environ.get('JOBS_TTL', '86400'))
+
+# Jobs run one at a time by default, each keeping JOBS_ITEM_CONCURRENCY images in flight
+JOBS_CONCURRENCY = int(os.environ.get('JOBS_CONCURRENCY', '1'))
+JOBS_ITEM_CONCURRENCY = int(os.environ.get('JOBS_ITEM_CONCURRENCY', '8'))
+
+# Admission control: images, and the bytes of their decoded frames (width x height x 3,
+# read from the image header), processed at once across all requests. Work beyond the budget waits (single images ahead of batches) for up to
+# ADMISSION_QUEUE_TIMEOUT seconds, and is answered with 503 + Retry-After once
+# ADMISSION_MAX_QUEUED images are already waiting. Bulk requests (batches, streams,
+# videos, jobs) may fill at most ADMISSION_BULK_SHARE of the image budget.
+ADMISSION_MAX_IMAGES = int(os.environ.get('ADMISSION_MAX_IMAGES', '64'))
+ADMISSION_MAX_BYTES = int(float(os.environ.get('ADMISSION_MAX_MB', '1024')) * 1024 * 1024)
+ADMISSION_MAX_QUEUED = int(os.environ.get('ADMISSION_MAX_QUEUED', '256'))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '10'))
+ADMISSION_BULK_SHARE = float(os.environ.get('ADMISSION_BULK_SHARE', '0.75'))
+
+# Per-client token bucket in images per second (0 disables); clients are told apart
+# by their X-API-Key header, else their address. Limited requests get 429 + Retry-After.
+RATE_LIMIT_PER_SEC = float(os.environ.get('RATE_LIMIT_PER_SEC', '0'))
+RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', '20'))
+
+# Default NMS implementation, overridable per request
+NMS_BACKEND = os.environ.get('NMS_BACKEND', 'numpy')
+if NMS_BACKEND not in NMS_BACKENDS:
+    raise ValueError(f"Unknown NMS_BACKEND '{NMS_BACKEND}'. Choose from {sorted(NMS_BACKENDS)}")
+
+# Optional multi-process inference; 0 keeps inference in this process
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', '0'))
+INFERENCE_WORKER_THREADS = int(os.environ.get('INFERENCE_WORKER_THREADS', '0')) or None
+
+# Results cached by upload content + model/threshold configuration; 0 MB disables
+# the memory tier, RESULT_CACHE_DIR adds a disk tier bounded by RESULT_CACHE_DISK_MB
+result_cache = ResultCache(
+    int(float(os.environ.get('RESULT_CACHE_MB', '256')) * 1024 * 1024),
+    disk_dir=os.environ.get('RESULT_CACHE_DIR') or None,
+    disk_max_bytes=int(float(os.environ.get('RESULT_CACHE_DISK_MB', '2048')) * 1024 * 1024),
+)
+
+image_store = ImageStore(IMAGE_STORE_BYTES, IMAGE_STORE_TTL)
+
+admission = AdmissionController(
+    ADMISSION_MAX_IMAGES,
+    ADMISSION_MAX_BYTES,
+    ADMISSION_MAX_QUEUED,
+    bulk_share=ADMISSION_BULK_SHARE,
+    on_reject=lambda reason, lane: ADMISSION_REJECTIONS.inc(reason=reason, lane=lane),
+)
+rate_limiter = RateLimiter(RATE_LIMIT_PER_SEC, RATE_LIMIT_BURST) if RATE_LIMIT_PER_SEC > 0 else None
+
+# Thread counts for the CPU stages of the per-image pipeline
+PIPELINE_THREADS = {
+    'decode': int(os.environ.get('PIPELINE_DECODE_THREADS', '4')),
+    'preprocess': int(os.environ.get('PIPELINE_PREPROCESS_THREADS', '2')),
+    'postprocess': int(os.environ.get('PIPELINE_POSTPROCESS_THREADS', '2')),
+    'encode': int(os.environ.get('PIPELINE_ENCODE_THREADS', '4')),
+}
+# Callers allowed to wait on each pipeline stage before new ones get 503 + Retry-After
+# (0 disables the bound). Admission already caps images in flight, so keep this above
+# ADMISSION_MAX_IMAGES; it guards against work that reaches the stages around admission.
+PIPELINE_QUEUE_LIMIT = int(os.environ.get('PIPELINE_QUEUE_LIMIT', '256'))
+
+# Loaded models by name and variant; each request pins one via DetectionParams.loaded_model
+model_registry = ModelRegistry(DEFAULT_MODEL, MODEL_VARIANT)
+model_watcher: Optional[asyncio.Task] = None
+pipeline: Optional[DetectionPipeline] = None
+startup_benchmark: Optional[dict] = None
+job_store: Optional[JobStore] = None
+job_scheduler: Optional[JobScheduler] = None
+tiling_stats = {'frames': 0, 'tiles_run': 0, 'tiles_skipped': 0}
+# Frames are tiled on executor threads, so updates hold this lock
+tiling_lock = threading.Lock()
+cascade_stats = {'screened': 0, 'passed': 0, 'passed_positive': 0, 'rejected': 0, 'audited': 0, 'audit_misses': 0}
+# Screening decisions are counted on executor threads, so updates hold this lock
+cascade_lock = threading.Lock()
+video_stats = {'videos': 0, 'frames': 0, 'keyframes': 0}
+ws_stats = {'active_connections': 0, 'connections': 0, 'frames_received': 0, 'frames_processed': 0, 'frames_dropped': 0}
+
+# Prometheus metrics served at /api/metrics
+metrics = MetricsRegistry()
+STAGE_SECONDS = metrics.histogram(
+    "knife_stage_seconds",
+    "Time per processing stage: upload_read, decode, resize, preprocess, screen, inference, postprocess, draw, encode",
+    ["stage"],
+)
+MODEL_BATCH_SIZE = metrics.histogram(
+    "knife_model_batch_size", "Images per model call", ["model"], buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+DETECTIONS_PER_IMAGE = metrics.histogram(
+    "knife_detections_per_image", "Boxes returned per processed image", buckets=(0, 1, 2, 3, 5, 10, 20, 50),
+)
+MOCK_FALLBACKS = metrics.counter(
+    "knife_mock_fallbacks_total", "Images answered with mock detections (no_model or error)", ["reason"],
+)
+for reason in ("no_model", "error"):
+    MOCK_FALLBACKS.inc(0, reason=reason)
+CASCADE_DECISIONS = metrics.counter(
+    "knife_cascade_decisions_total", "Images screened by the cascade: pass, reject, or audit (rejected but checked)", ["decision"],
+)
+CASCADE_AUDIT_MISSES = metrics.counter(
+    "knife_cascade_audit_misses_total", "Audited rejections in which the full detector found a knife",
+)
+HTTP_REQUESTS = metrics.counter("knife_http_requests_total", "API requests by route and status", ["method", "route", "status"])
+HTTP_SECONDS = metrics.histogram("knife_http_request_seconds", "API time to response headers", ["method", "route"])
+HTTP_IN_FLIGHT = metrics.gauge("knife_http_requests_in_flight", "API requests currently being handled")
+metrics.gauge(
+    "knife_pipeline_stage_waiting", "Items waiting for a pipeline stage slot", ["stage"],
+    callback=lambda: {(name,): stage.waiting for name, stage in pipeline.stages.items()} if pipeline else {},
+)
+metrics.gauge(
+    "knife_pipeline_stage_active", "Items running on a pipeline stage", ["stage"],
+    callback=lambda: {(name,): stage.active for name, stage in pipeline.stages.items()} if pipeline else {},
+)
+metrics.gauge(
+    "knife_batcher_queue_depth", "Inputs waiting in the dynamic batcher", ["model"],
+    callback=lambda: {(model.key,): model.batcher.queue_depth for model in model_registry if model.batcher},
+)
+ADMISSION_REJECTIONS = metrics.counter(
+    "knife_admission_rejections_total", "Work turned away: queue_full, timeout (503) or rate_limited (429)", ["reason", "lane"],
+)
+metrics.gauge(
+    "knife_admission_images", "Images admitted and being processed, by lane", ["lane"],
+    callback=lambda: {(lane,): images for lane, images in admission.lane_images.items()},
+)
+metrics.gauge(
+    "knife_admission_queued_images", "Images waiting for admission",
+    callback=lambda: admission.queued_images,
+)
+metrics.gauge(
+    "knife_executor_queue_depth", "Tasks queued on the shared inference thread pool",
+    callback=lambda: executor._work_queue.qsize(),
+)
+metrics.gauge(
+    "knife_jobs_queued", "Batch jobs waiting to start",
+    callback=lambda: job_scheduler.stats()["queued"] if job_scheduler else 0,
+)
+
+def client_id(connection: HTTPConnection) -> str:
+    """Rate-limit key: the API key if one is sent, else the client address"""
+    api_key = connection.headers.get("x-api-key")
+    if api_key:
+        return f"key:{api_key}"
+    return f"addr:{connection.client.host if connection.client else 'unknown'}"
+
+def rate_limit_wait(connection: HTTPConnection, images: int, lane: str) -> float:
+    """Seconds the client must wait before ``images`` more images are allowed; 0 when allowed"""
+    if rate_limiter is None:
+        return 0.0
+    wait = rate_limiter.consume(client_id(connection), images)
+    if wait > 0:
+        ADMISSION_REJECTIONS.inc(reason="rate_limited", lane=lane)
+    return wait
+
+def enforce_rate_limit(request: Request, images: int, lane: str = "bulk") -> None:
+    wait = rate_limit_wait(request, images, lane)
+    if wait > 0:
+        raise HTTPException(status_code=429, detail="Rate limit exceeded",
+                            headers={"Retry-After": str(math.ceil(wait))})
+
+def decoded_size(source) -> int:
+    """Bytes an image takes once decoded to BGR, from its header alone.
+
+    ``source`` is the encoded bytes or a file positioned at their start.
+    Falls back to the encoded size when the header can't be read (such
+    uploads fail to decode anyway). Raises 413 when the declared frame
+    would not fit the whole admission byte budget, so a small file with
+    huge dimensions can't make the decoder allocate it regardless.
+    """
+    stream = io.BytesIO(source) if isinstance(source, bytes) else source
+    position = stream.tell()
+    try:
+        with PILImage.open(stream) as header:
+            width, height = header.size
+    except PILImage.DecompressionBombError:
+        raise HTTPException(status_code=413, detail="Image dimensions too large")
+    except (UnidentifiedImageError, OSError):
+        stream.seek(0, io.SEEK_END)
+        return stream.tell() - position
+    finally:
+        stream.seek(position)
+    
+    size = width * height * 3
+    if size > ADMISSION_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image dimensions too large: {width}x{height} decodes to more than {ADMISSION_MAX_BYTES // (1024 * 1024)}MB",
+        )
+    return size
+
+def batch_decoded_bytes(files: List[UploadFile]) -> int:
+    """Peak decoded bytes of a batch, which is processed INFERENCE_BATCH_SIZE uploads at a time"""
+    sizes = [decoded_size(file.file) for file in files]
+    return max(sum(sizes[start:start + INFERENCE_BATCH_SIZE]) for start in range(0, len(sizes), INFERENCE_BATCH_SIZE))
+
+def start_worker_pool(path: Path) -> Optional[InferenceWorkerPool]:
+    """Start an inference process pool for a model file when INFERENCE_WORKERS is set"""
+    if INFERENCE_WORKERS <= 0:
+        return None
     try:
-        model_session = ort.InferenceSession(str(MODEL_PATH))
-        logging.info("ONNX model loaded successfully")
+        pool = InferenceWorkerPool(
+            path,
+            num_workers=INFERENCE_WORKERS,
+            session_config=SESSION_CONFIG,
+            intra_op_threads=INFERENCE_WORKER_THREADS,
+            max_batch_size=max(INFERENCE_BATCH_SIZE, BATCHER_MAX_BATCH_SIZE),
+        )
+        pool.start()
+        return pool
     except Exception as e:
-        logging.error(f"Failed to load ONNX model: {e}")
-        model_session = None
+        logging.error(f"Failed to start inference workers, running in-process: {e}")
+        return None
 
-def to_base64(img: np.ndarray) -> str:
-    """Convert OpenCV image to base64 string"""
-    _, buffer = cv2.imencode('.png', img)
-    img_base64 = base64.b64encode(buffer).decode('utf-8')
-    return img_base64
+def load_model(name: str, variant: str, path: Path) -> LoadedModel:
+    """Create, inspect and warm up one model variant (blocking); it takes no traffic yet"""
+    session = create_session(path, SESSION_CONFIG)
+    model = LoadedModel(name, variant, path, session, read_class_names(session, CLASSES), model_fingerprint(path))
+    # Only the default model's default variant gets worker processes
+    if name == model_registry.default_name and variant == MODEL_VARIANT:
+        model.worker_pool = start_worker_pool(path)
+    model.warm_up(sorted({1, BATCHER_MAX_BATCH_SIZE}), MODEL_WARMUP_RUNS)
+    if is_screener(model) and CASCADE_SIZE != INPUT_SIZE:
+        model.warm_up(sorted({1, BATCHER_MAX_BATCH_SIZE}), MODEL_WARMUP_RUNS, CASCADE_SIZE)
+    logging.info(
+        f"ONNX model {path.name} loaded successfully (model={name}, variant={variant}, "
+        f"classes={len(model.classes)}, warmup={model.warmup_ms} ms, "
+        f"profile={SESSION_CONFIG.profile}, "
+        f"intra_op_threads={SESSION_CONFIG.resolved_intra_op_threads}, "
+        f"concurrent_runs={SESSION_CONFIG.concurrent_runs})"
+    )
+    return model
+
+def can_screen(model: LoadedModel) -> bool:
+    """Whether this model can serve as the cascade screener, for requests that opt in"""
+    return CASCADE_MODEL in ("", model.name) and model.accepts_input(CASCADE_SIZE)
+
+def is_screener(model: LoadedModel) -> bool:
+    """Whether cascade screening runs on this model by default"""
+    return CASCADE_ENABLED and can_screen(model)
+
+async def activate_model(model: LoadedModel) -> None:
+    """Start the model's batcher, swap it in and drain the version it replaces"""
+    if BATCHER_ENABLED:
+        # With a worker pool, each in-flight batch occupies one worker process
+        pooled = model.worker_pool is not None
+        model.batcher = DynamicBatcher(
+            functools.partial(run_model, model=model),
+            model.worker_pool.dispatch_executor if pooled else executor,
+            max_batch_size=BATCHER_MAX_BATCH_SIZE,
+            max_wait_ms=BATCHER_MAX_WAIT_MS,
+            max_concurrent_batches=model.worker_pool.num_workers if pooled else SESSION_CONFIG.concurrent_runs,
+        )
+        model.batcher.start()
+        if is_screener(model):
+            # Screening inputs don't fit the worker pool's buffers and always run in-process
+            model.screen_batcher = DynamicBatcher(
+                functools.partial(run_model, model=model, stage="screen"),
+                executor,
+                max_batch_size=BATCHER_MAX_BATCH_SIZE,
+                max_wait_ms=BATCHER_MAX_WAIT_MS,
+                max_concurrent_batches=SESSION_CONFIG.concurrent_runs,
+                size=CASCADE_SIZE,
+            )
+            model.screen_batcher.start()
+    
+    previous = model_registry.install(model)
+    if previous is not None:
+        logging.info(f"Swapped model {model.key}: {previous.version} -> {model.version}")
+        await previous.retire()
+
+async def load_models(name: str, path: Path) -> List[LoadedModel]:
+    """Load every enabled variant of a model and swap each in once it is warm"""
+    loaded = []
+    for variant in MODEL_VARIANTS_ENABLED:
+        file_path = variant_path(path, variant)
+        try:
+            model = await asyncio.get_running_loop().run_in_executor(None, load_model, name, variant, file_path)
+        except Exception as e:
+            logging.error(f"Failed to load ONNX model {name} variant {variant} from {file_path}: {e}")
+            continue
+        await activate_model(model)
+        loaded.append(model)
+    if loaded:
+        model_registry.sources[name] = path
+    return loaded
+
+async def watch_models():
+    """Hot-swap models whose files changed on disk"""
+    while True:
+        await asyncio.sleep(MODEL_RELOAD_INTERVAL)
+        for name, path in list(model_registry.sources.items()):
+            try:
+                changed = [model for model in model_registry
+                           if model.name == name and model.path.exists() and model_fingerprint(model.path) != model.version]
+                if changed:
+                    logging.info(f"Model files of {name} changed on disk, reloading")
+                    async with model_registry.reload_lock:
+                        await load_models(name, path)
+            except Exception as e:
+                logging.error(f"Model reload check failed for {name}: {e}")
+
+def run_startup_benchmark():
+    """Log ms/inference of each loaded model for the configured session profile"""
+    global startup_benchmark
+    if ORT_STARTUP_BENCHMARK_RUNS <= 0 or not len(model_registry):
+        return
+    startup_benchmark = {}
+    for model in model_registry:
+        try:
+            startup_benchmark[model.key] = benchmark_session(
+                model.session,
+                runs=ORT_STARTUP_BENCHMARK_RUNS,
+                batch_sizes=sorted({1, BATCHER_MAX_BATCH_SIZE}),
+            )
+            for batch, timing in startup_benchmark[model.key].items():
+                logging.info(
+                    f"Startup benchmark ({model.key}, {SESSION_CONFIG.profile}, {batch}): "
+                    f"{timing['ms_per_batch']} ms/batch, {timing['ms_per_image']} ms/image"
+                )
+        except Exception as e:
+            logging.error(f"Startup benchmark failed for {model.key}: {e}")
+
+def run_model(tensor: np.ndarray, model: LoadedModel, stage: str = "inference") -> np.ndarray:
+    """Run an NCHW tensor on a model's worker pool, or on its local session"""
+    MODEL_BATCH_SIZE.observe(tensor.shape[0], model=model.key)
+    with STAGE_SECONDS.time(stage=stage):
+        return model.run(tensor)
+
+class OutputParams(BaseModel):
+    """How result images are encoded and returned, read from query parameters"""
+    image_format: Literal["png", "jpeg", "webp"] = Field(OUTPUT_FORMAT, description="Encoding of the result images")
+    quality: int = Field(OUTPUT_QUALITY, ge=1, le=100, description="JPEG/WebP quality")
+    png_compression: int = Field(PNG_COMPRESSION, ge=0, le=9, description="PNG compression level; lower is faster")
+    include_original: bool = Field(True, description="Echo the original thumbnail back as `left`")
+    encoding: Literal["base64", "url", "binary"] = Field(
+        "base64", description="Inline base64, fetchable /api/images URLs, or a multipart body (single image only)",
+    )
+    
+    @property
+    def media_type(self) -> str:
+        return IMAGE_FORMATS[self.image_format][1]
+
+def encode_image(img: np.ndarray, output: Optional[OutputParams] = None) -> bytes:
+    """Encode an OpenCV image in the requested output format"""
+    output = output or OutputParams()
+    if output.image_format == "jpeg":
+        flags = [cv2.IMWRITE_JPEG_QUALITY, output.quality]
+    elif output.image_format == "webp":
+        flags = [cv2.IMWRITE_WEBP_QUALITY, output.quality]
+    else:
+        flags = [cv2.IMWRITE_PNG_COMPRESSION, output.png_compression]
+    with STAGE_SECONDS.time(stage="encode"):
+        ok, buffer = cv2.imencode(IMAGE_FORMATS[output.image_format][0], img, flags)
+    if not ok:
+        raise ValueError(f"Could not encode image as {output.image_format}")
+    return buffer.tobytes()
 
 def resize_image(image: np.ndarray, width: int = 300) -> np.ndarray:
     """Resize image maintaining aspect ratio"""
@@ -68,84 +561,328 @@ def resize_image(image: np.ndarray, width: int = 300) -> np.ndarray:
     resized = cv2.resize(image, dim, interpolation=cv2.INTER_AREA)
     return resized
 
+def class_color(class_id: int) -> tuple:
+    """Stable BGR colour per class id"""
+    return tuple(float(c) for c in np.random.default_rng(class_id).uniform(0, 255, 3))
+
 def draw_bounding_box(img: np.ndarray, class_id: int, confidence: float, 
-                     x: int, y: int, x_plus_w: int, y_plus_h: int) -> None:
+                     x: int, y: int, x_plus_w: int, y_plus_h: int, classes: Sequence[str] = CLASSES) -> None:
     """Draw bounding box and label on image"""
-    label = f"{CLASSES[class_id]} ({confidence:.2f})"
-    color = colors[class_id]
+    label = f"{classes[class_id]} ({confidence:.2f})"
+    color = class_color(class_id)
     cv2.rectangle(img, (x, y), (x_plus_w, y_plus_h), color, 2)
     cv2.putText(img, label, (x - 10, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
 
-def detect_objects(image: np.ndarray) -> np.ndarray:
-    """Detect knives in the image using ONNX model (or mock detection)"""
+class DetectionParams(BaseModel):
+    """Per-request detection thresholds, read from query parameters"""
+    conf_threshold: float = Field(0.70, ge=0.0, le=1.0, description="Minimum class score to keep a candidate box")
+    iou_threshold: float = Field(0.45, ge=0.0, le=1.0, description="IoU above which NMS suppresses a box")
+    class_agnostic: bool = Field(False, description="Suppress overlapping boxes across classes")
+    pre_nms_top_k: Optional[int] = Field(None, ge=1, description="Keep only the top-k candidates before NMS")
+    max_detections: Optional[int] = Field(None, ge=1, description="Maximum boxes returned per image")
+    nms_backend: Literal["numpy", "opencv"] = Field(NMS_BACKEND, description="NMS implementation")
+    tiled: bool = Field(TILING_ENABLED, description="Slice frames larger than tile_size into overlapping tiles")
+    tile_size: int = Field(TILE_SIZE, ge=128, le=4096, description="Tile side in frame pixels")
+    tile_overlap: float = Field(TILE_OVERLAP, ge=0.0, le=0.75, description="Fraction of a tile shared with its neighbour")
+    inference_width: int = Field(INFERENCE_WIDTH, ge=0, description="Resize frames to this width before detection; 0 uses the native frame")
+    model: Optional[str] = Field(None, description="Registered model name; defaults to DEFAULT_MODEL")
+    variant: Optional[Literal["fp32", "int8", "fp16"]] = Field(None, description="Model variant; defaults to MODEL_VARIANT")
+    cascade: bool = Field(CASCADE_ENABLED, description="Screen at low resolution first and skip the full detector for clear negatives")
+    cascade_threshold: float = Field(CASCADE_THRESHOLD, ge=0.0, le=1.0, description="Screening score below which an image is rejected")
+    
+    _loaded_model: Optional[LoadedModel] = PrivateAttr(None)
+    _screen_model: Optional[LoadedModel] = PrivateAttr(None)
+    
+    @property
+    def loaded_model(self) -> Optional[LoadedModel]:
+        """The model version serving this request, pinned on first use so a hot swap can't change it midway"""
+        if self._loaded_model is None:
+            self._loaded_model = model_registry.get(self.model, self.variant)
+        return self._loaded_model
+    
+    @property
+    def screen_model(self) -> Optional[LoadedModel]:
+        """The model version screening this request in cascade mode, or None to go straight to the detector"""
+        if self._screen_model is None and self.cascade:
+            if CASCADE_MODEL:
+                model = model_registry.get(CASCADE_MODEL, self.variant) or model_registry.get(CASCADE_MODEL)
+            else:
+                model = self.loaded_model
+            if model is not None and model.accepts_input(CASCADE_SIZE):
+                self._screen_model = model
+        return self._screen_model
+
+def model_selection_error(params: DetectionParams) -> Optional[str]:
+    """Why the requested model/variant can't be served, or None"""
+    # Without any model everything falls back to mock detection anyway
+    if not len(model_registry):
+        return None
+    name = params.model or model_registry.default_name
+    if params.model is not None and name not in model_registry.names():
+        return f"Model '{name}' is not loaded. Available: {model_registry.names()}"
+    if params.variant is not None and params.loaded_model is None:
+        return f"Model variant '{params.variant}' is not loaded for '{name}'. Available: {model_registry.variants(name)}"
+    return None
+
+def detection_params(params: DetectionParams = Depends()) -> DetectionParams:
+    """Query-parameter dependency that also rejects models this deployment hasn't loaded"""
+    error = model_selection_error(params)
+    if error is not None:
+        raise HTTPException(status_code=400, detail=error)
+    return params
+
+def class_names(params: DetectionParams) -> List[str]:
+    model = params.loaded_model
+    return model.classes if model is not None else CLASSES
+
+def decode_output(output: np.ndarray, scale: float, params: DetectionParams) -> tuple:
+    """Decode one image's model output into candidate boxes in image coordinates"""
+    return decode_predictions(output, scale, params.conf_threshold, params.loaded_model.class_ids)
+
+def select_detections(candidates: List[tuple], params: DetectionParams) -> List[Detections]:
+    """Apply NMS to the candidates of several images in one call"""
+    keeps = batched_nms(
+        candidates,
+        iou_threshold=params.iou_threshold,
+        class_agnostic=params.class_agnostic,
+        pre_nms_top_k=params.pre_nms_top_k,
+        max_detections=params.max_detections,
+        backend=params.nms_backend,
+    )
+    return [
+        Detections(boxes[keep], scores[keep], class_ids[keep])
+        for (boxes, scores, class_ids), keep in zip(candidates, keeps)
+    ]
+
+def draw_detections(image: np.ndarray, detections: Detections, classes: Sequence[str] = CLASSES) -> np.ndarray:
+    """Draw the kept boxes on a copy of the image"""
+    started = time.perf_counter()
+    detected_image = image.copy()
+    for box, score, class_id in zip(detections.boxes, detections.scores, detections.class_ids):
+        x1, y1, x2, y2 = (int(v) for v in np.round(box))
+        draw_bounding_box(detected_image, int(class_id), float(score), x1, y1, x2, y2, classes)
+    
+    if detections.mock:
+        height = image.shape[0]
+        if len(detections.scores):
+            cv2.putText(detected_image, "MOCK DETECTION - Replace with real model", 
+                       (10, height - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+        else:
+            cv2.putText(detected_image, "No knives detected (MOCK)", 
+                       (10, height - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+    
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage="draw")
+    return detected_image
+
+def detect_batch(images: List[np.ndarray], params: Optional[DetectionParams] = None) -> List[Detections]:
+    """Detect knives in several images with batched ONNX inference (or mock detection)"""
+    params = params or DetectionParams()
     
     # Mock detection for demo purposes - replace with real model when available
-    if model_session is None:
+    model = params.loaded_model
+    if model is None:
         logging.warning("Model not loaded, using mock detection")
-        return mock_knife_detection(image)
+        MOCK_FALLBACKS.inc(len(images), reason="no_model")
+        return [mock_detections(image) for image in images]
     
     try:
-        height, width, _ = image.shape
-        length = max(height, width)
-        square_image = np.zeros((length, length, 3), np.uint8)
-        square_image[0:height, 0:width] = image
+        # Cascade-rejected images skip the full detector and report no boxes
+        decisions = screen_batch(images, params)
+        selected = [index for index, decision in enumerate(decisions) if decision != "reject"]
         
-        scale = length / 640
-        blob = cv2.dnn.blobFromImage(square_image, scalefactor=1/255, size=(640, 640), swapRB=True)
+        # Each selected image contributes one or more model inputs (the frame and/or its tiles)
+        inputs, owners, regions = [], [], []
+        for index in selected:
+            frames, tiles = plan_tiles(images[index], params)
+            inputs.extend(frames)
+            owners.extend([index] * len(frames))
+            regions.extend(tiles)
         
-        # Run inference
-        input_name = model_session.get_inputs()[0].name
-        outputs = model_session.run(None, {input_name: blob})
-        outputs = np.array([cv2.transpose(outputs[0])])
-        
-        boxes = []
-        scores = []
-        class_ids = []
-        
-        for i in range(outputs.shape[1]):
-            classes_scores = outputs[0][i][4:]
-            (minScore, maxScore, minClassLoc, (x, maxClassIndex)) = cv2.minMaxLoc(classes_scores)
-            if maxScore >= 0.70 and maxClassIndex in CLASS_IDS:
-                local_class_id = CLASS_IDS.index(maxClassIndex)
-                box = [
-                    outputs[0][i][0] - (0.5 * outputs[0][i][2]),
-                    outputs[0][i][1] - (0.5 * outputs[0][i][3]),
-                    outputs[0][i][2],
-                    outputs[0][i][3],
-                ]
-                boxes.append(box)
-                scores.append(maxScore)
-                class_ids.append(local_class_id)
+        outputs = infer_images(
+            lambda tensor: run_model(tensor, model), inputs, INFERENCE_BATCH_SIZE, input_buffers,
+            on_preprocess=lambda seconds: STAGE_SECONDS.observe(seconds, stage="preprocess"),
+        )
         
-        result_boxes = cv2.dnn.NMSBoxes(boxes, scores, 0.25, 0.45, 0.5)
+        with STAGE_SECONDS.time(stage="postprocess"):
+            parts = {index: [] for index in selected}
+            for (output, scale), owner, tile in zip(outputs, owners, regions):
+                found = decode_output(output, scale, params)
+                parts[owner].append(found if tile is None else offset_candidates(found, tile))
+            kept = select_detections([merge_candidates(parts[index]) for index in selected], params) if selected else []
         
-        detected_image = image.copy()
-        for i in range(len(result_boxes)):
-            index = result_boxes[i]
-            box = boxes[index]
-            draw_bounding_box(
-                detected_image,
-                class_ids[index],
-                scores[index],
-                round(box[0] * scale),
-                round(box[1] * scale),
-                round((box[0] + box[2]) * scale),
-                round((box[1] + box[3]) * scale),
-            )
+        results = [Detections.empty() for _ in images]
+        for index, detections in zip(selected, kept):
+            results[index] = detections
+            record_cascade_outcome(decisions[index], detections)
+        return results
+    except Exception as e:
+        logging.error(f"Error in object detection: {e}")
+        MOCK_FALLBACKS.inc(len(images), reason="error")
+        return [mock_detections(image) for image in images]
+
+def screen_score(output: np.ndarray) -> float:
+    """Best class score anywhere in one image's (4+C, A) screening output"""
+    return float(output[4:].max()) if output.size else 0.0
+
+def cascade_decision(score: float, params: DetectionParams) -> str:
+    """'pass', 'reject', or 'audit': rejected, but still run through the full detector to measure lost recall"""
+    if score >= params.cascade_threshold:
+        decision = "pass"
+    else:
+        decision = "audit" if random.random() < CASCADE_AUDIT_RATE else "reject"
+    with cascade_lock:
+        cascade_stats['screened'] += 1
+        if decision == "pass":
+            cascade_stats['passed'] += 1
+        else:
+            cascade_stats['rejected'] += 1
+            if decision == "audit":
+                cascade_stats['audited'] += 1
+    CASCADE_DECISIONS.inc(decision=decision)
+    return decision
+
+def record_cascade_outcome(decision: Optional[str], detections: Detections) -> None:
+    """Count what the full detector found on a screened image"""
+    if not len(detections.scores):
+        return
+    if decision == "pass":
+        with cascade_lock:
+            cascade_stats['passed_positive'] += 1
+    elif decision == "audit":
+        with cascade_lock:
+            cascade_stats['audit_misses'] += 1
+        CASCADE_AUDIT_MISSES.inc()
+
+def screen_batch(images: List[np.ndarray], params: DetectionParams) -> List[Optional[str]]:
+    """Cascade decision per image; None where nothing was screened.
+
+    Tiled frames are never screened: tiling exists for objects too small
+    to survive downscaling, which is exactly what a low-resolution pass misses.
+    """
+    model = params.screen_model
+    decisions = [None] * len(images)
+    indices = [index for index, image in enumerate(images) if not needs_tiling(image, params)]
+    if model is None or not indices:
+        return decisions
+    
+    outputs = infer_images(
+        lambda tensor: run_model(tensor, model, stage="screen"), [images[index] for index in indices],
+        INFERENCE_BATCH_SIZE, screen_buffers,
+        on_preprocess=lambda seconds: STAGE_SECONDS.observe(seconds, stage="preprocess"),
+    )
+    for index, (output, _) in zip(indices, outputs):
+        decisions[index] = cascade_decision(screen_score(output), params)
+    return decisions
+
+async def screen_async(image: np.ndarray, model: LoadedModel, params: DetectionParams) -> str:
+    """Cascade decision for one image via the screening batcher"""
+    blob, _ = await pipeline["preprocess"].run(STAGE_SECONDS.timed(letterbox, stage="preprocess"), image, CASCADE_SIZE)
+    output = await pipeline["infer"].wrap(lambda: infer_blob(model, blob, screen=True))
+    return cascade_decision(screen_score(output), params)
+
+def cascade_summary() -> dict:
+    """Cascade counters plus rejection rate and the recall loss estimated from audits"""
+    with cascade_lock:
+        stats = dict(cascade_stats)
+    missed = stats['audit_misses'] / stats['audited'] * stats['rejected'] if stats['audited'] else None
+    positives = stats['passed_positive'] + (missed or 0)
+    return {
+        # Requests can opt in with cascade=true whenever a loaded model can screen,
+        # so availability is reported separately from the server-wide default
+        "enabled": CASCADE_ENABLED,
+        "available": any(can_screen(model) for model in model_registry),
+        "screeners": [model.key for model in model_registry if can_screen(model)],
+        "size": CASCADE_SIZE,
+        "threshold": CASCADE_THRESHOLD,
+        "model": CASCADE_MODEL or None,
+        "audit_rate": CASCADE_AUDIT_RATE,
+        **stats,
+        "rejection_rate": stats['rejected'] / stats['screened'] if stats['screened'] else 0.0,
+        "estimated_missed": missed,
+        "estimated_recall_loss": missed / positives if missed is not None and positives else None,
+    }
+
+def needs_tiling(image: np.ndarray, params: DetectionParams) -> bool:
+    return params.tiled and max(image.shape[:2]) > params.tile_size
+
+def tiling_summary() -> dict:
+    """Consistent snapshot of the tiling counters"""
+    with tiling_lock:
+        return dict(tiling_stats)
+
+def plan_tiles(image: np.ndarray, params: DetectionParams) -> tuple:
+    """Model inputs for one frame and the frame region each covers (None = whole frame)"""
+    if not needs_tiling(image, params):
+        return [image], [None]
+    
+    tiles, regions, skipped = slice_image(image, params.tile_size, params.tile_overlap, TILE_SKIP_STD)
+    with tiling_lock:
+        tiling_stats['frames'] += 1
+        tiling_stats['tiles_run'] += len(tiles)
+        tiling_stats['tiles_skipped'] += skipped
+    
+    # The downscaled whole frame still catches objects larger than a tile
+    if TILE_FULL_FRAME:
+        return [image] + tiles, [None] + regions
+    return tiles, regions
+
+def detect_objects_batch(images: List[np.ndarray], params: Optional[DetectionParams] = None) -> List[np.ndarray]:
+    """Detect knives in several images and draw the boxes on copies of them"""
+    params = params or DetectionParams()
+    classes = class_names(params)
+    return [draw_detections(image, found, classes) for image, found in zip(images, detect_batch(images, params))]
+
+def detect_objects(image: np.ndarray, params: Optional[DetectionParams] = None) -> np.ndarray:
+    """Detect knives in the image using ONNX model (or mock detection)"""
+    return detect_objects_batch([image], params)[0]
+
+def postprocess_output(output: np.ndarray, scale: float, params: DetectionParams) -> Detections:
+    """Decode and NMS one image's model output"""
+    with STAGE_SECONDS.time(stage="postprocess"):
+        return select_detections([decode_output(output, scale, params)], params)[0]
+
+async def detect_async(image: np.ndarray, params: Optional[DetectionParams] = None) -> Detections:
+    """Detect knives via the dynamic batcher so concurrent requests share model calls"""
+    params = params or DetectionParams()
+    
+    model = params.loaded_model
+    if model is None or model.batcher is None or needs_tiling(image, params):
+        # Tiled frames already fill a batch on their own
+        return (await pipeline["infer"].run(detect_batch, [image], params))[0]
+    
+    try:
+        decision = None
+        screener = params.screen_model
+        if screener is not None:
+            decision = await screen_async(image, screener, params)
+            if decision == "reject":
+                return Detections.empty()
         
-        return detected_image
+        blob, scale = await pipeline["preprocess"].run(STAGE_SECONDS.timed(letterbox, stage="preprocess"), image)
+        output = await pipeline["infer"].wrap(lambda: infer_blob(model, blob))
+        detections = await pipeline["postprocess"].run(postprocess_output, output, scale, params)
+        record_cascade_outcome(decision, detections)
+        return detections
+    except Overloaded:
+        raise
     except Exception as e:
         logging.error(f"Error in object detection: {e}")
-        return mock_knife_detection(image)
+        MOCK_FALLBACKS.inc(reason="error")
+        return mock_detections(image)
+
+async def infer_blob(model: LoadedModel, blob: np.ndarray, screen: bool = False) -> np.ndarray:
+    """One letterboxed blob through the model's (screening) batcher, or directly once a hot swap retired it"""
+    batcher = model.screen_batcher if screen else model.batcher
+    if batcher is None:
+        stage = "screen" if screen else "inference"
+        return (await asyncio.get_running_loop().run_in_executor(executor, run_model, blob, model, stage))[0]
+    return await batcher.submit(blob)
 
-def mock_knife_detection(image: np.ndarray) -> np.ndarray:
+def mock_detections(image: np.ndarray) -> Detections:
     """Mock knife detection for demo purposes"""
-    detected_image = image.copy()
     height, width = image.shape[:2]
     
     # Add a mock detection box in a random location
-    import random
-    
     # Create a mock detection box
     box_width = random.randint(50, min(width//3, 150))
     box_height = random.randint(30, min(height//4, 100))
@@ -155,56 +892,229 @@ def mock_knife_detection(image: np.ndarray) -> np.ndarray:
     
     # 30% chance of mock detection to simulate real behavior
     if random.random() > 0.7:
-        draw_bounding_box(
-            detected_image,
-            0,  # knife class
-            0.85,  # mock confidence
-            x, y, x + box_width, y + box_height
+        return Detections(
+            np.array([[x, y, x + box_width, y + box_height]], np.float32),
+            np.array([0.85], np.float32),  # mock confidence
+            np.array([0], np.int64),  # knife class
+            mock=True,
         )
-        
-        # Add mock detection text
-        cv2.putText(detected_image, "MOCK DETECTION - Replace with real model", 
-                   (10, height - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
-    else:
-        # Add "no detection" text
-        cv2.putText(detected_image, "No knives detected (MOCK)", 
-                   (10, height - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
     
-    return detected_image
+    return Detections.empty(mock=True)
+
+def decode_image(file_content: bytes) -> np.ndarray:
+    """Decode uploaded image bytes"""
+    nparr = np.frombuffer(file_content, np.uint8)
+    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    
+    if image is None:
+        raise ValueError("Invalid image format")
+    
+    return image
+
+def decode_and_resize(file_content: bytes, width: int = 0) -> tuple:
+    """Decode stage: returns the original image shape and the frame to detect on.
+
+    ``width`` > 0 resizes the frame to that width first; 0 keeps the native frame.
+    """
+    with STAGE_SECONDS.time(stage="decode"):
+        image = decode_image(file_content)
+    original_shape = image.shape
+    if width > 0 and width != image.shape[1]:
+        with STAGE_SECONDS.time(stage="resize"):
+            image = resize_image(image, width)
+    return original_shape, image
+
+def detections_to_json(detections: Detections, original_shape: tuple, resized_shape: tuple,
+                       classes: Sequence[str] = CLASSES) -> List[dict]:
+    """Map boxes found on the resized image back to original-image pixels"""
+    height, width = original_shape[:2]
+    scaled = detections.scaled(width / resized_shape[1], height / resized_shape[0])
+    boxes = np.clip(scaled.boxes, 0, [width, height, width, height])
+    return [
+        {
+            'class_id': int(class_id),
+            'class_name': classes[class_id],
+            'confidence': round(float(score), 4),
+            'box': [round(float(v), 1) for v in box],
+        }
+        for box, score, class_id in zip(boxes, scaled.scores, scaled.class_ids)
+    ]
+
+def build_detection_result(preview_image: np.ndarray, detected_image: np.ndarray,
+                           detections: Optional[List[dict]] = None, output: Optional[OutputParams] = None) -> dict:
+    """Encode the original and processed images into the result; they stay raw bytes until publish_images"""
+    output = output or OutputParams()
+    return {
+        'left': encode_image(preview_image, output) if output.include_original else None,
+        'center': encode_image(detected_image, output),
+        'leftlabel': 'Original',
+        'centerlabel': 'Processed Image',
+        'media_type': output.media_type,
+        'detections': detections,
+    }
+
+def build_detections_only_result(original_shape: tuple, resized_shape: tuple, detections: Detections,
+                                 classes: Sequence[str] = CLASSES) -> dict:
+    """Structured payload without any encoded images"""
+    DETECTIONS_PER_IMAGE.observe(len(detections.scores))
+    return {
+        'width': original_shape[1],
+        'height': original_shape[0],
+        'detections': detections_to_json(detections, original_shape, resized_shape, classes),
+        'mock': detections.mock,
+    }
+
+def make_preview(image: np.ndarray, detections: Detections) -> tuple:
+    """PREVIEW_WIDTH thumbnail of the detection frame, with the boxes scaled onto it"""
+    if image.shape[1] == PREVIEW_WIDTH:
+        return image, detections
+    preview = resize_image(image, PREVIEW_WIDTH)
+    return preview, detections.scaled(preview.shape[1] / image.shape[1], preview.shape[0] / image.shape[0])
+
+def render_result(image: np.ndarray, detections: Detections, original_shape: tuple,
+                  output: Optional[OutputParams] = None, classes: Sequence[str] = CLASSES) -> dict:
+    """Encode stage: draw the boxes on a thumbnail and encode both images for the response"""
+    preview, preview_detections = make_preview(image, detections)
+    detected_image = draw_detections(preview, preview_detections, classes)
+    return build_detection_result(
+        preview,
+        detected_image,
+        detections_to_json(detections, original_shape, image.shape, classes),
+        output,
+    )
+
+def publish_images(result: dict, output: OutputParams) -> dict:
+    """JSON-ready copy of a result: its raw images become inline base64 or /api/images URLs"""
+    if result.get('center') is None:
+        return result
+    published = dict(result)
+    for key in ('left', 'center'):
+        if result.get(key) is None:
+            continue
+        if output.encoding != "url":
+            published[key] = base64.b64encode(result[key]).decode('utf-8')
+            continue
+        image_id = image_store.put(result[key], result['media_type'])
+        if image_id is None:
+            raise HTTPException(status_code=413, detail="Result image is too large to serve by URL")
+        published[key] = f"/api/images/{image_id}"
+    return published
+
+def multipart_result(result: dict) -> Response:
+    """multipart/mixed body: the JSON result without images, then each image as a raw part"""
+    boundary = uuid.uuid4().hex
+    metadata = {key: value for key, value in result.items() if key not in ('left', 'center')}
+    images = [(key, result[key]) for key in ('left', 'center') if result.get(key) is not None]
+    metadata['parts'] = [key for key, _ in images]
+    
+    body = [f"--{boundary}\r\nContent-Type: application/json\r\n\r\n".encode(), json.dumps(metadata).encode()]
+    for key, data in images:
+        body.append(
+            f"\r\n--{boundary}\r\nContent-Type: {result['media_type']}\r\n"
+            f"Content-Disposition: inline; name=\"{key}\"\r\n\r\n".encode()
+        )
+        body.append(data)
+    body.append(f"\r\n--{boundary}--\r\n".encode())
+    return Response(content=b"".join(body), media_type=f"multipart/mixed; boundary={boundary}")
+
+def cache_namespace(params: DetectionParams, detections_only: bool, output: Optional[OutputParams] = None) -> str:
+    """Everything besides the image bytes that determines a result"""
+    return json.dumps({
+        "params": params.model_dump(),
+        "model": params.loaded_model.version if params.loaded_model is not None else "mock",
+        "screen_model": params.screen_model.version if params.screen_model is not None else None,
+        "detections_only": detections_only,
+        # Server-side settings that change detections; a restart with new values must not hit old entries
+        "server": {
+            "tile_skip_std": TILE_SKIP_STD,
+            "tile_full_frame": TILE_FULL_FRAME,
+            "cascade_size": CASCADE_SIZE,
+            "cascade_model": CASCADE_MODEL,
+        },
+        # How images are delivered is applied after the cache, so it is not part of the key
+        "output": None if detections_only else (output or OutputParams()).model_dump(exclude={"encoding"}),
+    }, sort_keys=True)
+
+async def lookup_cached_result(digest: Optional[bytes], params: DetectionParams, detections_only: bool,
+                               output: Optional[OutputParams] = None) -> Optional[dict]:
+    """Previously computed result for this upload and configuration, if any"""
+    if digest is None:
+        return None
+    key = cache_key(digest, cache_namespace(params, detections_only, output))
+    cached = result_cache.get(key, memory_only=True)
+    if cached is None and result_cache.disk_dir is not None:
+        cached = await asyncio.get_running_loop().run_in_executor(None, result_cache.get, key)
+    return cached
+
+def store_cached_result(digest: Optional[bytes], params: DetectionParams, detections_only: bool,
+                        result: dict, detections: Detections, output: Optional[OutputParams] = None) -> None:
+    """Cache a result in the background; mock results are random and never cached"""
+    if digest is None or detections.mock:
+        return
+    key = cache_key(digest, cache_namespace(params, detections_only, output))
+    asyncio.get_running_loop().run_in_executor(None, result_cache.put, key, result)
+
+async def hash_upload(file_content: bytes) -> Optional[bytes]:
+    """Content digest for result caching, or None when the cache is disabled"""
+    if not result_cache.enabled:
+        return None
+    return await pipeline["decode"].run(content_digest, file_content)
 
-async def process_single_image(file_content: bytes) -> dict:
-    """Process a single image for knife detection"""
+async def process_single_image(file_content: bytes, params: Optional[DetectionParams] = None,
+                               detections_only: bool = False, output: Optional[OutputParams] = None) -> dict:
+    """Process a single image for knife detection.
+
+    Every CPU-bound step runs on its pipeline stage, so the event loop
+    only shuttles bytes and results. Cache hits skip all of them.
+    """
+    params = params or DetectionParams()
     try:
-        # Convert bytes to numpy array
-        nparr = np.frombuffer(file_content, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        digest = await hash_upload(file_content)
+        cached = await lookup_cached_result(digest, params, detections_only, output)
+        if cached is not None:
+            return cached
         
-        if image is None:
-            raise ValueError("Invalid image format")
+        original_shape, image = await pipeline["decode"].run(decode_and_resize, file_content, params.inference_width)
         
-        # Resize image
-        resized_image = resize_image(image, 300)
+        # Detect objects through the shared batcher
+        detections = await detect_async(image, params)
         
-        # Detect objects in thread pool
-        loop = asyncio.get_event_loop()
-        detected_image = await loop.run_in_executor(executor, detect_objects, resized_image)
+        summary = build_detections_only_result(original_shape, image.shape, detections, class_names(params))
+        store_cached_result(digest, params, True, summary, detections)
+        if detections_only:
+            return summary
         
-        return {
-            'left': to_base64(resized_image),
-            'center': to_base64(detected_image),
-            'leftlabel': 'Original',
-            'centerlabel': 'Processed Image',
-        }
+        result = await pipeline["encode"].run(
+            render_result, image, detections, original_shape, output, class_names(params),
+        )
+        store_cached_result(digest, params, False, result, detections, output)
+        return result
+    except Overloaded:
+        raise
     except Exception as e:
         logging.error(f"Error processing image: {e}")
         raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
 
 # Define Models
+class Detection(BaseModel):
+    class_id: int
+    class_name: str
+    confidence: float
+    box: List[float] = Field(..., description="[x1, y1, x2, y2] in original image pixels")
+
 class DetectionResponse(BaseModel):
-    left: str
+    left: Optional[str] = Field(None, description="Original thumbnail as base64 or URL; omitted with include_original=false")
     center: str
     leftlabel: str
     centerlabel: str
+    media_type: str = "image/png"
+    detections: Optional[List[Detection]] = None
+
+class DetectionsOnlyResponse(BaseModel):
+    width: int
+    height: int
+    detections: List[Detection]
+    mock: bool = False
 
 class BatchResponse(BaseModel):
     results: List[DetectionResponse]
@@ -216,7 +1126,7 @@ async def root():
     return {
         "message": "Knife Detection AI API",
         "version": "2.0.0",
-        "model_status": "loaded" if model_session else "not_loaded"
+        "model_status": "loaded" if model_registry.default else "not_loaded"
     }
 
 @api_router.get("/health")
@@ -224,12 +1134,100 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "model_loaded": model_session is not None,
+        "model_loaded": model_registry.default is not None,
+        "models": model_registry.names(),
         "timestamp": datetime.utcnow().isoformat()
     }
 
-@api_router.post("/detect/single", response_model=DetectionResponse)
-async def single_object_detection(file: UploadFile = File(...)):
+@api_router.get("/stats")
+async def get_stats():
+    """Runtime statistics for the inference pipeline"""
+    default = model_registry.default
+    return {
+        "batcher": default.batcher.stats() if default and default.batcher else None,
+        "model_batchers": {model.key: model.batcher.stats() for model in model_registry if model.batcher},
+        "workers": default.worker_pool.stats() if default and default.worker_pool else None,
+        "pipeline": pipeline.stats() if pipeline else None,
+        "input_buffers": input_buffers.stats(),
+        "result_cache": result_cache.stats(),
+        "image_store": image_store.stats(),
+        "tiling": tiling_summary(),
+        "cascade": cascade_summary(),
+        "admission": {
+            **admission.stats(),
+            "rate_limit": rate_limiter.stats() if rate_limiter else None,
+        },
+        "websocket": ws_stats,
+        "jobs": {
+            **job_scheduler.stats(),
+            "by_status": job_store.counts(),
+        } if job_scheduler else None,
+        "video": {
+            **video_stats,
+            "skip_ratio": 1 - video_stats['keyframes'] / video_stats['frames'] if video_stats['frames'] else 0.0,
+        },
+        "session": {
+            "config": SESSION_CONFIG.as_dict(),
+            "default_variant": MODEL_VARIANT,
+            "startup_benchmark": startup_benchmark,
+        },
+        "models": {
+            "default": model_registry.default_name,
+            "swaps": model_registry.swaps,
+            "loaded": [model.info() for model in model_registry],
+        },
+    }
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics in the text exposition format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@api_router.get("/models")
+async def list_models():
+    """Loaded models, their versions, variants and class names"""
+    return {
+        "default": model_registry.default_name,
+        "default_variant": MODEL_VARIANT,
+        "models": [model.info() for model in model_registry],
+    }
+
+@api_router.post("/models/{name}/reload")
+async def reload_model(name: str,
+                       path: Optional[str] = Query(None, description="Model file relative to MODELS_DIR; defaults to the current file"),
+                       x_admin_token: Optional[str] = Header(None)):
+    """Load a new version of a model (or register a new one), warm it up and hot-swap it in"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model reload is disabled; set ADMIN_TOKEN to enable it")
+    if not hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    
+    if not re.fullmatch(r"[A-Za-z0-9_.-]{1,64}", name):
+        raise HTTPException(status_code=400, detail="Invalid model name")
+    
+    if path is not None:
+        base = (MODELS_DIR / path).resolve()
+        if not base.is_relative_to(MODELS_DIR.resolve()):
+            raise HTTPException(status_code=400, detail="Model path must be inside MODELS_DIR")
+    elif name in model_registry.sources:
+        base = model_registry.sources[name]
+    else:
+        raise HTTPException(status_code=404, detail=f"Model '{name}' is not loaded; pass a path to register it")
+    
+    if not any(variant_path(base, variant).exists() for variant in MODEL_VARIANTS_ENABLED):
+        raise HTTPException(status_code=400, detail=f"No model file found for {base.name}")
+    
+    async with model_registry.reload_lock:
+        loaded = await load_models(name, base)
+    if not loaded:
+        raise HTTPException(status_code=500, detail=f"Failed to load model '{name}'; the previous version keeps serving")
+    
+    return {"name": name, "loaded": [model.info() for model in loaded]}
+
+@api_router.post("/detect/single", response_model=Union[DetectionResponse, DetectionsOnlyResponse])
+async def single_object_detection(request: Request, file: UploadFile = File(...),
+                                  params: DetectionParams = Depends(detection_params),
+                                  output: OutputParams = Depends(), detections_only: bool = False):
     """Single image knife detection endpoint"""
     
     # Validate file
@@ -240,126 +1238,846 @@ async def single_object_detection(file: UploadFile = File(...)):
     if file.size and file.size > 10 * 1024 * 1024:
         raise HTTPException(status_code=400, detail="File size too large. Maximum size is 10MB.")
     
-    try:
-        # Read file content
-        file_content = await file.read()
-        
-        # Process image
-        result = await process_single_image(file_content)
-        
-        return DetectionResponse(**result)
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logging.error(f"Unexpected error in single detection: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+    enforce_rate_limit(request, 1, "interactive")
+    
+    async with admission.admit(1, decoded_size(file.file), "interactive", ADMISSION_QUEUE_TIMEOUT):
+        try:
+            # Read file content
+            with STAGE_SECONDS.time(stage="upload_read"):
+                file_content = await file.read()
+            
+            # Process image
+            result = await process_single_image(file_content, params, detections_only, output)
+            
+            if detections_only:
+                return DetectionsOnlyResponse(**result)
+            if output.encoding == "binary":
+                return multipart_result(result)
+            return DetectionResponse(**publish_images(result, output))
+            
+        except (HTTPException, Overloaded):
+            raise
+        except Exception as e:
+            logging.error(f"Unexpected error in single detection: {e}")
+            raise HTTPException(status_code=500, detail="Internal server error")
 
 @api_router.post("/detect/batch")
-async def batch_object_detection(files: List[UploadFile] = File(...)):
+async def batch_object_detection(request: Request, files: List[UploadFile] = File(...),
+                                 params: DetectionParams = Depends(detection_params),
+                                 output: OutputParams = Depends(), detections_only: bool = False):
     """Batch image knife detection endpoint"""
     
+    if output.encoding == "binary":
+        raise HTTPException(status_code=400, detail="Binary encoding is only supported by /detect/single; use encoding=url")
+    
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
     
     if len(files) > 100:
         raise HTTPException(status_code=400, detail="Too many files. Maximum is 100 images.")
     
-    results = []
-    processed_count = 0
+    enforce_rate_limit(request, len(files))
     
-    for file in files:
+    async def decode(file: UploadFile) -> Optional[dict]:
         try:
             # Validate file
             if not file.content_type or not file.content_type.startswith('image/'):
-                continue  # Skip non-image files
-                
-            # Read and process file
-            file_content = await file.read()
-            result = await process_single_image(file_content)
-            results.append(DetectionResponse(**result))
-            processed_count += 1
+                return None  # Skip non-image files
             
+            # Read the file; only decode it when there is no cached result
+            with STAGE_SECONDS.time(stage="upload_read"):
+                file_content = await file.read()
+            digest = await hash_upload(file_content)
+            cached = await lookup_cached_result(digest, params, detections_only, output)
+            if cached is not None:
+                return {"result": cached}
+            original_shape, image = await pipeline["decode"].run(decode_and_resize, file_content, params.inference_width)
+            return {"digest": digest, "original_shape": original_shape, "image": image}
+        
+        except Overloaded:
+            raise
         except Exception as e:
             logging.warning(f"Error processing file {file.filename}: {e}")
-            continue  # Skip problematic files
+            return None  # Skip problematic files
     
-    if processed_count == 0:
-        raise HTTPException(status_code=400, detail="No valid image files could be processed")
+    async def finish(item: dict, found: Detections) -> None:
+        # The full-resolution frame is dropped as soon as its result is built
+        image = item.pop("image")
+        summary = build_detections_only_result(item["original_shape"], image.shape, found, class_names(params))
+        store_cached_result(item["digest"], params, True, summary, found)
+        if detections_only:
+            item["result"] = summary
+        else:
+            item["result"] = await pipeline["encode"].run(
+                render_result, image, found, item["original_shape"], output, class_names(params),
+            )
+            store_cached_result(item["digest"], params, False, item["result"], found, output)
     
-    return {
-        "results": results,
-        "total_processed": processed_count,
-        "total_files": len(files)
-    }
+    # The whole batch is admitted together, budgeted for one chunk: the most images and
+    # decoded frames it holds at once. Charging every file would push batches larger than
+    # the bulk share to wait until nothing else at all is running.
+    async with admission.admit(min(len(files), INFERENCE_BATCH_SIZE), batch_decoded_bytes(files), "bulk",
+                               ADMISSION_QUEUE_TIMEOUT):
+        # Decode, detect and encode INFERENCE_BATCH_SIZE uploads at a time, so at most
+        # one chunk of native-resolution frames is in memory however large the batch
+        decoded = []
+        for start in range(0, len(files), INFERENCE_BATCH_SIZE):
+            chunk = files[start:start + INFERENCE_BATCH_SIZE]
+            items = [item for item in await asyncio.gather(*(decode(file) for file in chunk)) if item is not None]
+            pending = [item for item in items if "result" not in item]
+            if pending:
+                # Run the chunk's uncached images through the model in batched inference calls
+                detections = await pipeline["infer"].run(detect_batch, [item["image"] for item in pending], params)
+                await asyncio.gather(*(finish(item, found) for item, found in zip(pending, detections)))
+            decoded.extend(items)
+        
+        if not decoded:
+            raise HTTPException(status_code=400, detail="No valid image files could be processed")
+        
+        if detections_only:
+            results = [DetectionsOnlyResponse(**item["result"]) for item in decoded]
+        else:
+            results = [DetectionResponse(**publish_images(item["result"], output)) for item in decoded]
+        processed_count = len(results)
+        
+        return {
+            "results": results,
+            "total_processed": processed_count,
+            "total_files": len(files)
+        }
+
+def detach_uploads(files: List[UploadFile]) -> List[tuple]:
+    """Take ownership of the spooled upload files so they outlive the request handler.
+
+    FastAPI closes multipart uploads as soon as the endpoint returns, before a
+    StreamingResponse body runs. Swapping in an empty buffer leaves the
+    original spooled file open; ``iter_completed`` reads and closes it later.
+    Non-image uploads are recorded as ``None``.
+    """
+    uploads = []
+    for file in files:
+        if file.content_type and file.content_type.startswith('image/'):
+            uploads.append((file.filename, file.file))
+            file.file = io.BytesIO()
+        else:
+            uploads.append((file.filename, None))
+    return uploads
+
+async def iter_completed(uploads: List[tuple], handler, concurrency: int = STREAM_CONCURRENCY):
+    """Run ``handler`` on each upload's bytes and yield events in completion order.
+
+    At most ``concurrency`` uploads are read and processed at once. Each event
+    carries the input ``index`` and ``filename`` plus either ``result`` or
+    ``error``. Leaving the iterator early cancels the remaining work.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def run(index: int) -> dict:
+        filename, spooled = uploads[index]
+        event = {"index": index, "filename": filename}
+        if spooled is None:
+            event["error"] = "Invalid file type"
+            return event
+        async with semaphore:
+            try:
+                with STAGE_SECONDS.time(stage="upload_read"):
+                    spooled.seek(0)
+                    file_content = spooled.read()
+                spooled.close()
+                event["result"] = await handler(file_content)
+            except HTTPException as e:
+                event["error"] = e.detail
+            except Overloaded as e:
+                event["error"] = str(e)
+                event["retry_after"] = e.retry_after
+            except Exception as e:
+                logging.warning(f"Error processing file {filename}: {e}")
+                event["error"] = str(e)
+            finally:
+                spooled.close()
+        return event
+    
+    tasks = [asyncio.ensure_future(run(i)) for i in range(len(uploads))]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away mid-stream: stop work on the remaining images
+        for task in tasks:
+            task.cancel()
+        for _, spooled in uploads:
+            if spooled is not None:
+                spooled.close()
+
+def format_stream_event(payload: dict, stream_format: str, event: str = "result") -> str:
+    """Serialize one streamed payload as an NDJSON line or a Server-Sent Event"""
+    data = json.dumps(payload)
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {data}\n\n"
+    return data + "\n"
+
+@api_router.post("/detect/batch/stream")
+async def stream_batch_detection(request: Request, files: List[UploadFile] = File(...),
+                                 params: DetectionParams = Depends(detection_params),
+                                 output: OutputParams = Depends(), detections_only: bool = False,
+                                 format: Literal["ndjson", "sse"] = "ndjson"):
+    """Batch detection that streams each image's result as soon as it completes"""
+    
+    if output.encoding == "binary":
+        raise HTTPException(status_code=400, detail="Binary encoding is only supported by /detect/single; use encoding=url")
+    
+    if not files:
+        raise HTTPException(status_code=400, detail="No files provided")
+    
+    if len(files) > 100:
+        raise HTTPException(status_code=400, detail="Too many files. Maximum is 100 images.")
+    
+    enforce_rate_limit(request, len(files))
+    admission.check(min(len(files), STREAM_CONCURRENCY))
+    
+    uploads = detach_uploads(files)
+    
+    async def handle(file_content: bytes) -> dict:
+        # Accepted streams are admitted image by image and wait rather than fail midway
+        async with admission.admit(1, decoded_size(file_content), "bulk"):
+            return publish_images(await process_single_image(file_content, params, detections_only, output), output)
+    
+    async def event_stream():
+        processed_count = 0
+        async for event in iter_completed(uploads, handle):
+            if "result" in event:
+                processed_count += 1
+            yield format_stream_event(event, format)
+        
+        yield format_stream_event(
+            {"done": True, "total_processed": processed_count, "total_files": len(files)},
+            format,
+            event="done",
+        )
+    
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        event_stream(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @api_router.post("/detect/batch/download")
-async def download_batch_results(files: List[UploadFile] = File(...)):
-    """Process batch and return ZIP file with results"""
+async def download_batch_results(request: Request, files: List[UploadFile] = File(...),
+                                 params: DetectionParams = Depends(detection_params),
+                                 output: OutputParams = Depends(),
+                                 compression: Literal["store", "deflate"] = "store"):
+    """Process batch and stream a ZIP file with results as each image finishes"""
     
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
     
-    if len(files) > 50:  # Limit for ZIP download
-        raise HTTPException(status_code=400, detail="Too many files for ZIP download. Maximum is 50 images.")
+    if len(files) > ZIP_MAX_FILES:  # Limit for ZIP download
+        raise HTTPException(status_code=400, detail=f"Too many files for ZIP download. Maximum is {ZIP_MAX_FILES} images.")
+    
+    if not any(file.content_type and file.content_type.startswith('image/') for file in files):
+        raise HTTPException(status_code=400, detail="No valid images could be processed")
+    
+    enforce_rate_limit(request, len(files))
+    admission.check(min(len(files), STREAM_CONCURRENCY))
+    
+    uploads = detach_uploads(files)
+    
+    extension = IMAGE_FORMATS[output.image_format][0]
+    
+    async def encode_pair(file_content: bytes) -> tuple:
+        # Shares the single-image path (and its result cache); the images come back as raw bytes
+        async with admission.admit(1, decoded_size(file_content), "bulk"):
+            result = await process_single_image(file_content, params, output=output)
+        return result['left'], result['center']
+    
+    async def zip_stream():
+        # PNG/JPEG/WebP are already compressed, so storing them is the cheap default
+        writer = ZipStreamWriter(zipfile.ZIP_STORED if compression == "store" else zipfile.ZIP_DEFLATED)
+        errors = []
+        
+        async for event in iter_completed(uploads, encode_pair):
+            if "error" in event:
+                errors.append(f"{event['filename']}: {event['error']}")
+                continue
+            i = event["index"]
+            original, detected = event["result"]
+            entries = [(f"detected_{i+1:03d}{extension}", detected)]
+            if original is not None:
+                entries.insert(0, (f"original_{i+1:03d}{extension}", original))
+            yield await pipeline["encode"].run(writer.add_many, entries)
+        
+        if errors:
+            yield writer.add("errors.txt", "\n".join(errors).encode('utf-8'))
+        yield writer.close()
+    
+    return StreamingResponse(
+        zip_stream(),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=knife_detection_results.zip"}
+    )
+
+def read_video_batch(reader: VideoFrameReader, batch_size: int, width: int, gate: Optional[MotionGate]) -> tuple:
+    """Decode stage for video: the next sampled frames, the images to detect on and
+    the motion gate's (is_keyframe, score) verdict for each frame"""
+    frames = reader.read_batch(batch_size)
+    images = [resize_image(frame, width) if width > 0 and width != frame.shape[1] else frame
+              for _, _, frame in frames]
+    gating = [gate.check(frame) if gate is not None else (True, None) for _, _, frame in frames]
+    return frames, images, gating
+
+def annotate_frames(writer: AnnotatedVideoWriter, frames: list, images: List[np.ndarray],
+                    detections: List[Detections], classes: Sequence[str] = CLASSES) -> None:
+    """Encode stage for video: draw each frame's boxes at full size and append it to the output"""
+    for (_, _, frame), image, found in zip(frames, images, detections):
+        scaled = found.scaled(frame.shape[1] / image.shape[1], frame.shape[0] / image.shape[0])
+        writer.write(draw_detections(frame, scaled, classes))
+
+def purge_video_outputs() -> None:
+    """Delete annotated videos (and stray uploads) older than VIDEO_OUTPUT_TTL"""
+    cutoff = time.time() - VIDEO_OUTPUT_TTL
+    for path in VIDEO_OUTPUT_DIR.glob('*'):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+async def video_event_stream(video_id: str, reader: VideoFrameReader, writer: Optional[AnnotatedVideoWriter],
+                             source_path: Path, params: DetectionParams, batch_size: int, stream_format: str,
+                             gate: Optional[MotionGate] = None, tracker: Optional[BoxTracker] = None):
+    """Decode, detect and annotate a video in overlapping stages, yielding per-frame events.
+
+    Batch k+1 is decoded while batch k is on the model, and annotated frames
+    are written while batch k+1 is inferred. With a motion ``gate`` only
+    keyframes reach the model; the other frames get the ``tracker``'s
+    extrapolated boxes, or the last keyframe's boxes without one.
+    """
+    started = time.perf_counter()
+    processed = keyframes = 0
+    next_batch = pending_write = None
+    completed = False
+    last_detections = Detections.empty()
+    video_stats['videos'] += 1
+    
+    def read_next():
+        return asyncio.ensure_future(
+            pipeline["decode"].run(read_video_batch, reader, batch_size, params.inference_width, gate))
     
     try:
-        # Create in-memory ZIP file
-        zip_buffer = io.BytesIO()
+        yield format_stream_event({"video_id": video_id, **reader.info()}, stream_format, event="meta")
         
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            processed_count = 0
+        next_batch = read_next()
+        while True:
+            frames, images, gating = await next_batch
+            next_batch = None
+            if not frames:
+                break
+            next_batch = read_next()
             
-            for i, file in enumerate(files):
-                if not file.content_type or not file.content_type.startswith('image/'):
-                    continue
-                
+            keyed = [i for i, (is_keyframe, _) in enumerate(gating) if is_keyframe]
+            found = []
+            if keyed:
+                async with admission.admit(len(keyed), sum(images[i].nbytes for i in keyed), "bulk"):
+                    found = await pipeline["infer"].run(detect_batch, [images[i] for i in keyed], params)
+            inferred = dict(zip(keyed, found))
+            
+            # Resolve every frame's boxes in order, since the tracker is sequential
+            detections, track_ids = [], []
+            for i, (index, _, _) in enumerate(frames):
+                ids = None
+                if i in inferred:
+                    last_detections = inferred[i]
+                    if tracker is not None:
+                        ids = tracker.update(last_detections, index)
+                    detections.append(last_detections)
+                elif tracker is not None:
+                    predicted, ids = tracker.predict(index)
+                    detections.append(predicted)
+                else:
+                    detections.append(last_detections)
+                track_ids.append(ids)
+            keyframes += len(keyed)
+            video_stats['frames'] += len(frames)
+            video_stats['keyframes'] += len(keyed)
+            
+            if writer is not None:
+                # Frames must reach the writer in order, so at most one write is in flight
+                if pending_write is not None:
+                    await pending_write
+                pending_write = asyncio.ensure_future(
+                    pipeline["encode"].run(annotate_frames, writer, frames, images, detections, class_names(params)))
+            
+            for (index, timestamp, frame), image, found, ids, (is_keyframe, score) in zip(
+                    frames, images, detections, track_ids, gating):
+                processed += 1
+                boxes = detections_to_json(found, frame.shape, image.shape, class_names(params))
+                if ids is not None:
+                    for box, track_id in zip(boxes, ids):
+                        box['track_id'] = track_id
+                yield format_stream_event({
+                    "frame": index,
+                    "time_ms": round(timestamp, 1),
+                    "keyframe": is_keyframe,
+                    "motion": round(score, 3) if score is not None and np.isfinite(score) else None,
+                    "detections": boxes,
+                    "mock": found.mock,
+                }, stream_format, event="frame")
+        
+        if pending_write is not None:
+            await pending_write
+            pending_write = None
+        
+        elapsed = time.perf_counter() - started
+        done = {
+            "done": True,
+            "video_id": video_id,
+            "frames_processed": processed,
+            "keyframes": keyframes,
+            "skip_ratio": round(1 - keyframes / processed, 4) if processed else 0.0,
+            "elapsed_s": round(elapsed, 3),
+            "effective_fps": round(processed / elapsed, 2) if elapsed > 0 else None,
+            "inference_fps": round(keyframes / elapsed, 2) if elapsed > 0 else None,
+        }
+        if writer is not None:
+            await pipeline["encode"].run(writer.close)
+            done["annotated_url"] = f"/api/detect/video/{video_id}"
+        completed = True
+        yield format_stream_event(done, stream_format, event="done")
+    finally:
+        # Let in-flight reads and writes finish before releasing what they use
+        for task in (next_batch, pending_write):
+            if task is not None:
                 try:
-                    file_content = await file.read()
-                    
-                    # Convert to numpy array
-                    nparr = np.frombuffer(file_content, np.uint8)
-                    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                    
-                    if image is None:
-                        continue
-                    
-                    # Process image
-                    resized_image = resize_image(image, 300)
-                    loop = asyncio.get_event_loop()
-                    detected_image = await loop.run_in_executor(executor, detect_objects, resized_image)
-                    
-                    # Add original and detected images to ZIP
-                    _, orig_buffer = cv2.imencode('.png', resized_image)
-                    _, det_buffer = cv2.imencode('.png', detected_image)
-                    
-                    zip_file.writestr(f"original_{i+1:03d}.png", orig_buffer.tobytes())
-                    zip_file.writestr(f"detected_{i+1:03d}.png", det_buffer.tobytes())
-                    
-                    processed_count += 1
-                    
-                except Exception as e:
-                    logging.warning(f"Error processing file {file.filename}: {e}")
-                    continue
+                    await task
+                except Exception:
+                    pass
+        reader.close()
+        if writer is not None and not completed:
+            writer.close()
+            Path(writer.path).unlink(missing_ok=True)
+        source_path.unlink(missing_ok=True)
+
+@api_router.post("/detect/video")
+async def video_detection(request: Request, file: UploadFile = File(...), params: DetectionParams = Depends(detection_params),
+                          stride: int = Query(1, ge=1, description="Run detection on every n-th frame"),
+                          batch_size: int = Query(INFERENCE_BATCH_SIZE, ge=1, le=64),
+                          max_frames: Optional[int] = Query(None, ge=1, description="Stop after this many sampled frames"),
+                          annotate: bool = False,
+                          motion_gating: bool = Query(MOTION_GATING_ENABLED, description="Skip inference on static frames"),
+                          motion_threshold: float = Query(MOTION_THRESHOLD, ge=0.0, description="Per-cell mean abs difference (0-255) that counts as motion"),
+                          max_skip: int = Query(MOTION_MAX_SKIP, ge=0, description="Force a keyframe after this many skipped frames"),
+                          track: bool = Query(True, description="Extrapolate boxes on skipped frames with a box tracker"),
+                          format: Literal["ndjson", "sse"] = "ndjson"):
+    """Detect knives in an uploaded video, streaming per-frame detections"""
+    
+    if file.content_type and not file.content_type.startswith(('video/', 'application/octet-stream')):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a video.")
+    
+    # Frames are admitted batch by batch as the video is processed
+    enforce_rate_limit(request, 1)
+    admission.check(batch_size)
+    
+    VIDEO_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    purge_video_outputs()
+    
+    # VideoCapture needs a real file, and the upload is closed once this handler returns
+    video_id = uuid.uuid4().hex
+    source_path = VIDEO_OUTPUT_DIR / f"{video_id}.upload"
+    size = 0
+    try:
+        async with aiofiles.open(source_path, 'wb') as out:
+            while chunk := await file.read(1024 * 1024):
+                size += len(chunk)
+                if size > VIDEO_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Video too large. Maximum size is {VIDEO_MAX_BYTES // (1024 * 1024)}MB.")
+                await out.write(chunk)
+        
+        frame_limit = min(max_frames or VIDEO_MAX_FRAMES, VIDEO_MAX_FRAMES)
+        reader = await pipeline["decode"].run(VideoFrameReader, str(source_path), stride, frame_limit)
+    except (HTTPException, Overloaded):
+        source_path.unlink(missing_ok=True)
+        raise
+    except Exception as e:
+        source_path.unlink(missing_ok=True)
+        logging.warning(f"Could not read video {file.filename}: {e}")
+        raise HTTPException(status_code=400, detail="Could not decode video file")
+    
+    writer = None
+    if annotate:
+        try:
+            writer = AnnotatedVideoWriter(str(VIDEO_OUTPUT_DIR / f"{video_id}.mp4"),
+                                          reader.fps / stride, reader.width, reader.height)
+        except Exception as e:
+            reader.close()
+            source_path.unlink(missing_ok=True)
+            logging.error(f"Could not create annotated video: {e}")
+            raise HTTPException(status_code=500, detail="Could not create annotated video")
+    
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        video_event_stream(
+            video_id, reader, writer, source_path, params, batch_size, format,
+            gate=MotionGate(motion_threshold, max_skip) if motion_gating else None,
+            tracker=BoxTracker() if track else None,
+        ),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api_router.get("/detect/video/{video_id}")
+async def download_annotated_video(video_id: str):
+    """Download the annotated video produced by /detect/video?annotate=true"""
+    path = VIDEO_OUTPUT_DIR / f"{video_id}.mp4"
+    if not re.fullmatch(r"[0-9a-f]{32}", video_id) or not path.exists():
+        raise HTTPException(status_code=404, detail="Annotated video not found or expired")
+    return FileResponse(path, media_type="video/mp4", filename=f"annotated_{video_id}.mp4")
+
+@api_router.get("/images/{image_id}")
+async def get_result_image(image_id: str):
+    """Fetch a result image returned by URL (encoding=url) until it expires"""
+    found = image_store.get(image_id) if re.fullmatch(r"[0-9a-f]{32}", image_id) else None
+    if found is None:
+        raise HTTPException(status_code=404, detail="Image not found or expired")
+    data, media_type = found
+    return Response(content=data, media_type=media_type, headers={"Cache-Control": f"private, max-age={IMAGE_STORE_TTL}"})
+
+@api_router.websocket("/detect/ws")
+async def websocket_detection(websocket: WebSocket, params: DetectionParams = Depends()):
+    """Real-time detection: binary image frames in, detection JSON out.
+
+    Only the newest unprocessed frame is kept per connection. A frame that
+    arrives while another is waiting replaces it, so a slow model drops
+    stale frames instead of building up latency. Frames from all connections
+    go through the shared dynamic batcher and so share model calls.
+    """
+    error = model_selection_error(params)
+    if error is not None:
+        await websocket.close(code=1008, reason=error)
+        return
+    
+    await websocket.accept()
+    ws_stats['active_connections'] += 1
+    ws_stats['connections'] += 1
+    
+    latest: Optional[tuple] = None  # (seq, frame bytes or None, error)
+    frame_ready = asyncio.Event()
+    disconnected = False
+    dropped = 0
+    
+    async def receive_frames():
+        nonlocal latest, disconnected, dropped
+        seq = 0
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                seq += 1
+                ws_stats['frames_received'] += 1
+                data = message.get("bytes")
+                if data is None:
+                    pending = (seq, None, "Send frames as binary messages")
+                elif len(data) > WS_MAX_FRAME_BYTES:
+                    pending = (seq, None, f"Frame too large. Maximum size is {WS_MAX_FRAME_BYTES // (1024 * 1024)}MB.")
+                else:
+                    pending = (seq, data, None)
+                if latest is not None:
+                    dropped += 1
+                    ws_stats['frames_dropped'] += 1
+                latest = pending
+                frame_ready.set()
+        finally:
+            disconnected = True
+            frame_ready.set()
+    
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            if disconnected:
+                break
+            if latest is None:
+                continue
+            seq, data, error = latest
+            latest = None
+            
+            if error is not None:
+                await websocket.send_json({"seq": seq, "error": error})
+                continue
+            
+            wait = rate_limit_wait(websocket, 1, "interactive")
+            if wait > 0:
+                await websocket.send_json({"seq": seq, "error": "Rate limit exceeded", "retry_after": math.ceil(wait)})
+                continue
+            
+            started = time.perf_counter()
+            try:
+                async with admission.admit(1, decoded_size(data), "interactive", ADMISSION_QUEUE_TIMEOUT):
+                    result = await process_single_image(data, params, detections_only=True)
+                payload = {
+                    "seq": seq,
+                    **result,
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "dropped": dropped,
+                }
+                ws_stats['frames_processed'] += 1
+            except HTTPException as e:
+                payload = {"seq": seq, "error": e.detail}
+            except Overloaded as e:
+                payload = {"seq": seq, "error": str(e), "retry_after": e.retry_after}
+            await websocket.send_json(payload)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        ws_stats['active_connections'] -= 1
+
+async def run_job_item(job: dict, item: dict) -> dict:
+    """Scheduler handler: detect one stored upload of a job with the job's options"""
+    options = job["options"]
+    path = job_store.input_path(job["id"], item["idx"])
+    async with aiofiles.open(path, 'rb') as f:
+        file_content = await f.read()
+    try:
+        # Jobs were accepted already, so items wait for capacity instead of failing
+        async with admission.admit(1, decoded_size(file_content), "bulk"):
+            return await process_single_image(
+                file_content,
+                DetectionParams(**options["params"]),
+                options["detections_only"],
+                OutputParams(**options["output"]),
+            )
+    except HTTPException as e:
+        raise ValueError(e.detail)
+
+def job_summary(job: dict) -> dict:
+    """Public view of a job row"""
+    def timestamp(value: Optional[float]) -> Optional[str]:
+        return datetime.utcfromtimestamp(value).isoformat() if value else None
+    
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "total": job["total"],
+        "processed": job["processed"],
+        "failed": job["failed"],
+        "progress": job["processed"] / job["total"] if job["total"] else 1.0,
+        "created_at": timestamp(job["created_at"]),
+        "started_at": timestamp(job["started_at"]),
+        "finished_at": timestamp(job["finished_at"]),
+        "error": job["error"],
+    }
+
+async def get_job_or_404(job_id: str) -> dict:
+    job = None
+    if re.fullmatch(r"[0-9a-f]{32}", job_id):
+        job = await asyncio.get_running_loop().run_in_executor(None, job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# Upload schema for the docs, since submit_job parses its multipart body itself
+JOB_UPLOAD_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["files"],
+            "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+        }}},
+    },
+}
+
+async def spool_job_inputs(job_id: str, files: list) -> Dict[int, str]:
+    """Copy uploads to the job's input files; returns per-item errors for uploads rejected up front"""
+    inputs_dir = job_store.input_path(job_id, 0).parent
+    inputs_dir.mkdir(parents=True, exist_ok=True)
+    errors = {}
+    try:
+        for i, file in enumerate(files):
+            if not file.content_type or not file.content_type.startswith('image/'):
+                errors[i] = "Invalid file type"
+                continue
+            if file.size and file.size > 10 * 1024 * 1024:
+                errors[i] = "File size too large. Maximum size is 10MB."
+                continue
+            async with aiofiles.open(job_store.input_path(job_id, i), 'wb') as out:
+                while chunk := await file.read(1024 * 1024):
+                    await out.write(chunk)
+    except BaseException:
+        # Don't leave a half-written job directory behind
+        await asyncio.get_running_loop().run_in_executor(None, job_store.delete, job_id)
+        raise
+    return errors
+
+@api_router.post("/jobs", status_code=202, openapi_extra=JOB_UPLOAD_SCHEMA)
+async def submit_job(request: Request, params: DetectionParams = Depends(detection_params),
+                     output: OutputParams = Depends(), detections_only: bool = False,
+                     priority: int = Query(0, ge=0, le=9, description="Higher priorities start first")):
+    """Queue a batch for background detection; poll /jobs/{job_id} for progress"""
+    
+    if output.encoding == "binary":
+        raise HTTPException(status_code=400, detail="Binary encoding is not supported for jobs; use encoding=url")
+    
+    # Parsed here instead of with File(...), whose parser stops at Starlette's default of 1000 files
+    form = await request.form(max_files=JOBS_MAX_FILES)
+    try:
+        files = [value for value in form.getlist("files") if not isinstance(value, str)]
+        if not files:
+            raise HTTPException(status_code=400, detail="No files provided")
         
-        if processed_count == 0:
-            raise HTTPException(status_code=400, detail="No valid images could be processed")
+        enforce_rate_limit(request, len(files))
         
-        zip_buffer.seek(0)
+        try:
+            job_scheduler.check_capacity()
+        except QueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e))
         
-        return StreamingResponse(
-            io.BytesIO(zip_buffer.read()),
-            media_type="application/zip",
-            headers={"Content-Disposition": "attachment; filename=knife_detection_results.zip"}
-        )
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, job_store.purge, JOBS_TTL)
         
-    except Exception as e:
-        logging.error(f"Error creating ZIP file: {e}")
-        raise HTTPException(status_code=500, detail="Error creating ZIP file")
+        # Spool every upload to the job directory; invalid files fail up front
+        job_id = uuid.uuid4().hex
+        errors = await spool_job_inputs(job_id, files)
+        filenames = [file.filename or f"file_{i+1}" for i, file in enumerate(files)]
+    finally:
+        await form.close()
+    
+    options = {
+        "params": params.model_dump(),
+        "output": output.model_dump(),
+        "detections_only": detections_only,
+    }
+    try:
+        await loop.run_in_executor(None, job_store.create, job_id, priority, options, filenames, errors)
+    except Exception:
+        await loop.run_in_executor(None, job_store.delete, job_id)
+        raise
+    job_scheduler.submit(job_id, priority)
+    
+    return {
+        **job_summary(await get_job_or_404(job_id)),
+        "status_url": f"/api/jobs/{job_id}",
+        "events_url": f"/api/jobs/{job_id}/events",
+        "results_url": f"/api/jobs/{job_id}/results",
+        "download_url": f"/api/jobs/{job_id}/download",
+    }
+
+@api_router.get("/jobs")
+async def list_jobs(limit: int = Query(50, ge=1, le=500)):
+    """Most recently submitted jobs"""
+    jobs = await asyncio.get_running_loop().run_in_executor(None, job_store.list, limit)
+    return {"jobs": [job_summary(job) for job in jobs]}
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and progress of a job"""
+    return job_summary(await get_job_or_404(job_id))
+
+@api_router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, format: Literal["ndjson", "sse"] = "sse"):
+    """Stream progress updates until the job finishes"""
+    await get_job_or_404(job_id)
+    
+    async def event_stream():
+        last = None
+        while True:
+            summary = job_summary(await get_job_or_404(job_id))
+            if summary != last:
+                yield format_stream_event(summary, format, event="progress")
+                last = summary
+            if summary["status"] in TERMINAL_STATES:
+                yield format_stream_event(summary, format, event="done")
+                return
+            # The timeout doubles as a keep-alive for idle queued jobs
+            await job_scheduler.wait_for_update(job_id, timeout=15)
+    
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        event_stream(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api_router.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000)):
+    """Page through the finished items of a job in upload order"""
+    job = await get_job_or_404(job_id)
+    output = OutputParams(**job["options"]["output"])
+    items = await asyncio.get_running_loop().run_in_executor(None, job_store.read_results, job_id, offset, limit)
+    for item in items:
+        if "result" in item:
+            item["result"] = publish_images(item["result"], output)
+    return {
+        **job_summary(job),
+        "offset": offset,
+        "results": items,
+    }
+
+@api_router.get("/jobs/{job_id}/download")
+async def download_job_results(job_id: str, compression: Literal["store", "deflate"] = "store"):
+    """ZIP of a finished job: result images, detections.json and errors.txt"""
+    job = await get_job_or_404(job_id)
+    if job["status"] not in TERMINAL_STATES:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}; download it once it has finished")
+    
+    extension = IMAGE_FORMATS[job["options"]["output"]["image_format"]][0]
+    
+    async def zip_stream():
+        writer = ZipStreamWriter(zipfile.ZIP_STORED if compression == "store" else zipfile.ZIP_DEFLATED)
+        detections, errors = [], []
+        offset = 0
+        while True:
+            items = await asyncio.get_running_loop().run_in_executor(None, job_store.read_results, job_id, offset, 50)
+            if not items:
+                break
+            offset += len(items)
+            entries = []
+            for item in items:
+                if "error" in item:
+                    errors.append(f"{item['filename']}: {item['error']}")
+                    continue
+                result = item["result"]
+                i = item["index"]
+                detections.append({"index": i, "filename": item["filename"], "detections": result.get("detections")})
+                if result.get("left") is not None:
+                    entries.append((f"original_{i+1:03d}{extension}", result["left"]))
+                if result.get("center") is not None:
+                    entries.append((f"detected_{i+1:03d}{extension}", result["center"]))
+            yield await pipeline["encode"].run(writer.add_many, entries)
+        
+        yield writer.add("detections.json", json.dumps(detections, indent=2).encode('utf-8'))
+        if errors:
+            yield writer.add("errors.txt", "\n".join(errors).encode('utf-8'))
+        yield writer.close()
+    
+    return StreamingResponse(
+        zip_stream(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=knife_detection_job_{job_id}.zip"}
+    )
+
+@api_router.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """Cancel a queued or running job, or delete a finished one and its results"""
+    job = await get_job_or_404(job_id)
+    if job["status"] not in TERMINAL_STATES:
+        await job_scheduler.cancel(job_id)
+        return {"job_id": job_id, "status": "cancelled"}
+    await asyncio.get_running_loop().run_in_executor(None, job_store.delete, job_id)
+    return {"job_id": job_id, "status": "deleted"}
 
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc: Overloaded):
+    """Admission budget exhausted: fail fast so clients back off instead of piling up"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -368,6 +2086,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    """Count API requests and time them by route template (not raw path, to bound label cardinality)"""
+    if not request.url.path.startswith("/api"):
+        return await call_next(request)
+    started = time.perf_counter()
+    status = 500
+    HTTP_IN_FLIGHT.inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        HTTP_REQUESTS.inc(method=request.method, route=route_path, status=status)
+        HTTP_SECONDS.observe(time.perf_counter() - started, method=request.method, route=route_path)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -378,9 +2115,40 @@ logger = logging.getLogger(__name__)
 @app.on_event("startup")
 async def startup_event():
     """Initialize model on startup"""
-    initialize_model()
+    global pipeline, job_store, job_scheduler, model_watcher
+    pipeline = DetectionPipeline(PIPELINE_THREADS, executor, queue_limit=PIPELINE_QUEUE_LIMIT or None)
+    for name, path in configured_models().items():
+        await load_models(name, path)
+    await asyncio.get_event_loop().run_in_executor(None, run_startup_benchmark)
+    if CASCADE_ENABLED and len(model_registry) and not any(is_screener(model) for model in model_registry):
+        logging.warning(
+            f"Cascade enabled but no loaded model{' named ' + CASCADE_MODEL if CASCADE_MODEL else ''} accepts "
+            f"{CASCADE_SIZE}x{CASCADE_SIZE} inputs; images go straight to the full detector"
+        )
+    if MODEL_RELOAD_INTERVAL > 0:
+        model_watcher = asyncio.create_task(watch_models())
+    
+    # Started last so resumed jobs find the batchers ready
+    job_store = JobStore(JOBS_DIR)
+    job_scheduler = JobScheduler(
+        job_store,
+        run_job_item,
+        max_concurrent_jobs=JOBS_CONCURRENCY,
+        item_concurrency=JOBS_ITEM_CONCURRENCY,
+        max_queued=JOBS_MAX_QUEUED,
+    )
+    await job_scheduler.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
+    if job_scheduler is not None:
+        await job_scheduler.stop()
+        job_store.close()
+    if model_watcher is not None:
+        model_watcher.cancel()
+    for model in model_registry:
+        await model.retire()
+    if pipeline is not None:
+        pipeline.shutdown()
     executor.shutdown(wait=True)
@@ -0,0 +1,170 @@
+"""ONNX Runtime session tuning driven by environment variables"""
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import onnxruntime as ort
+
+from inference import run_batch
+from preprocess import INPUT_SIZE
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+# Profiles trade per-call latency against concurrent throughput. The core
+# budget is split across ``concurrent_runs`` so sessions never oversubscribe.
+PROFILES: Dict[str, dict] = {
+    "balanced": {"concurrent_runs": 2},
+    "latency": {"concurrent_runs": 1},
+    "throughput": {"concurrent_runs": 4},
+}
+
+
+@dataclass
+class SessionConfig:
+    profile: str = "balanced"
+    graph_optimization_level: str = "all"
+    execution_mode: str = "sequential"
+    intra_op_threads: int = 0  # 0 derives the count from cpu_count / concurrent_runs
+    inter_op_threads: int = 1
+    concurrent_runs: int = 2
+    enable_mem_arena: bool = True
+    enable_mem_pattern: bool = True
+    providers: List[str] = field(default_factory=lambda: ["CPUExecutionProvider"])
+    optimized_model_dir: Optional[str] = None
+
+    @property
+    def resolved_intra_op_threads(self) -> int:
+        if self.intra_op_threads > 0:
+            return self.intra_op_threads
+        return max(1, (os.cpu_count() or 1) // max(1, self.concurrent_runs))
+
+    def for_concurrency(self, concurrent_runs: int, intra_op_threads: Optional[int] = None) -> "SessionConfig":
+        """Copy re-budgeted for a different number of simultaneous sessions"""
+        return replace(self, concurrent_runs=concurrent_runs,
+                       intra_op_threads=intra_op_threads or self.intra_op_threads)
+
+    def as_dict(self) -> dict:
+        values = asdict(self)
+        values["resolved_intra_op_threads"] = self.resolved_intra_op_threads
+        return values
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    return default if value is None else value.lower() in ("1", "true", "yes")
+
+
+def session_config_from_env() -> SessionConfig:
+    """Build a SessionConfig from ORT_PROFILE plus individual ORT_* overrides"""
+    profile = os.environ.get("ORT_PROFILE", "balanced")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown ORT_PROFILE '{profile}'. Choose from {sorted(PROFILES)}")
+    config = replace(SessionConfig(profile=profile), **PROFILES[profile])
+
+    level = os.environ.get("ORT_GRAPH_OPTIMIZATION_LEVEL", config.graph_optimization_level)
+    if level not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"Unknown ORT_GRAPH_OPTIMIZATION_LEVEL '{level}'. Choose from {sorted(GRAPH_OPTIMIZATION_LEVELS)}")
+    mode = os.environ.get("ORT_EXECUTION_MODE", config.execution_mode)
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"Unknown ORT_EXECUTION_MODE '{mode}'. Choose from {sorted(EXECUTION_MODES)}")
+
+    providers = [p.strip() for p in os.environ.get("ORT_PROVIDERS", "").split(",") if p.strip()]
+
+    return replace(
+        config,
+        graph_optimization_level=level,
+        execution_mode=mode,
+        intra_op_threads=int(os.environ.get("ORT_INTRA_OP_THREADS", config.intra_op_threads)),
+        inter_op_threads=int(os.environ.get("ORT_INTER_OP_THREADS", config.inter_op_threads)),
+        concurrent_runs=int(os.environ.get("ORT_CONCURRENT_RUNS", config.concurrent_runs)),
+        enable_mem_arena=_env_bool("ORT_ENABLE_MEM_ARENA", config.enable_mem_arena),
+        enable_mem_pattern=_env_bool("ORT_ENABLE_MEM_PATTERN", config.enable_mem_pattern),
+        providers=providers or config.providers,
+        optimized_model_dir=os.environ.get("ORT_OPTIMIZED_MODEL_DIR") or None,
+    )
+
+
+def build_session_options(config: SessionConfig) -> ort.SessionOptions:
+    options = ort.SessionOptions()
+    options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[config.graph_optimization_level]
+    options.execution_mode = EXECUTION_MODES[config.execution_mode]
+    options.intra_op_num_threads = config.resolved_intra_op_threads
+    options.inter_op_num_threads = config.inter_op_threads
+    options.enable_cpu_mem_arena = config.enable_mem_arena
+    options.enable_mem_pattern = config.enable_mem_pattern
+    return options
+
+
+def _available_providers(requested: Sequence[str]) -> List[str]:
+    available = ort.get_available_providers()
+    providers = [p for p in requested if p in available]
+    for missing in set(requested) - set(providers):
+        logging.warning(f"Execution provider {missing} is not available, skipping it")
+    return providers or ["CPUExecutionProvider"]
+
+
+def optimized_model_path(model_path: Path, config: SessionConfig) -> Optional[Path]:
+    """Cache location for the optimized graph, keyed on model file and optimizer settings"""
+    if not config.optimized_model_dir or config.graph_optimization_level == "disable":
+        return None
+    stat = model_path.stat()
+    key = f"{model_path.stem}-{stat.st_size}-{int(stat.st_mtime)}-{config.graph_optimization_level}-ort{ort.__version__}"
+    return Path(config.optimized_model_dir) / f"{key}.onnx"
+
+
+def create_session(model_path, config: Optional[SessionConfig] = None) -> ort.InferenceSession:
+    """Create an InferenceSession, reusing a previously saved optimized graph when present"""
+    config = config or SessionConfig()
+    model_path = Path(model_path)
+    options = build_session_options(config)
+    providers = _available_providers(config.providers)
+
+    cache_path = optimized_model_path(model_path, config)
+    if cache_path is not None:
+        if cache_path.exists():
+            # The cached graph is already optimized; skip the optimizer on load
+            options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS["disable"]
+            logging.info(f"Loading optimized model from {cache_path}")
+            return ort.InferenceSession(str(cache_path), options, providers=providers)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        options.optimized_model_filepath = str(cache_path)
+        logging.info(f"Saving optimized model to {cache_path}")
+
+    return ort.InferenceSession(str(model_path), options, providers=providers)
+
+
+def benchmark_session(session: ort.InferenceSession, runs: int = 10,
+                      batch_sizes: Sequence[int] = (1,)) -> Dict[str, dict]:
+    """Time inference on zero tensors and report ms per batch and per image"""
+    shape = session.get_inputs()[0].shape
+    chw = tuple(dim if isinstance(dim, int) else size
+                for dim, size in zip(shape[1:], (3, INPUT_SIZE, INPUT_SIZE)))
+
+    results = {}
+    for batch_size in batch_sizes:
+        tensor = np.zeros((batch_size,) + chw, np.float32)
+        run_batch(session, tensor)  # warm-up
+        started = time.perf_counter()
+        for _ in range(runs):
+            run_batch(session, tensor)
+        per_batch = (time.perf_counter() - started) / runs * 1000
+        results[f"batch_{batch_size}"] = {
+            "ms_per_batch": round(per_batch, 3),
+            "ms_per_image": round(per_batch / batch_size, 3),
+            "images_per_second": round(1000 * batch_size / per_batch, 1),
+        }
+    return results
@@ -0,0 +1,78 @@
+"""Sliced inference: overlapping tiles over large frames, merged back in frame coordinates"""
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+Tile = Tuple[int, int, int, int]  # x1, y1, x2, y2 in frame pixels
+
+
+def _starts(length: int, tile_size: int, stride: int) -> List[int]:
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, stride))
+    # Snap the last tile to the edge instead of letting it run past the frame
+    starts.append(length - tile_size)
+    return starts
+
+
+def tile_grid(width: int, height: int, tile_size: int = 640, overlap: float = 0.2) -> List[Tile]:
+    """Overlapping ``tile_size`` squares covering a width x height frame.
+
+    Neighbouring tiles share at least ``overlap`` of their side, so an
+    object cut by one tile boundary appears whole in the next tile. Frames
+    smaller than a tile along an axis get a single tile spanning that axis.
+    """
+    stride = max(1, int(tile_size * (1 - overlap)))
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in _starts(height, tile_size, stride)
+        for x in _starts(width, tile_size, stride)
+    ]
+
+
+def is_uniform(tile: np.ndarray, min_std: float) -> bool:
+    """True when the tile is (nearly) a single colour, e.g. blank sky, walls or padding.
+
+    Checked on a 1/4 subsample, which is plenty to tell texture from flat fill.
+    """
+    if min_std <= 0:
+        return False
+    _, std = cv2.meanStdDev(np.ascontiguousarray(tile[::4, ::4]))
+    return float(std.max()) < min_std
+
+
+def slice_image(image: np.ndarray, tile_size: int = 640, overlap: float = 0.2,
+                min_std: float = 0.0) -> Tuple[List[np.ndarray], List[Tile], int]:
+    """Cut a frame into tiles, dropping uniform ones.
+
+    Returns the tile views (no copies), their frame coordinates and the
+    number of tiles skipped as uniform.
+    """
+    height, width = image.shape[:2]
+    tiles, boxes, skipped = [], [], 0
+    for x1, y1, x2, y2 in tile_grid(width, height, tile_size, overlap):
+        tile = image[y1:y2, x1:x2]
+        if is_uniform(tile, min_std):
+            skipped += 1
+            continue
+        tiles.append(tile)
+        boxes.append((x1, y1, x2, y2))
+    return tiles, boxes, skipped
+
+
+def offset_candidates(candidates: tuple, tile: Tile) -> tuple:
+    """Shift (boxes, scores, labels) found inside a tile into frame coordinates"""
+    boxes, scores, labels = candidates
+    x1, y1 = tile[:2]
+    return boxes + np.array([x1, y1, x1, y1], boxes.dtype), scores, labels
+
+
+def merge_candidates(parts: List[tuple]) -> tuple:
+    """Concatenate per-tile candidates of one frame ahead of global NMS"""
+    if not parts:
+        return np.empty((0, 4), np.float32), np.empty(0, np.float32), np.empty(0, np.int64)
+    boxes = np.concatenate([p[0] for p in parts]).reshape(-1, 4)
+    scores = np.concatenate([p[1] for p in parts])
+    labels = np.concatenate([p[2] for p in parts])
+    return boxes, scores, labels
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Reproducible latency/throughput benchmark of the detection API, in-process
+
+Usage:
+    python tools/bench_api.py --json bench.json
+    python tools/bench_api.py --images ./samples --targets asgi --concurrency 1,8,32
+    python tools/bench_api.py --json new.json --compare bench.json --max-regression 10
+
+Targets:
+    detect   detect_objects() on pre-decoded frames, from a thread pool
+    process  process_single_image() on the encoded bytes (pipeline + batcher)
+    asgi     POST /api/detect/single through httpx's ASGI transport (no network)
+
+Corpora are synthetic scenes rendered at each --resolutions size from a
+fixed seed, plus the files in --images when given (recorded corpus). Every
+target x corpus x concurrency scenario sends --requests requests after
+--warmup untimed ones and reports p50/p95/p99 latency, images/sec and the
+process's peak RSS so far. The result cache is disabled unless --cache is
+passed, so repeated images are actually re-detected.
+
+The JSON report records the git commit and the runtime configuration; with
+--compare, scenarios are matched against an earlier report and the run
+exits non-zero when p95 latency or throughput regress by more than
+--max-regression percent.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+TARGETS = ("detect", "process", "asgi")
+
+
+def synthetic_corpus(width: int, height: int, count: int, seed: int) -> List[bytes]:
+    """JPEG-encoded scenes with gradients, shapes and noise, deterministic per seed"""
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+        base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1) * rng.uniform(0.3, 1.0, 3)
+        image = np.clip(base + rng.normal(0, 8, base.shape), 0, 255).astype(np.uint8)
+        for _ in range(int(rng.integers(5, 20))):
+            x1, y1 = int(rng.integers(0, width)), int(rng.integers(0, height))
+            x2, y2 = int(rng.integers(0, width)), int(rng.integers(0, height))
+            color = tuple(int(c) for c in rng.integers(0, 255, 3))
+            if rng.random() < 0.5:
+                cv2.rectangle(image, (x1, y1), (x2, y2), color, -1)
+            else:
+                cv2.line(image, (x1, y1), (x2, y2), color, int(rng.integers(2, 12)))
+        images.append(cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes())
+    return images
+
+
+def recorded_corpus(image_dir: Path, limit: int) -> List[bytes]:
+    from quantization import IMAGE_EXTENSIONS
+
+    paths = [p for p in sorted(image_dir.iterdir()) if p.suffix.lower() in IMAGE_EXTENSIONS]
+    return [p.read_bytes() for p in paths[:limit]]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    values = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "latency_ms_p50": round(float(np.percentile(values, 50)), 3),
+        "latency_ms_p95": round(float(np.percentile(values, 95)), 3),
+        "latency_ms_p99": round(float(np.percentile(values, 99)), 3),
+        "latency_ms_mean": round(float(values.mean()), 3),
+        "images_per_sec": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def drive(call: Callable[[object], Awaitable[None]], corpus: list, requests: int,
+                concurrency: int, warmup: int) -> dict:
+    """Issue ``requests`` calls cycling through ``corpus`` with ``concurrency`` in flight"""
+    for i in range(warmup):
+        await call(corpus[i % len(corpus)])
+
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def client() -> None:
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                await call(corpus[i % len(corpus)])
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def make_call(target: str, server, client, threads: ThreadPoolExecutor):
+    if target == "detect":
+        async def call(image: np.ndarray) -> None:
+            await asyncio.get_running_loop().run_in_executor(threads, server.detect_objects, image)
+    elif target == "process":
+        async def call(data: bytes) -> None:
+            await server.process_single_image(data)
+    else:
+        async def call(data: bytes) -> None:
+            response = await client.post("/api/detect/single", files={"file": ("bench.jpg", data, "image/jpeg")})
+            response.raise_for_status()
+    return call
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Scenario-by-scenario deltas; returns descriptions of regressions beyond the threshold"""
+    previous = {r["scenario"]: r for r in baseline.get("results", [])}
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp')}):")
+    print(f"{'scenario':<40}{'p95 ms':>12}{'delta':>9}{'img/s':>12}{'delta':>9}")
+    for result in report["results"]:
+        before = previous.get(result["scenario"])
+        if before is None:
+            continue
+        p95_delta = (result["latency_ms_p95"] / before["latency_ms_p95"] - 1) * 100 if before["latency_ms_p95"] else 0.0
+        ips_delta = (result["images_per_sec"] / before["images_per_sec"] - 1) * 100 if before["images_per_sec"] else 0.0
+        print(f"{result['scenario']:<40}{result['latency_ms_p95']:>12}{p95_delta:>+8.1f}%"
+              f"{result['images_per_sec']:>12}{ips_delta:>+8.1f}%")
+        if p95_delta > max_regression or -ips_delta > max_regression:
+            regressions.append(f"{result['scenario']}: p95 {p95_delta:+.1f}%, throughput {ips_delta:+.1f}%")
+    return regressions
+
+
+async def run(args) -> dict:
+    import httpx
+    import onnxruntime as ort
+
+    import server
+
+    # Per-image warnings (e.g. mock fallback) would drown the report
+    logging.getLogger().setLevel(logging.ERROR)
+    if args.model is not None:
+        server.MODEL_PATH = args.model
+    await server.startup_event()
+
+    corpora = {}
+    for index, size in enumerate(args.resolutions.split(",")):
+        width, height = (int(v) for v in size.lower().split("x"))
+        corpora[f"synthetic-{width}x{height}"] = synthetic_corpus(width, height, args.corpus_size, args.seed + index)
+    if args.images is not None:
+        recorded = recorded_corpus(args.images, args.corpus_size)
+        if not recorded:
+            raise SystemExit(f"No readable images in {args.images}")
+        corpora[f"recorded-{args.images.name}"] = recorded
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    concurrencies = [int(c) for c in args.concurrency.split(",")]
+    threads = ThreadPoolExecutor(max_workers=max(concurrencies))
+    transport = httpx.ASGITransport(app=server.app)
+
+    results = []
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for target in targets:
+                call = make_call(target, server, client, threads)
+                for corpus_name, corpus in corpora.items():
+                    # The raw model path takes frames that are already decoded
+                    inputs = [server.decode_image(data) for data in corpus] if target == "detect" else corpus
+                    for concurrency in concurrencies:
+                        scenario = f"{target}/{corpus_name}/c{concurrency}"
+                        result = await drive(call, inputs, args.requests, concurrency, args.warmup)
+                        results.append({"scenario": scenario, "target": target, "corpus": corpus_name,
+                                        "concurrency": concurrency, **result})
+                        print(f"{scenario:<40}{result['latency_ms_p50']:>10}{result['latency_ms_p95']:>10}"
+                              f"{result['latency_ms_p99']:>10}{result['images_per_sec']:>10}"
+                              f"{result['peak_rss_mb']:>10}{result['errors']:>8}", flush=True)
+    finally:
+        threads.shutdown()
+        await server.shutdown_event()
+
+    default = server.model_registry.default
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "onnxruntime": ort.__version__,
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+        },
+        "config": {
+            "model_path": str(default.path if default is not None else server.MODEL_PATH),
+            "model_loaded": default is not None,
+            "model_name": server.model_registry.default_name,
+            "variant": server.MODEL_VARIANT,
+            "session": server.SESSION_CONFIG.as_dict(),
+            "batcher": server.BATCHER_ENABLED,
+            "batcher_max_batch_size": server.BATCHER_MAX_BATCH_SIZE,
+            "batcher_max_wait_ms": server.BATCHER_MAX_WAIT_MS,
+            "inference_workers": server.INFERENCE_WORKERS,
+            "inference_width": server.INFERENCE_WIDTH,
+            "result_cache": server.result_cache.enabled,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "corpus_size": args.corpus_size,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"Comma-separated subset of {TARGETS}")
+    parser.add_argument("--resolutions", default="640x480,1280x720,1920x1080", help="Synthetic corpus sizes, WxH")
+    parser.add_argument("--images", type=Path, help="Recorded corpus folder, benchmarked alongside the synthetic ones")
+    parser.add_argument("--corpus-size", type=int, default=16, help="Images per corpus")
+    parser.add_argument("--concurrency", default="1,8", help="Comma-separated in-flight request counts")
+    parser.add_argument("--requests", type=int, default=100, help="Timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", type=Path, help="Model to load instead of backend/best.onnx")
+    parser.add_argument("--cache", action="store_true", help="Keep the result cache enabled")
+    parser.add_argument("--json", type=Path, help="Write the report to this file")
+    parser.add_argument("--compare", type=Path, help="Earlier --json report to compare against")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Allowed p95/throughput regression, %%")
+    args = parser.parse_args()
+
+    unknown = set(t.strip() for t in args.targets.split(",")) - set(TARGETS)
+    if unknown:
+        parser.error(f"Unknown targets: {', '.join(sorted(unknown))}")
+
+    # Must be set before the server module reads its configuration
+    if not args.cache:
+        os.environ["RESULT_CACHE_MB"] = "0"
+        os.environ.pop("RESULT_CACHE_DIR", None)
+
+    print(f"{'scenario':<40}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'img/s':>10}{'RSS MB':>10}{'errors':>8}")
+    report = asyncio.run(run(args))
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text()), args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} scenario(s) regressed by more than {args.max_regression}%:")
+            for line in regressions:
+                print(f"  {line}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
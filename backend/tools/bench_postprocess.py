@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: vectorized YOLO output decoding vs the per-row Python loop
+
+Usage:
+    # Record raw model outputs for a folder of images
+    python tools/bench_postprocess.py --record outputs.npy --images ./samples
+
+    # Compare both decoders on recorded outputs
+    python tools/bench_postprocess.py --outputs outputs.npy
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from postprocess import decode_predictions  # noqa: E402
+
+CLASS_IDS = [0]
+CONF_THRESHOLD = 0.70
+
+
+def decode_loop(output: np.ndarray, scale: float):
+    """Reference implementation: the original per-row minMaxLoc loop"""
+    predictions = cv2.transpose(output)
+    boxes = []
+    scores = []
+    class_ids = []
+    for i in range(predictions.shape[0]):
+        classes_scores = predictions[i][4:]
+        (_, max_score, _, (_, max_class_index)) = cv2.minMaxLoc(classes_scores)
+        if max_score >= CONF_THRESHOLD and max_class_index in CLASS_IDS:
+            boxes.append([
+                (predictions[i][0] - 0.5 * predictions[i][2]) * scale,
+                (predictions[i][1] - 0.5 * predictions[i][3]) * scale,
+                (predictions[i][0] + 0.5 * predictions[i][2]) * scale,
+                (predictions[i][1] + 0.5 * predictions[i][3]) * scale,
+            ])
+            scores.append(max_score)
+            class_ids.append(CLASS_IDS.index(max_class_index))
+    return np.array(boxes, np.float32).reshape(-1, 4), np.array(scores, np.float32), np.array(class_ids)
+
+
+def decode_vectorized(output: np.ndarray, scale: float):
+    return decode_predictions(output, scale, CONF_THRESHOLD, CLASS_IDS)
+
+
+def record_outputs(model_path: Path, image_dir: Path, destination: Path) -> None:
+    """Run the model over every image in image_dir and save the raw outputs"""
+    import onnxruntime as ort
+    from inference import infer_images, run_batch
+
+    session = ort.InferenceSession(str(model_path))
+    images = []
+    for path in sorted(image_dir.iterdir()):
+        image = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if image is not None:
+            images.append(image)
+    if not images:
+        raise SystemExit(f"No readable images in {image_dir}")
+
+    outputs = np.stack([output for output, _ in infer_images(lambda tensor: run_batch(session, tensor), images)])
+    np.save(destination, outputs)
+    print(f"Recorded {outputs.shape[0]} outputs with shape {outputs.shape[1:]} to {destination}")
+
+
+def synthetic_outputs(count: int, anchors: int = 8400, num_classes: int = 1, seed: int = 0) -> np.ndarray:
+    """Random outputs with a realistic share of candidates above threshold"""
+    rng = np.random.default_rng(seed)
+    outputs = np.empty((count, 4 + num_classes, anchors), np.float32)
+    outputs[:, 0:2] = rng.uniform(0, 640, (count, 2, anchors))
+    outputs[:, 2:4] = rng.uniform(8, 200, (count, 2, anchors))
+    outputs[:, 4:] = rng.beta(0.5, 6, (count, num_classes, anchors))
+    return outputs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--outputs", type=Path, help="Recorded outputs (.npy, shape N x (4+C) x A)")
+    parser.add_argument("--record", type=Path, help="Record outputs to this .npy file and exit")
+    parser.add_argument("--images", type=Path, help="Image folder used with --record")
+    parser.add_argument("--model", type=Path, default=Path(__file__).resolve().parent.parent / "best.onnx")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=300 / 640)
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.images:
+            parser.error("--record requires --images")
+        record_outputs(args.model, args.images, args.record)
+        return
+
+    if args.outputs:
+        outputs = np.load(args.outputs)
+        source = str(args.outputs)
+    else:
+        outputs = synthetic_outputs(16)
+        source = "synthetic"
+
+    # Both decoders must agree before their timings mean anything
+    for output in outputs:
+        loop_boxes, loop_scores, loop_ids = decode_loop(output, args.scale)
+        vec_boxes, vec_scores, vec_ids = decode_vectorized(output, args.scale)
+        assert np.allclose(loop_boxes, vec_boxes, atol=1e-3), "box mismatch"
+        assert np.allclose(loop_scores, vec_scores), "score mismatch"
+        assert np.array_equal(loop_ids, vec_ids), "class mismatch"
+
+    def run(decoder):
+        return min(timeit.repeat(lambda: [decoder(output, args.scale) for output in outputs],
+                                 number=1, repeat=args.repeat)) / len(outputs) * 1000
+
+    loop_ms = run(decode_loop)
+    vec_ms = run(decode_vectorized)
+
+    print(f"Outputs: {source}, {outputs.shape[0]} x {outputs.shape[1:]}")
+    print(f"Python loop : {loop_ms:8.3f} ms/image")
+    print(f"Vectorized  : {vec_ms:8.3f} ms/image")
+    print(f"Speedup     : {loop_ms / vec_ms:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Accuracy-vs-speed comparison of the FP32, INT8 and FP16 model variants
+
+Usage:
+    python tools/bench_variants.py --images ./samples
+    python tools/bench_variants.py --images ./samples --variants fp32,int8 --json report.json
+
+Every variant runs on the same letterboxed images. Latency is measured one
+image per call, throughput with --batch-size images per call. Agreement
+treats the FP32 detections as reference: a detection matches when it has
+the same class and IoU >= --match-iou with an unmatched FP32 box.
+Session settings come from the same ORT_* environment as the server.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from inference import run_batch  # noqa: E402
+from nms import batched_nms, box_iou  # noqa: E402
+from postprocess import decode_predictions  # noqa: E402
+from preprocess import letterbox  # noqa: E402
+from quantization import MODEL_VARIANTS, load_images, variant_path  # noqa: E402
+from session_config import create_session, session_config_from_env  # noqa: E402
+
+
+def detect(outputs: np.ndarray, scales, conf_threshold: float, iou_threshold: float, class_ids):
+    candidates = [decode_predictions(output, scale, conf_threshold, class_ids)
+                  for output, scale in zip(outputs, scales)]
+    keeps = batched_nms(candidates, iou_threshold=iou_threshold)
+    return [(boxes[keep], scores[keep], labels[keep]) for (boxes, scores, labels), keep in zip(candidates, keeps)]
+
+
+def match(reference, candidate, match_iou: float):
+    """Greedy one-to-one matching; returns (matched pairs, IoUs, score deltas)"""
+    ref_boxes, ref_scores, ref_labels = reference
+    boxes, scores, labels = candidate
+    if len(ref_boxes) == 0 or len(boxes) == 0:
+        return 0, [], []
+
+    iou = box_iou(boxes, ref_boxes)
+    iou[labels[:, None] != ref_labels[None, :]] = 0
+    matched, ious, deltas = 0, [], []
+    used = np.zeros(len(ref_boxes), bool)
+    for i in np.argsort(-scores):
+        row = np.where(used, 0, iou[i])
+        j = int(np.argmax(row))
+        if row[j] >= match_iou:
+            used[j] = True
+            matched += 1
+            ious.append(row[j])
+            deltas.append(abs(float(scores[i]) - float(ref_scores[j])))
+    return matched, ious, deltas
+
+
+def agreement(reference, candidate, match_iou: float) -> dict:
+    total_ref = sum(len(r[0]) for r in reference)
+    total_cand = sum(len(c[0]) for c in candidate)
+    matched, ious, deltas = 0, [], []
+    for ref, cand in zip(reference, candidate):
+        m, i, d = match(ref, cand, match_iou)
+        matched += m
+        ious.extend(i)
+        deltas.extend(d)
+
+    precision = matched / total_cand if total_cand else 1.0
+    recall = matched / total_ref if total_ref else 1.0
+    return {
+        "detections": total_cand,
+        "reference_detections": total_ref,
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+        "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+        "mean_score_delta": round(float(np.mean(deltas)), 4) if deltas else None,
+    }
+
+
+def bench_variant(session, blobs: np.ndarray, batch_size: int, runs: int) -> dict:
+    run_batch(session, blobs[:1])  # warm-up
+
+    latencies = []
+    for _ in range(runs):
+        for blob in blobs:
+            started = time.perf_counter()
+            run_batch(session, blob[None])
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    for _ in range(runs):
+        for start in range(0, len(blobs), batch_size):
+            run_batch(session, blobs[start:start + batch_size])
+    elapsed = time.perf_counter() - started
+
+    return {
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+        "throughput_ips": round(runs * len(blobs) / elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=Path, required=True, help="Evaluation image folder")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--model", type=Path, default=Path(__file__).resolve().parent.parent / "best.onnx")
+    parser.add_argument("--variants", default=",".join(MODEL_VARIANTS))
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--conf", type=float, default=0.70)
+    parser.add_argument("--iou", type=float, default=0.45)
+    parser.add_argument("--match-iou", type=float, default=0.5)
+    parser.add_argument("--classes", type=int, default=1, help="Number of model classes")
+    parser.add_argument("--json", type=Path, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.limit)
+    if not images:
+        raise SystemExit(f"No readable images in {args.images}")
+    letterboxed = [letterbox(image) for image in images]
+    blobs = np.concatenate([blob for blob, _ in letterboxed], axis=0)
+    scales = [scale for _, scale in letterboxed]
+    class_ids = list(range(args.classes))
+
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    if "fp32" not in variants:
+        variants.insert(0, "fp32")
+    config = session_config_from_env()
+
+    report = {}
+    reference = None
+    for variant in variants:
+        path = variant_path(args.model, variant)
+        if not path.exists():
+            print(f"Skipping {variant}: {path} not found (see tools/quantize_model.py)")
+            continue
+        session = create_session(path, config)
+        outputs = np.concatenate([run_batch(session, blobs[start:start + args.batch_size])
+                                  for start in range(0, len(blobs), args.batch_size)])
+        detections = detect(outputs, scales, args.conf, args.iou, class_ids)
+        if variant == "fp32":
+            reference = detections
+
+        result = {"model": str(path), "size_mb": round(path.stat().st_size / 1e6, 2)}
+        result.update(bench_variant(session, blobs, args.batch_size, args.runs))
+        if reference is not None:
+            result.update(agreement(reference, detections, args.match_iou))
+        report[variant] = result
+
+    print(f"Images: {len(images)}, batch size {args.batch_size}, profile {config.profile}")
+    print(f"{'variant':<8}{'MB':>8}{'p50 ms':>10}{'p95 ms':>10}{'img/s':>10}{'dets':>7}"
+          f"{'prec':>8}{'recall':>8}{'F1':>8}{'IoU':>8}")
+    for variant, r in report.items():
+        print(f"{variant:<8}{r['size_mb']:>8}{r['latency_ms_p50']:>10}{r['latency_ms_p95']:>10}"
+              f"{r['throughput_ips']:>10}{r.get('detections', '-'):>7}{r.get('precision', '-'):>8}"
+              f"{r.get('recall', '-'):>8}{r.get('f1', '-'):>8}{str(r.get('mean_iou')):>8}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
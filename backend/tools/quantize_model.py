@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Build INT8 / FP16 variants of the detection model next to the FP32 export
+
+Usage:
+    # Static INT8, calibrated on a folder of representative images
+    python tools/quantize_model.py int8-static --calibration ./samples
+
+    # Dynamic INT8 (no calibration data needed) and FP16
+    python tools/quantize_model.py int8-dynamic
+    python tools/quantize_model.py fp16
+
+Outputs land beside the model as best.int8.onnx / best.fp16.onnx, which is
+where the server looks for MODEL_VARIANT=int8 / fp16. Compare the result
+against FP32 with tools/bench_variants.py before deploying it.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from quantization import (  # noqa: E402
+    convert_fp16,
+    load_images,
+    quantize_int8_dynamic,
+    quantize_int8_static,
+    variant_path,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["int8-static", "int8-dynamic", "fp16"])
+    parser.add_argument("--model", type=Path, default=Path(__file__).resolve().parent.parent / "best.onnx")
+    parser.add_argument("--output", type=Path, help="Defaults to the variant path beside --model")
+    parser.add_argument("--calibration", type=Path, help="Image folder for int8-static")
+    parser.add_argument("--calibration-limit", type=int, default=200,
+                        help="Maximum calibration images (ranges settle after a few hundred)")
+    parser.add_argument("--method", choices=["minmax", "entropy", "percentile"], default="minmax")
+    parser.add_argument("--per-tensor", action="store_true", help="Per-tensor instead of per-channel weights")
+    parser.add_argument("--exclude-nodes", default="",
+                        help="Comma-separated node names to leave in FP32 (e.g. the detection head)")
+    parser.add_argument("--no-preprocess", action="store_true", help="Skip shape inference before quantizing")
+    args = parser.parse_args()
+
+    variant = "fp16" if args.mode == "fp16" else "int8"
+    output = args.output or variant_path(args.model, variant)
+
+    if args.mode == "int8-static":
+        if not args.calibration:
+            parser.error("int8-static requires --calibration")
+        images = load_images(args.calibration, args.calibration_limit)
+        if not images:
+            raise SystemExit(f"No readable images in {args.calibration}")
+        quantize_int8_static(
+            args.model,
+            output,
+            images,
+            method=args.method,
+            per_channel=not args.per_tensor,
+            exclude_nodes=[name.strip() for name in args.exclude_nodes.split(",") if name.strip()],
+            preprocess=not args.no_preprocess,
+        )
+    elif args.mode == "int8-dynamic":
+        quantize_int8_dynamic(args.model, output)
+    else:
+        convert_fp16(args.model, output)
+
+    source_mb = args.model.stat().st_size / 1e6
+    output_mb = output.stat().st_size / 1e6
+    print(f"Wrote {output} ({output_mb:.1f} MB, {source_mb:.1f} MB FP32)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Video decoding and annotated-video writing for the video detection endpoint"""
+import logging
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+Frame = Tuple[int, float, np.ndarray]  # frame index, timestamp in ms, BGR image
+
+
+class VideoFrameReader:
+    """Sequential reader that yields every ``stride``-th frame of a video file.
+
+    Skipped frames are only ``grab``bed, which advances the demuxer without
+    decoding the image. Not thread-safe; callers read one batch at a time,
+    possibly from different threads.
+    """
+
+    def __init__(self, path: str, stride: int = 1, max_frames: Optional[int] = None):
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise ValueError("Could not open video file")
+        self.stride = max(1, stride)
+        self.max_frames = max_frames
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 0.0
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.position = 0
+        self.frames_read = 0
+        self.finished = False
+
+    def info(self) -> dict:
+        return {
+            "fps": round(self.fps, 3),
+            "frame_count": self.frame_count,
+            "width": self.width,
+            "height": self.height,
+            "stride": self.stride,
+        }
+
+    def _next(self) -> Optional[Frame]:
+        while (self.position % self.stride) != 0:
+            if not self.capture.grab():
+                return None
+            self.position += 1
+        ok, frame = self.capture.read()
+        if not ok:
+            return None
+        index = self.position
+        self.position += 1
+        timestamp = index * 1000 / self.fps if self.fps else self.capture.get(cv2.CAP_PROP_POS_MSEC)
+        return index, timestamp, frame
+
+    def read_batch(self, batch_size: int) -> List[Frame]:
+        """Up to ``batch_size`` sampled frames; an empty list once the video ends"""
+        frames = []
+        while not self.finished and len(frames) < batch_size:
+            if self.max_frames is not None and self.frames_read >= self.max_frames:
+                self.finished = True
+                break
+            frame = self._next()
+            if frame is None:
+                self.finished = True
+                break
+            frames.append(frame)
+            self.frames_read += 1
+        return frames
+
+    def close(self) -> None:
+        self.capture.release()
+
+
+class AnnotatedVideoWriter:
+    """Writes annotated frames to an MP4 file as they come back from detection"""
+
+    def __init__(self, path: str, fps: float, width: int, height: int):
+        self.path = path
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps or 25.0, (width, height))
+        if not self.writer.isOpened():
+            raise ValueError("Could not open video writer")
+        self.size = (width, height)
+        self.frames_written = 0
+
+    def write(self, frame: np.ndarray) -> None:
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size)
+        self.writer.write(frame)
+        self.frames_written += 1
+
+    def close(self) -> None:
+        self.writer.release()
+        logging.info(f"Wrote {self.frames_written} annotated frames to {self.path}")
@@ -0,0 +1,193 @@
+"""Multi-process inference workers fed through shared memory"""
+import logging
+import multiprocessing as mp
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from session_config import SessionConfig
+
+
+def _worker_main(model_path: str, session_config: SessionConfig, max_batch_size: int,
+                 input_shape: Tuple[int, ...], input_shm_name: str, conn) -> None:
+    """Worker process loop: read tensors from shared memory, run, write outputs back"""
+    from inference import run_batch
+    from session_config import create_session
+
+    input_shm = output_shm = None
+    try:
+        session = create_session(model_path, session_config)
+
+        input_shm = shared_memory.SharedMemory(name=input_shm_name)
+        inputs = np.ndarray((max_batch_size,) + input_shape, np.float32, buffer=input_shm.buf)
+
+        # Probe once so the parent can size the output buffer
+        inputs[:1] = 0
+        probe = run_batch(session, inputs[:1])
+        conn.send(("ready", probe.shape[1:]))
+
+        output_shm = shared_memory.SharedMemory(name=conn.recv())
+        outputs = np.ndarray((max_batch_size,) + probe.shape[1:], np.float32, buffer=output_shm.buf)
+
+        while True:
+            count = conn.recv()
+            if count is None:
+                break
+            try:
+                outputs[:count] = run_batch(session, inputs[:count])
+                conn.send(("ok", count))
+            except Exception as e:
+                conn.send(("error", str(e)))
+    except Exception as e:
+        conn.send(("error", str(e)))
+    finally:
+        for shm in (input_shm, output_shm):
+            if shm is not None:
+                shm.close()
+
+
+class _Worker:
+    """Parent-side handle on one worker process and its shared buffers"""
+
+    def __init__(self, index: int, process, conn, input_shm: shared_memory.SharedMemory):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.input_shm = input_shm
+        self.output_shm: Optional[shared_memory.SharedMemory] = None
+        self.inputs: Optional[np.ndarray] = None
+        self.outputs: Optional[np.ndarray] = None
+        self.batches_run = 0
+        self.items_processed = 0
+
+
+class InferenceWorkerPool:
+    """Pool of processes that each own an InferenceSession.
+
+    ``run`` is a blocking call meant for executor threads: it claims an idle
+    worker, copies the NCHW tensor into that worker's shared input buffer,
+    signals it over a pipe and copies the result out of the shared output
+    buffer. Only batch sizes cross the pipe; tensors are never pickled.
+    """
+
+    def __init__(self, model_path: str, num_workers: int, session_config: Optional[SessionConfig] = None,
+                 intra_op_threads: Optional[int] = None, max_batch_size: int = 16,
+                 input_shape: Tuple[int, ...] = (3, 640, 640)):
+        self.model_path = str(model_path)
+        self.num_workers = max(1, num_workers)
+        # Each worker is one concurrent session, so the core budget is split across them
+        self.session_config = (session_config or SessionConfig()).for_concurrency(self.num_workers, intra_op_threads)
+        self.intra_op_threads = self.session_config.resolved_intra_op_threads
+        self.max_batch_size = max(1, max_batch_size)
+        self.input_shape = tuple(input_shape)
+
+        self._workers: List[_Worker] = []
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self.dispatch_executor = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="infer-dispatch")
+
+    def start(self) -> None:
+        """Spawn the workers and wait until each has loaded the model"""
+        context = mp.get_context("spawn")
+        input_bytes = self.max_batch_size * int(np.prod(self.input_shape)) * 4
+
+        for index in range(self.num_workers):
+            input_shm = shared_memory.SharedMemory(create=True, size=input_bytes)
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(self.model_path, self.session_config, self.max_batch_size,
+                      self.input_shape, input_shm.name, child_conn),
+                name=f"inference-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self._workers.append(_Worker(index, process, parent_conn, input_shm))
+
+        try:
+            for worker in self._workers:
+                status, payload = worker.conn.recv()
+                if status != "ready":
+                    raise RuntimeError(f"Inference worker {worker.index} failed to start: {payload}")
+
+                output_shape = tuple(payload)
+                output_bytes = self.max_batch_size * int(np.prod(output_shape)) * 4
+                worker.output_shm = shared_memory.SharedMemory(create=True, size=output_bytes)
+                worker.inputs = np.ndarray((self.max_batch_size,) + self.input_shape, np.float32,
+                                           buffer=worker.input_shm.buf)
+                worker.outputs = np.ndarray((self.max_batch_size,) + output_shape, np.float32,
+                                            buffer=worker.output_shm.buf)
+                worker.conn.send(worker.output_shm.name)
+                self._idle.put(worker)
+        except Exception:
+            self.close()
+            raise
+
+        logging.info(f"Started {self.num_workers} inference workers "
+                     f"({self.intra_op_threads} intra-op threads each)")
+
+    def run(self, tensor: np.ndarray) -> np.ndarray:
+        """Run an (N, C, H, W) tensor on the next idle worker"""
+        results = []
+        for start in range(0, tensor.shape[0], self.max_batch_size):
+            results.append(self._run_chunk(tensor[start:start + self.max_batch_size]))
+        return results[0] if len(results) == 1 else np.concatenate(results, axis=0)
+
+    def _run_chunk(self, chunk: np.ndarray) -> np.ndarray:
+        count = chunk.shape[0]
+        worker = self._idle.get()
+        try:
+            worker.inputs[:count] = chunk
+            worker.conn.send(count)
+            status, payload = worker.conn.recv()
+            if status != "ok":
+                raise RuntimeError(f"Inference worker {worker.index} failed: {payload}")
+            worker.batches_run += 1
+            worker.items_processed += count
+            return worker.outputs[:count].copy()
+        finally:
+            self._idle.put(worker)
+
+    def close(self) -> None:
+        """Stop the workers and release the shared buffers"""
+        with self._lock:
+            for worker in self._workers:
+                try:
+                    worker.conn.send(None)
+                except (OSError, ValueError):
+                    pass
+            for worker in self._workers:
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+                # Drop our views before releasing the buffers they point into
+                worker.inputs = worker.outputs = None
+                for shm in (worker.input_shm, worker.output_shm):
+                    if shm is not None:
+                        shm.close()
+                        shm.unlink()
+            self._workers = []
+            self.dispatch_executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        """Per-worker batch counters"""
+        return {
+            "num_workers": self.num_workers,
+            "intra_op_threads": self.intra_op_threads,
+            "max_batch_size": self.max_batch_size,
+            "idle_workers": self._idle.qsize(),
+            "workers": [
+                {
+                    "index": worker.index,
+                    "pid": worker.process.pid,
+                    "alive": worker.process.is_alive(),
+                    "batches_run": worker.batches_run,
+                    "items_processed": worker.items_processed,
+                }
+                for worker in self._workers
+            ],
+        }
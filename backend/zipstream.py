@@ -0,0 +1,50 @@
+"""Incremental ZIP archive writer for streaming responses"""
+import time
+import zipfile
+from typing import Iterable, List, Tuple
+
+
+class ZipStreamWriter:
+    """Build a ZIP archive entry by entry, handing back the bytes as they are produced.
+
+    ``zipfile`` falls back to data descriptors when the target cannot seek,
+    so each ``add`` call returns a complete local file entry that can be
+    sent to the client right away. ``close`` returns the central directory.
+    Only the entry currently being written is ever held in memory.
+    """
+
+    def __init__(self, compression: int = zipfile.ZIP_STORED, compresslevel: int = 6):
+        self.compression = compression
+        self.compresslevel = compresslevel
+        self._chunks: List[bytes] = []
+        self._zip = zipfile.ZipFile(self, mode="w", compression=compression, compresslevel=compresslevel)
+
+    # File-like sink used by ZipFile; it has no tell/seek so entries are streamable
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def _drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+    def add(self, name: str, data: bytes) -> bytes:
+        """Append one file to the archive and return its encoded entry"""
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = self.compression
+        info.external_attr = 0o644 << 16
+        self._zip.writestr(info, data, compresslevel=self.compresslevel)
+        return self._drain()
+
+    def add_many(self, entries: Iterable[Tuple[str, bytes]]) -> bytes:
+        """Append several files and return their encoded entries together"""
+        return b"".join(self.add(name, data) for name, data in entries)
+
+    def close(self) -> bytes:
+        """Finish the archive and return the central directory"""
+        self._zip.close()
+        return self._drain()
@@ -12,12 +12,21 @@ import zipfile
 from PIL import Image
 import numpy as np
 import os
+import struct
 import sys
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from websockets.sync.client import connect as websocket_connect
+from websockets.exceptions import InvalidStatus
 
 # Backend URL from environment
-BACKEND_URL = "https://6da050f6-3d11-4aa4-bde4-be3bb3dd5724.preview.emergentagent.com"
+BACKEND_URL = os.environ.get("BACKEND_URL", "https://6da050f6-3d11-4aa4-bde4-be3bb3dd5724.preview.emergentagent.com")
 API_BASE = f"{BACKEND_URL}/api"
+# Needed for the model reload tests; they are skipped when it is not set
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+WS_BASE = API_BASE.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
 
 class KnifeDetectionAPITester:
     def __init__(self):
@@ -70,6 +79,14 @@ class KnifeDetectionAPITester:
         
         return img_buffer.getvalue()
     
+    def create_oversized_header_image(self, width=20000, height=20000):
+        """Create a tiny PNG whose header declares huge dimensions"""
+        def chunk(kind, data):
+            return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+        
+        header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+        return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(b'')) + chunk(b'IEND', b'')
+    
     def test_health_endpoints(self):
         """Test health check endpoints"""
         print("\n=== Testing Health Endpoints ===")
@@ -171,7 +188,53 @@ class KnifeDetectionAPITester:
             )
         except Exception as e:
             self.log_test("Single Detection - Invalid File Type", False, f"Exception: {str(e)}")
-        
+
+        # Test custom NMS thresholds
+        try:
+            test_image = self.create_test_image(format='PNG')
+            files = {'file': ('test.png', test_image, 'image/png')}
+            params = {'conf_threshold': 0.5, 'iou_threshold': 0.3, 'class_agnostic': 'true', 'max_detections': 5}
+            response = self.session.post(f"{API_BASE}/detect/single", files=files, params=params)
+
+            invalid = self.session.post(
+                f"{API_BASE}/detect/single",
+                files={'file': ('test.png', test_image, 'image/png')},
+                params={'conf_threshold': 1.5}
+            )
+
+            success = response.status_code == 200 and invalid.status_code == 422
+            self.log_test(
+                "Single Detection - NMS Parameters",
+                success,
+                f"Status: {response.status_code}, Invalid threshold status: {invalid.status_code} (expected 422)"
+            )
+        except Exception as e:
+            self.log_test("Single Detection - NMS Parameters", False, f"Exception: {str(e)}")
+
+        # Test detections-only mode
+        try:
+            test_image = self.create_test_image(width=800, height=600, format='PNG')
+            files = {'file': ('test.png', test_image, 'image/png')}
+            response = self.session.post(f"{API_BASE}/detect/single", files=files, params={'detections_only': 'true'})
+
+            if response.status_code == 200:
+                data = response.json()
+                success = (
+                    data.get("width") == 800 and
+                    data.get("height") == 600 and
+                    isinstance(data.get("detections"), list) and
+                    "center" not in data
+                )
+                self.log_test(
+                    "Single Detection - Detections Only",
+                    success,
+                    f"Status: {response.status_code}, Detections: {len(data.get('detections', []))}"
+                )
+            else:
+                self.log_test("Single Detection - Detections Only", False, f"Status: {response.status_code}")
+        except Exception as e:
+            self.log_test("Single Detection - Detections Only", False, f"Exception: {str(e)}")
+
         # Test oversized file
         try:
             large_image = self.create_large_image(12)  # 12MB image
@@ -187,6 +250,21 @@ class KnifeDetectionAPITester:
             )
         except Exception as e:
             self.log_test("Single Detection - Oversized File", False, f"Exception: {str(e)}")
+        
+        # Test small file declaring huge dimensions
+        try:
+            files = {'file': ('huge.png', self.create_oversized_header_image(), 'image/png')}
+            
+            response = self.session.post(f"{API_BASE}/detect/single", files=files)
+            
+            success = response.status_code == 413
+            self.log_test(
+                "Single Detection - Oversized Dimensions",
+                success,
+                f"Status: {response.status_code} (expected 413)"
+            )
+        except Exception as e:
+            self.log_test("Single Detection - Oversized Dimensions", False, f"Exception: {str(e)}")
     
     def test_batch_image_detection(self):
         """Test batch image detection endpoint"""
@@ -298,6 +376,39 @@ class KnifeDetectionAPITester:
         except Exception as e:
             self.log_test("ZIP Download - Valid Request", False, f"Exception: {str(e)}")
         
+        # Test streamed ZIP with deflate compression and a file that fails
+        try:
+            files = [
+                ('files', ('test1.png', self.create_test_image(format='PNG'), 'image/png')),
+                ('files', ('test2.txt', b'Not an image', 'text/plain')),
+                ('files', ('test3.png', self.create_test_image(format='PNG'), 'image/png'))
+            ]
+            params = {'compression': 'deflate', 'image_format': 'jpeg'}
+            response = self.session.post(f"{API_BASE}/detect/batch/download", files=files, params=params, stream=True)
+            
+            if response.status_code == 200:
+                # The archive is sent as it is built, so it has no Content-Length
+                chunked = 'content-length' not in response.headers
+                content = b"".join(response.iter_content(chunk_size=65536))
+                with zipfile.ZipFile(io.BytesIO(content), 'r') as zip_file:
+                    names = set(zip_file.namelist())
+                    expected = {'original_001.jpg', 'detected_001.jpg', 'original_003.jpg', 'detected_003.jpg', 'errors.txt'}
+                    valid = (
+                        names == expected and
+                        zip_file.testzip() is None and
+                        zip_file.getinfo('detected_001.jpg').compress_type == zipfile.ZIP_DEFLATED and
+                        'test2.txt' in zip_file.read('errors.txt').decode('utf-8')
+                    )
+                self.log_test(
+                    "ZIP Download - Streamed With Errors",
+                    chunked and valid,
+                    f"Status: {response.status_code}, Streamed: {chunked}, Entries: {sorted(names)}"
+                )
+            else:
+                self.log_test("ZIP Download - Streamed With Errors", False, f"Status: {response.status_code}")
+        except Exception as e:
+            self.log_test("ZIP Download - Streamed With Errors", False, f"Exception: {str(e)}")
+        
         # Test empty ZIP request
         try:
             response = self.session.post(f"{API_BASE}/detect/batch/download", files=[])
@@ -311,6 +422,477 @@ class KnifeDetectionAPITester:
         except Exception as e:
             self.log_test("ZIP Download - Empty Request", False, f"Exception: {str(e)}")
     
+    def test_streaming_detection(self):
+        """Test NDJSON/SSE streaming batch endpoint"""
+        print("\n=== Testing Streaming Detection ===")
+        
+        files = [
+            ('files', ('test1.png', self.create_test_image(format='PNG'), 'image/png')),
+            ('files', ('test2.txt', b'Not an image', 'text/plain')),
+            ('files', ('test3.jpg', self.create_test_image(format='JPEG'), 'image/jpeg'))
+        ]
+        
+        # Test NDJSON: one event per file in completion order, then a summary line
+        try:
+            response = self.session.post(f"{API_BASE}/detect/batch/stream", files=files, params={'format': 'ndjson'}, stream=True)
+            
+            if response.status_code == 200:
+                events = [json.loads(line) for line in response.iter_lines() if line]
+                items, done = events[:-1], events[-1]
+                success = (
+                    'application/x-ndjson' in response.headers.get('content-type', '') and
+                    sorted(event.get("index") for event in items) == [0, 1, 2] and
+                    sum("result" in event for event in items) == 2 and
+                    sum("error" in event for event in items) == 1 and
+                    done.get("done") is True and
+                    done.get("total_processed") == 2
+                )
+                self.log_test(
+                    "Streaming Detection - NDJSON",
+                    success,
+                    f"Status: {response.status_code}, Events: {len(events)}, Summary: {done}"
+                )
+            else:
+                self.log_test("Streaming Detection - NDJSON", False, f"Status: {response.status_code}")
+        except Exception as e:
+            self.log_test("Streaming Detection - NDJSON", False, f"Exception: {str(e)}")
+        
+        # Test SSE framing with detections-only results
+        try:
+            response = self.session.post(
+                f"{API_BASE}/detect/batch/stream",
+                files=files,
+                params={'format': 'sse', 'detections_only': 'true'},
+                stream=True
+            )
+            
+            if response.status_code == 200:
+                events = []
+                for block in response.text.strip().split("\n\n"):
+                    fields = dict(line.split(": ", 1) for line in block.splitlines())
+                    events.append((fields.get("event"), json.loads(fields.get("data", "null"))))
+                success = (
+                    'text/event-stream' in response.headers.get('content-type', '') and
+                    [name for name, _ in events].count("result") == 3 and
+                    events[-1][0] == "done" and
+                    all("center" not in data.get("result", {}) for _, data in events[:-1])
+                )
+                self.log_test(
+                    "Streaming Detection - SSE",
+                    success,
+                    f"Status: {response.status_code}, Events: {[name for name, _ in events]}"
+                )
+            else:
+                self.log_test("Streaming Detection - SSE", False, f"Status: {response.status_code}")
+        except Exception as e:
+            self.log_test("Streaming Detection - SSE", False, f"Exception: {str(e)}")
+    
+    def test_websocket_detection(self):
+        """Test WebSocket real-time detection channel"""
+        print("\n=== Testing WebSocket Detection ===")
+        
+        # Test binary frames in, detection JSON out
+        try:
+            with websocket_connect(f"{WS_BASE}/detect/ws", open_timeout=10) as websocket:
+                replies = []
+                for _ in range(2):
+                    websocket.send(self.create_test_image(width=640, height=480, format='JPEG'))
+                    replies.append(json.loads(websocket.recv(timeout=30)))
+                
+                success = (
+                    [reply.get("seq") for reply in replies] == [1, 2] and
+                    all(reply.get("width") == 640 and reply.get("height") == 480 for reply in replies) and
+                    all(isinstance(reply.get("detections"), list) for reply in replies) and
+                    all("latency_ms" in reply and "dropped" in reply for reply in replies)
+                )
+                self.log_test(
+                    "WebSocket Detection - Binary Frames",
+                    success,
+                    f"Replies: {[{k: v for k, v in reply.items() if k != 'detections'} for reply in replies]}"
+                )
+                
+                # Text frames are answered with an error and the connection stays open
+                websocket.send("not a frame")
+                reply = json.loads(websocket.recv(timeout=30))
+                websocket.send(self.create_test_image(format='PNG'))
+                after = json.loads(websocket.recv(timeout=30))
+                self.log_test(
+                    "WebSocket Detection - Text Frame Rejected",
+                    reply.get("seq") == 3 and "error" in reply and after.get("seq") == 4 and "detections" in after,
+                    f"Reply: {reply}, Next frame seq: {after.get('seq')}"
+                )
+        except Exception as e:
+            self.log_test("WebSocket Detection - Binary Frames", False, f"Exception: {str(e)}")
+        
+        # Test unknown model: the connection is closed before it is accepted, which rejects the handshake
+        try:
+            with websocket_connect(f"{WS_BASE}/detect/ws?model=does-not-exist", open_timeout=10):
+                pass
+            self.log_test("WebSocket Detection - Unknown Model", False, "Connection was accepted")
+        except InvalidStatus as e:
+            status = e.response.status_code
+            self.log_test("WebSocket Detection - Unknown Model", status == 403, f"Handshake status: {status} (expected 403)")
+        except Exception as e:
+            self.log_test("WebSocket Detection - Unknown Model", False, f"Exception: {str(e)}")
+    
+    def test_batch_jobs(self):
+        """Test async job queue endpoints"""
+        print("\n=== Testing Batch Jobs ===")
+        
+        job_id = None
+        
+        # Test job submission
+        try:
+            files = [('files', (f'test_{i}.png', self.create_test_image(format='PNG'), 'image/png')) for i in range(3)]
+            files.append(('files', ('notes.txt', b'Not an image', 'text/plain')))
+            response = self.session.post(f"{API_BASE}/jobs", files=files, params={'priority': 3, 'encoding': 'url'})
+            
+            if response.status_code == 202:
+                data = response.json()
+                job_id = data.get("job_id")
+                success = (
+                    data.get("total") == 4 and
+                    data.get("priority") == 3 and
+                    data.get("status") in ("queued", "running", "completed") and
+                    data.get("status_url") == f"/api/jobs/{job_id}"
+                )
+                self.log_test("Batch Jobs - Submit", success, f"Status: {response.status_code}, Job: {data}")
+            else:
+                self.log_test("Batch Jobs - Submit", False, f"Status: {response.status_code}, Response: {response.text}")
+        except Exception as e:
+            self.log_test("Batch Jobs - Submit", False, f"Exception: {str(e)}")
+        
+        if job_id is None:
+            return
+        
+        # Test progress events until the job finishes
+        try:
+            response = self.session.get(f"{API_BASE}/jobs/{job_id}/events", params={'format': 'ndjson'}, stream=True, timeout=120)
+            events = [json.loads(line) for line in response.iter_lines() if line]
+            final = events[-1] if events else {}
+            success = (
+                response.status_code == 200 and
+                final.get("status") == "completed" and
+                final.get("processed") == 4 and
+                final.get("failed") == 1 and
+                final.get("progress") == 1.0
+            )
+            self.log_test("Batch Jobs - Progress Events", success, f"Status: {response.status_code}, Events: {len(events)}, Final: {final}")
+        except Exception as e:
+            self.log_test("Batch Jobs - Progress Events", False, f"Exception: {str(e)}")
+        
+        # Test paged results, with images published as URLs
+        try:
+            response = self.session.get(f"{API_BASE}/jobs/{job_id}/results", params={'offset': 0, 'limit': 10})
+            
+            if response.status_code == 200:
+                items = response.json().get("results", [])
+                done = [item for item in items if "result" in item]
+                image_url = done[0]["result"]["center"] if done else ""
+                image = self.session.get(f"{BACKEND_URL}{image_url}") if image_url.startswith("/api/images/") else None
+                success = (
+                    [item.get("index") for item in items] == [0, 1, 2, 3] and
+                    len(done) == 3 and
+                    items[3].get("error") is not None and
+                    image is not None and image.status_code == 200
+                )
+                self.log_test("Batch Jobs - Results", success, f"Status: {response.status_code}, Items: {len(items)}, Image URL: {image_url}")
+            else:
+                self.log_test("Batch Jobs - Results", False, f"Status: {response.status_code}")
+        except Exception as e:
+            self.log_test("Batch Jobs - Results", False, f"Exception: {str(e)}")
+        
+        # Test ZIP download of the finished job
+        try:
+            response = self.session.get(f"{API_BASE}/jobs/{job_id}/download")
+            
+            if response.status_code == 200:
+                with zipfile.ZipFile(io.BytesIO(response.content), 'r') as zip_file:
+                    names = zip_file.namelist()
+                    detections = json.loads(zip_file.read('detections.json'))
+                success = (
+                    sum(name.startswith('detected_') for name in names) == 3 and
+                    'errors.txt' in names and
+                    len(detections) == 3
+                )
+                self.log_test("Batch Jobs - Download", success, f"Status: {response.status_code}, Entries: {names}")
+            else:
+                self.log_test("Batch Jobs - Download", False, f"Status: {response.status_code}")
+        except Exception as e:
+            self.log_test("Batch Jobs - Download", False, f"Exception: {str(e)}")
+        
+        # Test deleting the job, and unknown job ids
+        try:
+            deleted = self.session.delete(f"{API_BASE}/jobs/{job_id}")
+            gone = self.session.get(f"{API_BASE}/jobs/{job_id}")
+            unknown = self.session.get(f"{API_BASE}/jobs/not-a-job")
+            success = (
+                deleted.status_code == 200 and deleted.json().get("status") == "deleted" and
+                gone.status_code == 404 and
+                unknown.status_code == 404
+            )
+            self.log_test(
+                "Batch Jobs - Delete",
+                success,
+                f"Delete: {deleted.status_code}, After delete: {gone.status_code}, Unknown: {unknown.status_code} (expected 404)"
+            )
+        except Exception as e:
+            self.log_test("Batch Jobs - Delete", False, f"Exception: {str(e)}")
+    
+    def scrape_metrics(self):
+        """Fetch /api/metrics and parse its samples into {name{labels}: value}"""
+        response = self.session.get(f"{API_BASE}/metrics")
+        samples = {}
+        for line in response.text.splitlines():
+            if line and not line.startswith('#'):
+                name, _, value = line.rpartition(' ')
+                samples[name] = float(value)
+        return response, samples
+    
+    def test_metrics_endpoint(self):
+        """Test Prometheus metrics endpoint"""
+        print("\n=== Testing Metrics Endpoint ===")
+        
+        request_sample = 'knife_http_requests_total{method="POST",route="/api/detect/single",status="200"}'
+        decode_sample = 'knife_stage_seconds_count{stage="decode"}'
+        
+        # Test exposition format and that a detection moves the counters
+        try:
+            response, before = self.scrape_metrics()
+            content_type = response.headers.get('content-type', '')
+            
+            files = {'file': ('test.png', self.create_test_image(format='PNG'), 'image/png')}
+            detection = self.session.post(f"{API_BASE}/detect/single", files=files)
+            
+            _, after = self.scrape_metrics()
+            expected = [
+                'knife_stage_seconds_bucket{stage="decode",le="+Inf"}',
+                'knife_http_requests_in_flight',
+                'knife_admission_queued_images',
+            ]
+            success = (
+                response.status_code == 200 and
+                content_type.startswith('text/plain') and
+                detection.status_code == 200 and
+                after.get(request_sample, 0) == before.get(request_sample, 0) + 1 and
+                after.get(decode_sample, 0) > before.get(decode_sample, 0) and
+                all(name in after for name in expected)
+            )
+            self.log_test(
+                "Metrics - Prometheus Exposition",
+                success,
+                f"Status: {response.status_code}, Content-Type: {content_type}, "
+                f"Single detections: {before.get(request_sample, 0)} -> {after.get(request_sample, 0)}"
+            )
+        except Exception as e:
+            self.log_test("Metrics - Prometheus Exposition", False, f"Exception: {str(e)}")
+    
+    def test_model_registry(self):
+        """Test model listing and hot-swap reloads"""
+        print("\n=== Testing Model Registry ===")
+        
+        models = []
+        
+        # Test model listing
+        try:
+            response = self.session.get(f"{API_BASE}/models")
+            
+            if response.status_code == 200:
+                data = response.json()
+                models = data.get("models", [])
+                success = any(model.get("name") == data.get("default") for model in models)
+                self.log_test(
+                    "Model Registry - List Models",
+                    success,
+                    f"Status: {response.status_code}, Default: {data.get('default')}, Loaded: {[(m.get('name'), m.get('variant')) for m in models]}"
+                )
+            else:
+                self.log_test("Model Registry - List Models", False, f"Status: {response.status_code}")
+        except Exception as e:
+            self.log_test("Model Registry - List Models", False, f"Exception: {str(e)}")
+        
+        # Test reload without a valid admin token
+        try:
+            response = self.session.post(f"{API_BASE}/models/default/reload", headers={'X-Admin-Token': 'wrong-token'})
+            self.log_test(
+                "Model Registry - Reload Requires Token",
+                response.status_code == 403,
+                f"Status: {response.status_code} (expected 403)"
+            )
+        except Exception as e:
+            self.log_test("Model Registry - Reload Requires Token", False, f"Exception: {str(e)}")
+        
+        if not ADMIN_TOKEN or not models:
+            self.log_test("Model Registry - Hot Swap", True, "Skipped: set ADMIN_TOKEN to test reloads")
+            return
+        
+        headers = {'X-Admin-Token': ADMIN_TOKEN}
+        
+        # Test hot swap: detections keep succeeding while the default model is reloaded
+        try:
+            name = models[0]["name"]
+            before = {(m["name"], m["variant"]): m["loaded_at"] for m in models}
+            stop = threading.Event()
+            
+            def detect_until_stopped():
+                statuses = []
+                while not stop.is_set() or not statuses:
+                    files = {'file': ('test.png', self.create_test_image(format='PNG'), 'image/png')}
+                    statuses.append(requests.post(f"{API_BASE}/detect/single", files=files, params={'model': name}).status_code)
+                return statuses
+            
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                clients = [pool.submit(detect_until_stopped) for _ in range(2)]
+                response = self.session.post(f"{API_BASE}/models/{name}/reload", headers=headers, timeout=120)
+                stop.set()
+                statuses = [status for client in clients for status in client.result()]
+            
+            if response.status_code == 200:
+                loaded = response.json().get("loaded", [])
+                swapped = all(m["loaded_at"] > before.get((m["name"], m["variant"]), 0) for m in loaded)
+                success = bool(loaded) and swapped and all(status == 200 for status in statuses)
+                self.log_test(
+                    "Model Registry - Hot Swap",
+                    success,
+                    f"Status: {response.status_code}, Reloaded: {[(m['name'], m['variant']) for m in loaded]}, "
+                    f"Concurrent detections: {len(statuses)}, Failed: {sum(status != 200 for status in statuses)}"
+                )
+            else:
+                self.log_test("Model Registry - Hot Swap", False, f"Status: {response.status_code}, Response: {response.text}")
+        except Exception as e:
+            self.log_test("Model Registry - Hot Swap", False, f"Exception: {str(e)}")
+        
+        # Test unknown models and paths outside MODELS_DIR
+        try:
+            unknown = self.session.post(f"{API_BASE}/models/not-loaded/reload", headers=headers)
+            outside = self.session.post(
+                f"{API_BASE}/models/escape/reload",
+                headers=headers,
+                params={'path': '../../etc/passwd'}
+            )
+            success = unknown.status_code == 404 and outside.status_code == 400
+            self.log_test(
+                "Model Registry - Invalid Reloads",
+                success,
+                f"Unknown model: {unknown.status_code} (expected 404), Outside path: {outside.status_code} (expected 400)"
+            )
+        except Exception as e:
+            self.log_test("Model Registry - Invalid Reloads", False, f"Exception: {str(e)}")
+    
+    def test_cascade_screening(self):
+        """Test two-stage cascade screening"""
+        print("\n=== Testing Cascade Screening ===")
+        
+        try:
+            models = self.session.get(f"{API_BASE}/models").json().get("models", [])
+            if not any(model.get("screening") for model in models):
+                self.log_test("Cascade Screening", True, "Skipped: no loaded model can screen (set CASCADE_ENABLED)")
+                return
+            
+            def screen(threshold, count=4):
+                """Run a batch through the cascade and return how its counters moved"""
+                before = self.session.get(f"{API_BASE}/stats").json()["cascade"]
+                files = [('files', (f'test_{i}.png', self.create_test_image(format='PNG'), 'image/png')) for i in range(count)]
+                params = {'cascade': 'true', 'cascade_threshold': threshold, 'detections_only': 'true'}
+                response = self.session.post(f"{API_BASE}/detect/batch", files=files, params=params)
+                after = self.session.get(f"{API_BASE}/stats").json()["cascade"]
+                delta = {key: after[key] - before[key] for key in ("screened", "passed", "rejected")}
+                return response, delta
+            
+            # A threshold of 1.0 rejects every image at the screening stage
+            response, delta = screen(1.0)
+            self.log_test(
+                "Cascade Screening - Rejects Below Threshold",
+                response.status_code == 200 and delta["screened"] >= 4 and delta["rejected"] >= 4,
+                f"Status: {response.status_code}, Counters moved by: {delta}"
+            )
+            
+            # A threshold of 0.0 passes every image on to the full detector
+            response, delta = screen(0.0)
+            self.log_test(
+                "Cascade Screening - Passes Above Threshold",
+                response.status_code == 200 and delta["screened"] >= 4 and delta["passed"] >= 4,
+                f"Status: {response.status_code}, Counters moved by: {delta}"
+            )
+        except Exception as e:
+            self.log_test("Cascade Screening", False, f"Exception: {str(e)}")
+    
+    def test_admission_control(self):
+        """Test load shedding: 503 with Retry-After once the admission queue is full"""
+        print("\n=== Testing Admission Control ===")
+        
+        try:
+            stats = self.session.get(f"{API_BASE}/stats").json()
+            admission = stats["admission"]
+            if admission.get("rate_limit") is not None:
+                self.log_test("Admission Control - Load Shedding", True, "Skipped: rate limiting would throttle the burst first")
+                return
+            
+            # Enough concurrent 100-image batches to overflow the in-flight budget plus the queue;
+            # each batch is admitted as one inference chunk, not all of its images
+            chunk = min(100, stats["input_buffers"]["batch_size"])
+            capacity = admission["max_images"] + admission["max_queued_images"]
+            count = capacity // chunk + 3
+            image = self.create_test_image(width=160, height=120, format='PNG')
+            files = [('files', (f'test_{i}.png', image, 'image/png')) for i in range(100)]
+            
+            def submit(_):
+                return requests.post(f"{API_BASE}/detect/batch", files=files, params={'detections_only': 'true'}, timeout=300)
+            
+            with ThreadPoolExecutor(max_workers=count) as pool:
+                responses = list(pool.map(submit, range(count)))
+            
+            statuses = [response.status_code for response in responses]
+            shed = [response for response in responses if response.status_code == 503]
+            retry_after = [response.headers.get('retry-after') for response in shed]
+            success = (
+                bool(shed) and
+                200 in statuses and
+                set(statuses) <= {200, 503} and
+                all(value is not None and value.isdigit() and int(value) >= 1 for value in retry_after)
+            )
+            self.log_test(
+                "Admission Control - Load Shedding",
+                success,
+                f"Statuses: {statuses}, Retry-After: {retry_after}"
+            )
+        except Exception as e:
+            self.log_test("Admission Control - Load Shedding", False, f"Exception: {str(e)}")
+    
+    def test_rate_limiting(self):
+        """Test per-client rate limiting: 429 with Retry-After once the bucket is empty"""
+        print("\n=== Testing Rate Limiting ===")
+        
+        try:
+            rate_limit = self.session.get(f"{API_BASE}/stats").json()["admission"].get("rate_limit")
+            if rate_limit is None:
+                self.log_test("Rate Limiting - Burst Exhausted", True, "Skipped: rate limiting is disabled (set RATE_LIMIT_PER_SEC)")
+                return
+            
+            # Each request costs one token per image, so a few full batches drain any bucket
+            image = self.create_test_image(width=64, height=64, format='PNG')
+            files = [('files', (f'test_{i}.png', image, 'image/png')) for i in range(min(100, int(rate_limit["burst"])))]
+            responses = []
+            for _ in range(int(rate_limit["burst"]) // len(files) + 2):
+                responses.append(self.session.post(f"{API_BASE}/detect/batch", files=files, params={'detections_only': 'true'}))
+                if responses[-1].status_code == 429:
+                    break
+            
+            limited = responses[-1]
+            retry_after = limited.headers.get('retry-after')
+            success = (
+                limited.status_code == 429 and
+                retry_after is not None and retry_after.isdigit() and int(retry_after) >= 1 and
+                all(response.status_code == 200 for response in responses[:-1])
+            )
+            self.log_test(
+                "Rate Limiting - Burst Exhausted",
+                success,
+                f"Statuses: {[response.status_code for response in responses]}, Retry-After: {retry_after}"
+            )
+        except Exception as e:
+            self.log_test("Rate Limiting - Burst Exhausted", False, f"Exception: {str(e)}")
+    
     def test_mock_detection_system(self):
         """Test that mock detection system is working properly"""
         print("\n=== Testing Mock Detection System ===")
@@ -359,7 +941,16 @@ class KnifeDetectionAPITester:
         self.test_single_image_detection()
         self.test_batch_image_detection()
         self.test_zip_download()
+        self.test_streaming_detection()
+        self.test_websocket_detection()
+        self.test_batch_jobs()
+        self.test_metrics_endpoint()
+        self.test_model_registry()
+        self.test_cascade_screening()
         self.test_mock_detection_system()
+        # These two exhaust the server's capacity, so they run last
+        self.test_admission_control()
+        self.test_rate_limiting()
         
         # Summary
         print("\n" + "="*60)
@@ -76,7 +76,7 @@ const KnifeDetectionApp = () => {
       
       setProgress(100);
       
-      const detectedUrl = `data:image/png;base64,${response.data.center}`;
+      const detectedUrl = `data:${response.data.media_type || 'image/png'};base64,${response.data.center}`;
       setResults(prev => ({
         ...prev,
         detected: detectedUrl,
@@ -127,28 +127,65 @@ const KnifeDetectionApp = () => {
         formData.append('files', file);
       });
       
-      setProgress(25);
       showNotification(`Processing ${imageFiles.length} images...`, 'info');
       
-      const response = await axios.post(`${API}/detect/batch`, formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data'
-        }
+      // Results are streamed back as NDJSON, one line per image as it completes
+      const response = await fetch(`${API}/detect/batch/stream`, {
+        method: 'POST',
+        body: formData
       });
       
-      setProgress(75);
+      if (!response.ok) {
+        const errorBody = await response.json().catch(() => ({}));
+        const detail = typeof errorBody.detail === 'string' ? errorBody.detail : null;
+        throw new Error(detail || 'Error processing batch. Please try again.');
+      }
+      
+      const streamed = [];
+      let completed = 0;
+      
+      const handleEvent = (event) => {
+        if (event.done) return;
+        
+        completed += 1;
+        setProgress(Math.round((completed / imageFiles.length) * 100));
+        
+        if (!event.result) return;
+        
+        streamed.push({ ...event.result, index: event.index });
+        setBatchResults([...streamed]);
+        
+        // Display first result as soon as it arrives
+        if (streamed.length === 1) {
+          setResults({
+            original: `data:${event.result.media_type || 'image/png'};base64,${event.result.left}`,
+            detected: `data:${event.result.media_type || 'image/png'};base64,${event.result.center}`,
+            downloadUrl: `data:${event.result.media_type || 'image/png'};base64,${event.result.center}`
+          });
+        }
+      };
+      
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
+      }
+      if (buffer.trim()) handleEvent(JSON.parse(buffer));
       
-      const results = response.data.results;
+      // Cycle through results in upload order
+      const results = streamed.sort((a, b) => a.index - b.index);
       setBatchResults(results);
       
-      // Display first result
-      if (results.length > 0) {
-        const firstResult = results[0];
-        setResults({
-          original: `data:image/png;base64,${firstResult.left}`,
-          detected: `data:image/png;base64,${firstResult.center}`,
-          downloadUrl: `data:image/png;base64,${firstResult.center}`
-        });
+      if (results.length === 0) {
+        throw new Error('No valid image files could be processed');
       }
       
       setProgress(100);
@@ -162,7 +199,7 @@ const KnifeDetectionApp = () => {
     } catch (error) {
       console.error('Error processing batch:', error);
       showNotification(
-        error.response?.data?.detail || 'Error processing batch. Please try again.',
+        error.message || 'Error processing batch. Please try again.',
         'error'
       );
     } finally {
@@ -177,9 +214,9 @@ const KnifeDetectionApp = () => {
       if (index < results.length) {
         const result = results[index];
         setResults({
-          original: `data:image/png;base64,${result.left}`,
-          detected: `data:image/png;base64,${result.center}`,
-          downloadUrl: `data:image/png;base64,${result.center}`
+          original: `data:${result.media_type || 'image/png'};base64,${result.left}`,
+          detected: `data:${result.media_type || 'image/png'};base64,${result.center}`,
+          downloadUrl: `data:${result.media_type || 'image/png'};base64,${result.center}`
         });
         setCurrentBatchIndex(index);
         index++;
@@ -199,8 +236,8 @@ const KnifeDetectionApp = () => {
       return;
     }
     
-    if (imageFiles.length > 50) {
-      showNotification('Too many files for ZIP download. Maximum is 50 images.', 'error');
+    if (imageFiles.length > 500) {
+      showNotification('Too many files for ZIP download. Maximum is 500 images.', 'error');
       return;
     }
 
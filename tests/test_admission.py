@@ -0,0 +1,203 @@
+import asyncio
+import time
+
+import pytest
+
+from admission import AdmissionController, Overloaded, RateLimiter
+
+
+async def hold(controller: AdmissionController, order: list, name: str, images: int, lane: str,
+               release: asyncio.Event, timeout=None) -> None:
+    async with controller.admit(images, 0, lane, timeout):
+        order.append(name)
+        await release.wait()
+
+
+async def settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_interactive_work_is_admitted_before_queued_bulk_work():
+    async def main():
+        controller = AdmissionController(max_images=2, max_bytes=10**9, max_queued_images=10)
+        order, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(hold(controller, order, "running", 2, "bulk", release))]
+        await settle()
+        tasks.append(asyncio.create_task(hold(controller, order, "bulk", 1, "bulk", release)))
+        await settle()
+        tasks.append(asyncio.create_task(hold(controller, order, "interactive", 1, "interactive", release)))
+        await settle()
+        assert order == ["running"]
+        assert controller.queued_images == 2
+
+        release.set()
+        await asyncio.gather(*tasks)
+        return order, controller
+
+    order, controller = asyncio.run(main())
+    assert order == ["running", "interactive", "bulk"]
+    assert controller.images == controller.bytes == controller.queued_images == 0
+
+
+def test_bulk_work_is_limited_to_its_share():
+    async def main():
+        controller = AdmissionController(max_images=4, max_bytes=10**9, max_queued_images=10, bulk_share=0.5)
+        order, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(hold(controller, order, "bulk-1", 2, "bulk", release))]
+        await settle()
+        tasks.append(asyncio.create_task(hold(controller, order, "bulk-2", 1, "bulk", release)))
+        tasks.append(asyncio.create_task(hold(controller, order, "interactive", 2, "interactive", release)))
+        await settle()
+        admitted = list(order)
+        release.set()
+        await asyncio.gather(*tasks)
+        return admitted
+
+    assert asyncio.run(main()) == ["bulk-1", "interactive"]
+
+
+def test_bulk_work_sized_to_a_chunk_runs_alongside_interactive_load():
+    async def main():
+        # Server defaults: 64 images, of which bulk work may hold 48
+        controller = AdmissionController(max_images=64, max_bytes=10**9, max_queued_images=256)
+        stop = asyncio.Event()
+
+        async def interactive_client():
+            while not stop.is_set():
+                async with controller.admit(1, 0, "interactive", timeout=5):
+                    await asyncio.sleep(0.005)
+
+        clients = [asyncio.create_task(interactive_client()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        try:
+            # A batch budgeted for one chunk of INFERENCE_BATCH_SIZE images is admitted at once
+            async with controller.admit(16, 0, "bulk", timeout=0.2):
+                pass
+            # One charged for all of its 60 files never fits while anything else runs
+            with pytest.raises(Overloaded) as timed_out:
+                async with controller.admit(60, 0, "bulk", timeout=0.2):
+                    pass
+        finally:
+            stop.set()
+            await asyncio.gather(*clients)
+        return timed_out.value, controller
+
+    error, controller = asyncio.run(main())
+    assert error.reason == "timeout"
+    assert controller.images == controller.queued_images == 0
+
+
+def test_byte_budget_and_oversized_work():
+    async def main():
+        controller = AdmissionController(max_images=10, max_bytes=100, max_queued_images=10)
+        # Larger than the whole budget, but admitted since nothing else runs
+        await controller.acquire(1, 500)
+        with pytest.raises(Overloaded):
+            await controller.acquire(1, 10, timeout=0.05)
+        controller.release(1, 500)
+        await controller.acquire(1, 60)
+        await controller.acquire(1, 40)
+        assert controller.bytes == 100
+
+    asyncio.run(main())
+
+
+def test_full_queue_rejects_immediately():
+    async def main():
+        controller = AdmissionController(max_images=1, max_bytes=10**9, max_queued_images=2)
+        order, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(hold(controller, order, "running", 1, "bulk", release))]
+        await settle()
+        tasks.append(asyncio.create_task(hold(controller, order, "queued", 2, "bulk", release, timeout=5)))
+        await settle()
+        with pytest.raises(Overloaded) as rejected:
+            await controller.acquire(1, 0, "interactive", timeout=5)
+        with pytest.raises(Overloaded):
+            controller.check(1)
+        # Work without a timeout has already been accepted and always queues
+        tasks.append(asyncio.create_task(hold(controller, order, "accepted", 1, "bulk", release)))
+        await settle()
+        release.set()
+        await asyncio.gather(*tasks)
+        return rejected.value, order, controller
+
+    error, order, controller = asyncio.run(main())
+    assert error.reason == "queue_full" and error.retry_after >= 1
+    assert order == ["running", "queued", "accepted"]
+    assert controller.rejected == {"queue_full": 2, "timeout": 0}
+
+
+def test_timeout_leaves_the_queue_and_lets_others_in():
+    async def main():
+        controller = AdmissionController(max_images=2, max_bytes=10**9, max_queued_images=10, bulk_share=1.0)
+        order, release = [], asyncio.Event()
+        running = asyncio.create_task(hold(controller, order, "running", 1, "bulk", release))
+        await settle()
+        # The big request waits at the head of the bulk lane and blocks the small one behind it
+        big = asyncio.create_task(hold(controller, order, "big", 2, "bulk", release, timeout=0.05))
+        await settle()
+        small = asyncio.create_task(hold(controller, order, "small", 1, "bulk", release, timeout=5))
+        with pytest.raises(Overloaded) as timed_out:
+            await big
+        await settle()
+        admitted = list(order)
+        release.set()
+        await asyncio.gather(running, small)
+        return timed_out.value, admitted, controller
+
+    error, admitted, controller = asyncio.run(main())
+    assert error.reason == "timeout"
+    assert admitted == ["running", "small"]
+    assert controller.queued_images == 0 and controller.images == 0
+
+
+def test_cancelled_waiters_give_up_their_place():
+    async def main():
+        controller = AdmissionController(max_images=1, max_bytes=10**9, max_queued_images=10)
+        order, release = [], asyncio.Event()
+        running = asyncio.create_task(hold(controller, order, "running", 1, "bulk", release))
+        await settle()
+        cancelled = asyncio.create_task(hold(controller, order, "cancelled", 1, "interactive", release))
+        waiting = asyncio.create_task(hold(controller, order, "waiting", 1, "bulk", release))
+        await settle()
+        cancelled.cancel()
+        await settle()
+        release.set()
+        await asyncio.gather(running, waiting)
+        return order, controller
+
+    order, controller = asyncio.run(main())
+    assert order == ["running", "waiting"]
+    assert controller.images == controller.queued_images == 0
+
+
+def test_rate_limiter_allows_a_burst_then_waits_for_refill():
+    limiter = RateLimiter(rate=10, burst=3)
+
+    assert [limiter.consume("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = limiter.consume("a")
+    assert 0 < wait <= 0.1
+    # Clients have separate buckets, and a cost above the burst is clamped to it
+    assert limiter.consume("b", cost=50) == 0.0
+    time.sleep(wait)
+    assert limiter.consume("a") == 0.0
+    assert (limiter.allowed, limiter.limited) == (5, 1)
+
+
+def test_rate_limiter_forgets_the_least_recent_clients():
+    limiter = RateLimiter(rate=1, burst=1, max_clients=2)
+    for client in ("a", "b", "c"):
+        limiter.consume(client)
+
+    assert limiter.stats()["clients"] == 2
+    # "a" was evicted, so it starts again from a full bucket
+    assert limiter.consume("a") == 0.0
+    assert limiter.consume("c") > 0
+
+
+def test_rate_limiter_with_zero_rate_never_limits():
+    limiter = RateLimiter(rate=0, burst=1)
+
+    assert all(limiter.consume("a", cost=5) == 0.0 for _ in range(100))
+    assert limiter.limited == 0
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from batcher import DynamicBatcher
+
+SIZE = 8
+
+
+def blob(value: float) -> np.ndarray:
+    return np.full((1, 3, SIZE, SIZE), value, np.float32)
+
+
+def mean_per_image(tensor: np.ndarray) -> np.ndarray:
+    return tensor.reshape(len(tensor), -1).mean(axis=1)
+
+
+async def submit_all(batcher: DynamicBatcher, values) -> tuple:
+    started = time.perf_counter()
+    outputs = await asyncio.wait_for(asyncio.gather(*(batcher.submit(blob(v)) for v in values)), 5)
+    return [float(output) for output in outputs], time.perf_counter() - started
+
+
+def run_batcher(values, **kwargs) -> tuple:
+    async def main():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            batcher = DynamicBatcher(mean_per_image, executor, size=SIZE, **kwargs)
+            batcher.start()
+            try:
+                outputs, elapsed = await submit_all(batcher, values)
+            finally:
+                await batcher.stop(drain=True)
+            return outputs, elapsed, batcher.stats()
+
+    return asyncio.run(main())
+
+
+def test_flushes_as_soon_as_the_batch_is_full():
+    outputs, elapsed, stats = run_batcher([1, 2, 3, 4], max_batch_size=4, max_wait_ms=10_000)
+
+    assert outputs == [1, 2, 3, 4]
+    assert elapsed < 5
+    assert stats["batch_size_histogram"] == {"4": 1}
+
+
+def test_flushes_a_partial_batch_after_max_wait():
+    outputs, elapsed, stats = run_batcher([5, 6, 7], max_batch_size=8, max_wait_ms=50)
+
+    assert outputs == [5, 6, 7]
+    assert elapsed >= 0.045
+    assert stats["batch_size_histogram"] == {"3": 1}
+
+
+def test_splits_a_burst_into_full_batches():
+    outputs, _, stats = run_batcher(range(10), max_batch_size=4, max_wait_ms=50)
+
+    assert outputs == list(range(10))
+    assert stats["batches_run"] == 3
+    assert stats["items_processed"] == 10
+
+
+def test_runner_errors_fail_every_request_in_the_batch():
+    def broken(tensor):
+        raise ValueError("model failed")
+
+    async def main():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            batcher = DynamicBatcher(broken, executor, max_batch_size=2, max_wait_ms=10_000, size=SIZE)
+            batcher.start()
+            results = await asyncio.gather(batcher.submit(blob(1)), batcher.submit(blob(2)), return_exceptions=True)
+            await batcher.stop()
+            return results
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
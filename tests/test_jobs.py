@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+from jobs import JobScheduler, JobStore, QueueFull
+
+OPTIONS = {"params": {}, "detections_only": False, "output": {}}
+
+
+def make_job(store: JobStore, job_id: str, files: int, priority: int = 0, errors=None) -> None:
+    store.create(job_id, priority, OPTIONS, [f"{i}.png" for i in range(files)], errors or {})
+
+
+def run_scheduler(store: JobStore, handler, until, **kwargs) -> JobScheduler:
+    """Run the scheduler until every job id in ``until`` reaches a terminal state"""
+    async def main():
+        scheduler = JobScheduler(store, handler, **kwargs)
+        await scheduler.start()
+        try:
+            for _ in range(500):
+                if all(store.get(job_id)["status"] in ("completed", "failed", "cancelled") for job_id in until):
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await scheduler.stop()
+        return scheduler
+
+    return asyncio.run(main())
+
+
+def test_store_round_trips_results_with_image_bytes(tmp_path):
+    store = JobStore(tmp_path)
+    make_job(store, "a" * 32, 3, errors={1: "Invalid file type"})
+
+    job = store.get("a" * 32)
+    assert (job["status"], job["total"], job["processed"], job["failed"]) == ("queued", 3, 1, 1)
+    assert job["options"] == OPTIONS
+    assert [item["idx"] for item in store.pending_items("a" * 32)] == [0, 2]
+
+    store.record_item("a" * 32, 0, {"center": b"\x89PNG\r\n", "detections": []})
+    store.record_item("a" * 32, 2, error="boom")
+    results = store.read_results("a" * 32)
+    assert results == [
+        {"index": 0, "filename": "0.png", "result": {"center": b"\x89PNG\r\n", "detections": []}},
+        {"index": 1, "filename": "1.png", "error": "Invalid file type"},
+        {"index": 2, "filename": "2.png", "error": "boom"},
+    ]
+    assert store.read_results("a" * 32, offset=1, limit=1)[0]["index"] == 1
+    assert store.get("a" * 32)["processed"] == 3
+
+
+def test_store_purges_finished_jobs_only(tmp_path):
+    store = JobStore(tmp_path)
+    make_job(store, "old", 1)
+    make_job(store, "new", 1)
+    store.set_status("old", "completed")
+
+    assert store.purge(max_age=-1) == 1
+    assert store.get("old") is None and not (tmp_path / "old").exists()
+    assert store.get("new") is not None
+
+
+def test_scheduler_runs_higher_priority_jobs_first_and_records_failures(tmp_path):
+    store = JobStore(tmp_path)
+    make_job(store, "low", 2, priority=0)
+    make_job(store, "high", 2, priority=5)
+    order = []
+
+    async def handler(job, item):
+        order.append((job["id"], item["idx"]))
+        if job["id"] == "high" and item["idx"] == 1:
+            raise ValueError("bad image")
+        return {"detections": []}
+
+    scheduler = run_scheduler(store, handler, ["low", "high"], max_concurrent_jobs=1, item_concurrency=1)
+
+    assert order == [("high", 0), ("high", 1), ("low", 0), ("low", 1)]
+    assert store.get("high")["status"] == "completed"
+    assert store.get("high")["failed"] == 1
+    assert store.read_results("high")[1]["error"] == "bad image"
+    assert (scheduler.items_processed, scheduler.items_failed) == (3, 1)
+    # Uploads are removed once a job finishes; results stay
+    assert not (tmp_path / "high" / "inputs").exists()
+
+
+def test_scheduler_cancels_a_running_job(tmp_path):
+    store = JobStore(tmp_path)
+    make_job(store, "job", 5)
+
+    async def main():
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def handler(job, item):
+            started.set()
+            await release.wait()
+            return {"detections": []}
+
+        scheduler = JobScheduler(store, handler, item_concurrency=1)
+        await scheduler.start()
+        await asyncio.wait_for(started.wait(), 5)
+        await scheduler.cancel("job")
+        release.set()
+        for _ in range(500):
+            if store.get("job")["status"] == "cancelled":
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+
+    asyncio.run(main())
+    job = store.get("job")
+    assert job["status"] == "cancelled"
+    assert job["processed"] == 1
+    assert len(store.pending_items("job")) == 4
+
+
+def test_scheduler_rejects_submissions_beyond_max_queued(tmp_path):
+    store = JobStore(tmp_path)
+
+    async def main():
+        scheduler = JobScheduler(store, None, max_queued=1)
+        with pytest.raises(QueueFull):
+            scheduler.check_capacity()
+        await scheduler.start()
+        # Stopped workers leave submitted jobs in the queue
+        await scheduler.stop()
+        scheduler.check_capacity()
+        scheduler.submit("x", 0)
+        with pytest.raises(QueueFull):
+            scheduler.check_capacity()
+
+    asyncio.run(main())
+
+
+def test_cancelled_queued_jobs_free_their_slot(tmp_path):
+    store = JobStore(tmp_path)
+    make_job(store, "x", 1)
+
+    async def main():
+        scheduler = JobScheduler(store, None, max_queued=1)
+        await scheduler.start()
+        await scheduler.stop()
+        scheduler.submit("x", 0)
+        with pytest.raises(QueueFull):
+            scheduler.check_capacity()
+        await scheduler.cancel("x")
+        scheduler.check_capacity()
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    assert store.get("x")["status"] == "cancelled"
+    assert scheduler.stats()["queued"] == 0
@@ -0,0 +1,74 @@
+import numpy as np
+
+from motion import BoxTracker, MotionGate
+from postprocess import Detections
+
+
+def frame(value: int = 100) -> np.ndarray:
+    return np.full((240, 320, 3), value, np.uint8)
+
+
+def detections(*boxes, class_ids=None) -> Detections:
+    return Detections(
+        np.array(boxes, np.float32).reshape(-1, 4),
+        np.full(len(boxes), 0.9, np.float32),
+        np.array(class_ids if class_ids is not None else [0] * len(boxes), np.int64),
+    )
+
+
+def test_motion_gate_skips_static_frames():
+    gate = MotionGate(threshold=4.0, max_skip=30)
+
+    assert gate.check(frame())[0] is True
+    keyframe, score = gate.check(frame())
+    assert keyframe is False and score == 0
+
+
+def test_motion_gate_notices_motion_in_one_grid_cell():
+    gate = MotionGate(threshold=4.0, max_skip=30)
+    gate.check(frame())
+    moved = frame()
+    # A small bright patch changes one of the 8x8 cells but barely the frame mean
+    moved[10:40, 10:50] = 255
+
+    keyframe, score = gate.check(moved)
+    assert keyframe is True and score >= 4.0
+
+
+def test_motion_gate_forces_a_keyframe_after_max_skip():
+    gate = MotionGate(threshold=4.0, max_skip=3)
+    flags = [gate.check(frame())[0] for _ in range(9)]
+
+    assert flags == [True, False, False, False, True, False, False, False, True]
+
+
+def test_tracker_keeps_ids_and_extrapolates_velocity():
+    tracker = BoxTracker()
+    first = tracker.update(detections([0, 0, 10, 10], [100, 100, 120, 120]), frame=0)
+    second = tracker.update(detections([4, 0, 14, 10], [100, 100, 120, 120]), frame=2)
+
+    assert first == second == [1, 2]
+    predicted, ids = tracker.predict(frame=3)
+    assert ids == [1, 2]
+    # Half the measured 2 px/frame, since velocity is smoothed from zero
+    np.testing.assert_allclose(predicted.boxes[0], [5, 0, 15, 10])
+    np.testing.assert_allclose(predicted.boxes[1], [100, 100, 120, 120])
+
+
+def test_tracker_only_matches_the_same_class():
+    tracker = BoxTracker()
+    tracker.update(detections([0, 0, 10, 10], class_ids=[0]), frame=0)
+
+    assert tracker.update(detections([0, 0, 10, 10], class_ids=[1]), frame=1) == [2]
+
+
+def test_tracker_drops_tracks_after_max_misses():
+    tracker = BoxTracker(max_misses=1)
+    tracker.update(detections([0, 0, 10, 10]), frame=0)
+
+    tracker.update(Detections.empty(), frame=1)
+    assert [track.track_id for track in tracker.tracks] == [1]
+    assert tracker.predict(frame=2)[1] == []
+
+    tracker.update(Detections.empty(), frame=2)
+    assert tracker.tracks == []
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from nms import batched_nms, nms_numpy
+
+# Two heavily overlapping boxes and one far away
+BOXES = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60]], np.float32)
+SCORES = np.array([0.9, 0.8, 0.7], np.float32)
+
+
+def test_nms_numpy_suppresses_overlaps_in_score_order():
+    assert nms_numpy(BOXES, SCORES, 0.5).tolist() == [0, 2]
+    assert nms_numpy(BOXES, SCORES, 0.9).tolist() == [0, 1, 2]
+
+
+def test_batched_nms_keeps_images_apart():
+    same_labels = np.zeros(3, np.int64)
+    kept = batched_nms([(BOXES, SCORES, same_labels), (BOXES, SCORES[::-1].copy(), same_labels)], 0.5)
+
+    assert [k.tolist() for k in kept] == [[0, 2], [2, 1]]
+
+
+def test_batched_nms_is_class_aware_unless_agnostic():
+    labels = np.array([0, 1, 0], np.int64)
+
+    assert batched_nms([(BOXES, SCORES, labels)], 0.5)[0].tolist() == [0, 1, 2]
+    assert batched_nms([(BOXES, SCORES, labels)], 0.5, class_agnostic=True)[0].tolist() == [0, 2]
+
+
+def test_batched_nms_caps_candidates_and_detections():
+    labels = np.zeros(3, np.int64)
+
+    assert batched_nms([(BOXES, SCORES, labels)], 0.9, max_detections=2)[0].tolist() == [0, 1]
+    assert batched_nms([(BOXES, SCORES, labels)], 0.9, pre_nms_top_k=1)[0].tolist() == [0]
+
+
+def test_batched_nms_handles_empty_images():
+    empty = (np.empty((0, 4), np.float32), np.empty(0, np.float32), np.empty(0, np.int64))
+    kept = batched_nms([empty, (BOXES, SCORES, np.zeros(3, np.int64)), empty], 0.5)
+
+    assert [k.tolist() for k in kept] == [[], [0, 2], []]
+    assert [k.tolist() for k in batched_nms([empty, empty])] == [[], []]
+
+
+def test_backends_agree():
+    rng = np.random.default_rng(0)
+    corners = rng.uniform(0, 200, (200, 2))
+    boxes = np.hstack([corners, corners + rng.uniform(5, 60, (200, 2))]).astype(np.float32)
+    scores = rng.uniform(0, 1, 200).astype(np.float32)
+    labels = rng.integers(0, 3, 200)
+
+    numpy_keep = batched_nms([(boxes, scores, labels)], 0.45, backend="numpy")[0]
+    opencv_keep = batched_nms([(boxes, scores, labels)], 0.45, backend="opencv")[0]
+    assert sorted(numpy_keep.tolist()) == sorted(opencv_keep.tolist())
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        batched_nms([(BOXES, SCORES, np.zeros(3, np.int64))], backend="cuda")
@@ -0,0 +1,65 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from admission import Overloaded
+from pipeline import PipelineStage, StageFull
+
+
+async def settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def run_stage(queue_limit, callers: int) -> tuple:
+    """Start ``callers`` on a one-slot stage whose first call blocks, then unblock it"""
+    async def main():
+        release = asyncio.Event()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            stage = PipelineStage("decode", executor, 1, queue_limit=queue_limit)
+            tasks = [asyncio.create_task(stage.wrap(release.wait)) for _ in range(callers)]
+            await settle()
+            waiting = stage.waiting
+            release.set()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        return stage, waiting, results
+
+    return asyncio.run(main())
+
+
+def test_callers_beyond_the_queue_limit_are_rejected():
+    stage, waiting, results = run_stage(queue_limit=2, callers=5)
+
+    assert waiting == 2
+    assert [isinstance(result, StageFull) for result in results] == [False, False, False, True, True]
+    rejected = results[-1]
+    assert isinstance(rejected, Overloaded)
+    assert rejected.reason == "stage_full" and rejected.retry_after >= 1
+    assert (stage.completed, stage.rejected) == (3, 2)
+    assert stage.stats()["queue_limit"] == 2
+
+
+def test_without_a_limit_every_caller_queues():
+    stage, waiting, results = run_stage(queue_limit=None, callers=5)
+
+    assert waiting == 4
+    assert not any(isinstance(result, Exception) for result in results)
+    assert stage.rejected == 0
+
+
+def test_a_zero_limit_still_runs_work_when_a_slot_is_free():
+    async def main():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            stage = PipelineStage("encode", executor, 1, queue_limit=0)
+            assert await stage.run(sum, [1, 2, 3]) == 6
+            assert await stage.run(sum, [4]) == 4
+            release = asyncio.Event()
+            busy = asyncio.create_task(stage.wrap(release.wait))
+            await settle()
+            with pytest.raises(StageFull):
+                await stage.run(sum, [5])
+            release.set()
+            await busy
+
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+import io
+import os
+import threading
+import zipfile
+
+import pytest
+
+from zipstream import ZipStreamWriter
+
+ENTRIES = [("a.txt", b"hello " * 1000), ("b.bin", os.urandom(5000)), ("empty.txt", b"")]
+
+
+def stream_through_pipe(writer: ZipStreamWriter) -> bytes:
+    """Send every chunk through an OS pipe, which cannot seek, and return what came out"""
+    read_fd, write_fd = os.pipe()
+    received = []
+    reader = threading.Thread(target=lambda: received.append(os.fdopen(read_fd, "rb").read()))
+    reader.start()
+    with os.fdopen(write_fd, "wb") as sink:
+        with pytest.raises(io.UnsupportedOperation):
+            sink.seek(0)
+        for name, data in ENTRIES:
+            sink.write(writer.add(name, data))
+        sink.write(writer.close())
+    reader.join()
+    return received[0]
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_archive_streamed_to_an_unseekable_sink_is_valid(compression):
+    archive = zipfile.ZipFile(io.BytesIO(stream_through_pipe(ZipStreamWriter(compression))))
+
+    assert archive.testzip() is None
+    assert archive.namelist() == [name for name, _ in ENTRIES]
+    for name, data in ENTRIES:
+        assert archive.read(name) == data
+        info = archive.getinfo(name)
+        assert info.compress_type == compression
+        # Sizes and CRC follow the data, since they could not be patched in afterwards
+        assert info.flag_bits & 0x08
+
+
+def test_each_entry_is_returned_as_soon_as_it_is_added():
+    writer = ZipStreamWriter()
+    first = writer.add(*ENTRIES[0])
+    second = writer.add(*ENTRIES[1])
+
+    assert first.startswith(b"PK\x03\x04") and second.startswith(b"PK\x03\x04")
+    assert len(first) > len(ENTRIES[0][1]) and len(second) > len(ENTRIES[1][1])
+    assert writer.add_many([]) == b""
+    assert writer.close().startswith(b"PK\x01\x02")